@@ -12,12 +12,26 @@ from app.database.impl.database_connector_impl import DatabaseConnectorImpl
 from app.exceptions.not_implemented_exception import NotImplementedException
 from app.jobs.alarm.alarm_manager import AlarmManager
 from app.jobs.alarm.impl.alarm_manager_impl import AlarmManagerImpl
+from app.jobs.alarm_tracer.alarm_tracer import AlarmTracer
+from app.jobs.alarm_tracer.impl.alarm_tracer_impl import AlarmTracerImpl
+from app.jobs.event_publisher.event_publisher import EventPublisher
+from app.jobs.event_publisher.impl.event_publisher_impl import EventPublisherImpl
+from app.jobs.event_publisher.impl.event_spool import EventSpool
 from app.jobs.pir.impl.pirs_listener_impl import PirsListenerImpl
 from app.jobs.pir.pirs_listener import PirsListener
 from app.jobs.recording.impl.recordings_manager_impl import RecordingsManagerImpl
 from app.jobs.recording.recordings_manager import RecordingsManager
 from app.jobs.reed.impl.reeds_listener_impl import ReedsListenerImpl
 from app.jobs.reed.reeds_listener import ReedsListener
+from app.jobs.scheduler.impl.scheduler_impl import SchedulerImpl
+from app.jobs.scheduler.scheduler import Scheduler
+from app.jobs.sensor.impl.asyncio_sensor_sampler_impl import AsyncioSensorSamplerImpl
+from app.jobs.sensor.impl.sensor_sampler_impl import SensorSamplerImpl
+from app.jobs.sensor.sensor_sampler import SensorSampler
+from app.jobs.sensor_event.impl.sensor_events_writer_impl import SensorEventsWriterImpl
+from app.jobs.sensor_event.sensor_events_writer import SensorEventsWriter
+from app.models.enums.gpio_backend import GpioBackend
+from app.models.enums.sensor_sampler_runtime import SensorSamplerRuntime
 from app.repositories.camera.camera_repository import CameraRepository
 from app.repositories.camera.impl.camera_repository_impl import CameraRepositoryImpl
 from app.repositories.device_group.device_group_repository import DeviceGroupRepository
@@ -28,6 +42,8 @@ from app.repositories.recording.impl.recording_repository_impl import RecordingR
 from app.repositories.recording.recording_repository import RecordingRepository
 from app.repositories.reed.impl.reed_repository_impl import ReedRepositoryImpl
 from app.repositories.reed.reed_repository import ReedRepository
+from app.repositories.sensor_event.impl.sensor_event_repository_impl import SensorEventRepositoryImpl
+from app.repositories.sensor_event.sensor_event_repository import SensorEventRepository
 from app.services.camera.camera_service import CameraService
 from app.services.camera.impl.camera_service_impl import CameraServiceImpl
 from app.services.device_group.device_group_service import DeviceGroupService
@@ -38,6 +54,8 @@ from app.services.recording.impl.recording_service_impl import RecordingServiceI
 from app.services.recording.recording_service import RecordingService
 from app.services.reed.impl.reed_service_impl import ReedServiceImpl
 from app.services.reed.reed_service import ReedService
+from app.services.sensor_event.impl.sensor_event_service_impl import SensorEventServiceImpl
+from app.services.sensor_event.sensor_event_service import SensorEventService
 from app.utils.read_credentials import read_credentials
 
 bindings = { }
@@ -58,15 +76,56 @@ reed_repository = ReedRepositoryImpl(database_connector=database_connector)
 pir_repository = PirRepositoryImpl(database_connector=database_connector)
 recording_repository = RecordingRepositoryImpl(database_connector=database_connector)
 device_group_repository = DeviceGroupRepositoryImpl(database_connector=database_connector)
-
-recording_manager = RecordingsManagerImpl(camera_repository, recording_repository)
-recording_service = RecordingServiceImpl(recording_repository=recording_repository, camera_repository=camera_repository, recording_manager=recording_manager)
-alarm_manager = AlarmManagerImpl(rabbitmq_client, recording_service, device_group_repository, camera_repository, reed_repository, pir_repository)
-reeds_listener = ReedsListenerImpl(alarm_manager, reed_repository)
-pirs_listener = PirsListenerImpl(alarm_manager, pir_repository)
-device_group_service = DeviceGroupServiceImpl(device_group_repository, camera_repository, reed_repository, pir_repository, alarm_manager, rabbitmq_client)
+sensor_event_repository = SensorEventRepositoryImpl(database_connector=database_connector)
+
+# Edge detection by default, polling can be selected as fallback with GPIO_BACKEND=POLLING
+gpio_backend = GpioBackend(os.getenv("GPIO_BACKEND", GpioBackend.EDGE.value).upper())
+# Sampler on its own thread by default, SENSOR_SAMPLER_RUNTIME=ASYNCIO runs it on the event loop of the application
+sensor_sampler_runtime = SensorSamplerRuntime(os.getenv("SENSOR_SAMPLER_RUNTIME", SensorSamplerRuntime.THREAD.value).upper())
+# Rate at which all pins are read in a single pass when polling, a transition is seen up to one period after it
+# happened, pins waiting for their debounce hold time are read again as soon as it is over
+sensor_sample_rate_hz = float(os.getenv("SENSOR_SAMPLE_RATE_HZ", "2"))
+# Stable transitions kept in memory for each pin (9 bytes each)
+sensor_history_size = int(os.getenv("SENSOR_HISTORY_SIZE", "4096"))
+# Sensor events are written to the database every batch size events or flush interval, at most max buffered are kept
+sensor_events_batch_size = int(os.getenv("SENSOR_EVENTS_BATCH_SIZE", "100"))
+sensor_events_flush_ms = int(os.getenv("SENSOR_EVENTS_FLUSH_MS", "1000"))
+sensor_events_max_buffered = int(os.getenv("SENSOR_EVENTS_MAX_BUFFERED", "10000"))
+# Threads running delayed calls once due, pending ones only wait in the scheduler heap
+scheduler_workers = int(os.getenv("SCHEDULER_WORKERS", "4"))
+# Events waiting for RabbitMQ beyond this are dropped, failed publishes are retried with backoff up to the max
+events_publisher_max_queued = int(os.getenv("EVENTS_PUBLISHER_MAX_QUEUED", "1000"))
+events_publisher_max_backoff = float(os.getenv("EVENTS_PUBLISHER_MAX_BACKOFF_SECONDS", "10"))
+# Events are written here before being published and replayed from here after a restart. After a crash or power loss
+# the last batch written may be lost and up to 64 events already published may be published again, see EventSpool
+events_spool_path = os.getenv("EVENTS_SPOOL_PATH", "/var/lib/devices-manager/data/events.spool")
+# Threads starting the recordings of an alarm at the same time
+recording_start_workers = int(os.getenv("RECORDING_START_WORKERS", "4"))
+# Upper bound of the RAM (/dev/shm) used by the pre-roll of each camera, whatever its bitrate. /dev/shm has to fit it
+# for every camera with a pre-roll, Docker only gives 64 MB to a whole container unless run with a larger --shm-size
+pre_roll_max_bytes = int(os.getenv("PRE_ROLL_MAX_MB", "16")) * 1024 * 1024
+# Always recording cameras are split in files this long by a single ffmpeg, 0 restarts ffmpeg for every file instead
+recording_segment_seconds = int(os.getenv("RECORDING_SEGMENT_SECONDS", "3600")) or None
+# Timings of the last alarms kept in memory
+alarm_traces_kept = int(os.getenv("ALARM_TRACES_KEPT", "100"))
+
+scheduler = SchedulerImpl(scheduler_workers)
+event_publisher = EventPublisherImpl(rabbitmq_client, EventSpool(events_spool_path), max_queued=events_publisher_max_queued, max_backoff_seconds=events_publisher_max_backoff)
+alarm_tracer = AlarmTracerImpl(alarm_traces_kept)
+recording_manager = RecordingsManagerImpl(camera_repository, recording_repository, recording_start_workers, pre_roll_max_bytes, recording_segment_seconds)
+recording_service = RecordingServiceImpl(recording_repository=recording_repository, camera_repository=camera_repository, recording_manager=recording_manager, scheduler=scheduler)
+alarm_manager = AlarmManagerImpl(event_publisher, recording_service, device_group_repository, camera_repository, scheduler, alarm_tracer)
+if sensor_sampler_runtime == SensorSamplerRuntime.ASYNCIO:
+    sensor_sampler = AsyncioSensorSamplerImpl(gpio_backend, sensor_sample_rate_hz, sensor_history_size)
+else:
+    sensor_sampler = SensorSamplerImpl(gpio_backend, sensor_sample_rate_hz, sensor_history_size)
+sensor_events_writer = SensorEventsWriterImpl(sensor_event_repository, sensor_events_batch_size, sensor_events_flush_ms, sensor_events_max_buffered)
+reeds_listener = ReedsListenerImpl(alarm_manager, sensor_sampler, sensor_events_writer)
+pirs_listener = PirsListenerImpl(alarm_manager, sensor_sampler, sensor_events_writer)
+device_group_service = DeviceGroupServiceImpl(device_group_repository, camera_repository, reed_repository, pir_repository, reeds_listener, pirs_listener, alarm_manager, event_publisher)
 reed_service = ReedServiceImpl(reed_repository=reed_repository, reeds_listener=reeds_listener)
 pir_service = PirServiceImpl(pir_repository=pir_repository, pirs_listener=pirs_listener)
+sensor_event_service = SensorEventServiceImpl(sensor_events_writer=sensor_events_writer)
 
 camera_service = CameraServiceImpl(camera_repository=camera_repository, recording_service=recording_service)
 
@@ -80,9 +139,15 @@ bindings[RecordingRepository] = recording_repository
 bindings[DeviceGroupRepository] = device_group_repository
 bindings[ReedRepository] = reed_repository
 bindings[PirRepository] = pir_repository
+bindings[SensorEventRepository] = sensor_event_repository
 
+bindings[Scheduler] = scheduler
+bindings[EventPublisher] = event_publisher
 bindings[RecordingsManager] = recording_manager
 bindings[AlarmManager] = alarm_manager
+bindings[AlarmTracer] = alarm_tracer
+bindings[SensorSampler] = sensor_sampler
+bindings[SensorEventsWriter] = sensor_events_writer
 bindings[ReedsListener] = reeds_listener
 bindings[PirsListener] = pirs_listener
 
@@ -91,6 +156,7 @@ bindings[RecordingService] = recording_service
 bindings[DeviceGroupService] = device_group_service
 bindings[ReedService] = reed_service
 bindings[PirService] = pir_service
+bindings[SensorEventService] = sensor_event_service
 
 bindings[AuthClient] = AuthClient()
 
@@ -9,6 +9,7 @@ from app.exceptions.not_found_exception import NotFoundException
 from app.exceptions.not_implemented_exception import NotImplementedException
 from app.exceptions.pirs_listener_exception import PirsListenerException
 from app.exceptions.reeds_listener_exception import ReedsListenerException
+from app.exceptions.sensor_sampler_exception import SensorSamplerException
 from app.exceptions.unupdateable_data_exception import UnupdateableDataException
 from app.exceptions.validation_exception import ValidationException
 
@@ -55,6 +56,12 @@ async def pirs_listener_exception_handler(request: Request, exc: PirsListenerExc
         content={"message": exc.message},
     )
 
+async def sensor_sampler_exception_handler(request: Request, exc: SensorSamplerException):
+    return JSONResponse(
+        status_code=500,
+        content={"message": exc.message},
+    )
+
 async def not_implemented_exception_handler(request: Request, exc: NotImplementedException):
     return JSONResponse(
         status_code=501,
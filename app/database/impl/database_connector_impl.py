@@ -1,11 +1,36 @@
 import os
+from typing import List
 
+from sqlalchemy import text
 from sqlmodel import Session, create_engine, SQLModel
 
 from app.database.database_connector import DatabaseConnector
 from app.utils.read_credentials import read_credentials
 
 
+# Column added to an existing table with its default for the rows already there. A column someone added by hand
+# without the default gets it too
+def add_column(table: str, column: str, column_type: str, default: str) -> List[str]:
+    return [
+        f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} {column_type} NOT NULL DEFAULT {default}",
+        f"UPDATE {table} SET {column} = {default} WHERE {column} IS NULL",
+        f"ALTER TABLE {table} ALTER COLUMN {column} SET DEFAULT {default}",
+        f"ALTER TABLE {table} ALTER COLUMN {column} SET NOT NULL",
+    ]
+
+
+# create_all only creates missing tables, what changed in existing ones is applied here on every start, every
+# statement can run again
+MIGRATIONS = [
+    *add_column("reed", "debounce_ms", "INTEGER", "50"),
+    *add_column("pir", "debounce_ms", "INTEGER", "0"),
+    *add_column("camera", "pre_roll_seconds", "INTEGER", "0"),
+    # Enums are native types, create_all only creates them along with a new table
+    "DO $$ BEGIN CREATE TYPE recordingprofile AS ENUM ('AUTO', 'COPY', 'TRANSCODE'); EXCEPTION WHEN duplicate_object THEN NULL; END $$",
+    *add_column("camera", "recording_profile", "recordingprofile", "'TRANSCODE'"),
+]
+
+
 class DatabaseConnectorImpl(DatabaseConnector):
     def __init__(self):
         database_hostname = os.getenv('DATABASE_HOSTNAME')
@@ -20,6 +45,14 @@ class DatabaseConnectorImpl(DatabaseConnector):
             SQLModel.metadata.create_all(self.engine)
         except:
             pass
+        self.migrate()
+
+
+    def migrate(self):
+        with self.engine.begin() as connection:
+            for statement in MIGRATIONS:
+                connection.execute(text(statement))
+
 
     def get_new_session(self):
         return Session(self.engine)
\ No newline at end of file
@@ -0,0 +1,4 @@
+class FfmpegException(Exception):
+    def __init__(self, message: str):
+        self.message = message
+        super().__init__(self.message)
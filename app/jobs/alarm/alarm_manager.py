@@ -1,19 +1,40 @@
 from abc import abstractmethod
+from typing import Callable, Optional, Sequence
 
+from app.models.device_group import DeviceGroup
 from app.models.enums.pir_status import PirStatus
 from app.models.enums.reed_status import ReedStatus
+from app.models.pir import Pir
+from app.models.reed import Reed
 
 
 class AlarmManager:
 
+    # Timestamps are time.monotonic_ns() of the sensor edge and of the listener getting it, used to trace the alarm
     @abstractmethod
-    def on_reed_changed_status(self, reed_pin: int, status: ReedStatus):
+    def on_reed_changed_status(self, reed_pin: int, status: ReedStatus, edge_timestamp: Optional[int] = None, dispatched_at: Optional[int] = None):
         pass
 
     @abstractmethod
-    def on_pir_changed_status(self, pir_pin: int, status: PirStatus):
+    def on_pir_changed_status(self, pir_pin: int, status: PirStatus, edge_timestamp: Optional[int] = None, dispatched_at: Optional[int] = None):
         pass
 
     @abstractmethod
     def stop_alarm(self):
-        pass
\ No newline at end of file
+        pass
+
+    @abstractmethod
+    def on_group_started_listening(self, group: DeviceGroup, reeds: Sequence[Reed], pirs: Sequence[Pir]):
+        pass
+
+    @abstractmethod
+    def on_group_stopped_listening(self):
+        pass
+
+    @abstractmethod
+    def schedule_start_listening(self, group_id: int, delay_seconds: int, start_listening: Callable[[int], None]):
+        pass
+
+    @abstractmethod
+    def cancel_start_listening(self) -> bool:
+        pass
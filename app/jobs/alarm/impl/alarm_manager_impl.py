@@ -1,23 +1,34 @@
+import threading
 import time
+from typing import Callable, Optional, Sequence
 
-from rabbitmq_sdk.client.rabbitmq_client import RabbitMQClient
 from rabbitmq_sdk.event.base_event import BaseEvent
 from rabbitmq_sdk.event.impl.devices_manager.alarm_stopped import AlarmStopped
 from rabbitmq_sdk.event.impl.devices_manager.alarm_waiting import AlarmWaiting
 from rabbitmq_sdk.event.impl.devices_manager.reed_alarm import ReedAlarm
 from rabbitmq_sdk.event.impl.devices_manager.pir_alarm import PirAlarm
 
+from app.exceptions.not_found_exception import NotFoundException
 from app.jobs.alarm.alarm_manager import AlarmManager
+from app.jobs.alarm_tracer.alarm_trace import AlarmTrace
+from app.jobs.alarm_tracer.alarm_tracer import AlarmTracer
+from app.jobs.event_publisher.event_publisher import EventPublisher
+from app.jobs.scheduler.scheduled_job import ScheduledJob
+from app.jobs.scheduler.scheduler import Scheduler
+from app.models.device_group import DeviceGroup
+from app.models.enums.alarm_stage import AlarmStage
 from app.models.enums.device_group_status import DeviceGroupStatus
+from app.models.listening_group import ListeningGroup
+from app.models.pir import Pir
+from app.models.reed import Reed
 from app.models.enums.pir_status import PirStatus
 from app.models.enums.reed_status import ReedStatus
-from app.models.recording import Recording, RecordingInputDto
 from app.repositories.camera.camera_repository import CameraRepository
 from app.repositories.device_group.device_group_repository import DeviceGroupRepository
-from app.repositories.pir.pir_repository import PirRepository
-from app.repositories.reed.reed_repository import ReedRepository
 from app.services.recording.recording_service import RecordingService
-from app.utils.delayed_execution import delay_execution
+
+# How long an alarm stays on after firing, unless sensors keep triggering
+ALARM_DURATION_SECONDS = 120
 
 
 # The logic here is that the devices' listeners perform a callback here every time the status changes and only if
@@ -25,95 +36,208 @@ from app.utils.delayed_execution import delay_execution
 # started the alarm for those devices).
 # Here I can emit events for other services (essentially, starting alarm only the first time an event that should start
 # it happens, and shutting it down when user shuts it down).
+# Timers of the alarm (start delay of the group, fire delay and auto stop) are owned here as scheduler handles, so
+# stopping cancels them instead of letting them wake up later to find there is nothing to do, and sensors triggering
+# again while the alarm is on extend the auto stop.
+# The listening group and the names of its sensors are kept in memory, set by the device group service when a group
+# starts or stops listening, so a sensor callback decides whether to start the alarm without any database session.
+# Every alarm started gets a trace with the time each stage was reached, from the sensor edge to the cameras recording.
 class AlarmManagerImpl(AlarmManager):
     def __init__(self,
-                 rabbitmq_client: RabbitMQClient,
+                 event_publisher: EventPublisher,
                  recording_service: RecordingService,
                  device_group_repository: DeviceGroupRepository,
                  camera_repository: CameraRepository,
-                 reed_repository: ReedRepository,
-                 pir_repository: PirRepository):
-        self.rabbitmq_client = rabbitmq_client
+                 scheduler: Scheduler,
+                 alarm_tracer: AlarmTracer):
+        self.event_publisher = event_publisher
         self.recording_service = recording_service
         self.device_group_repository = device_group_repository
         self.camera_repository = camera_repository
-        self.reed_repository = reed_repository
-        self.pir_repository = pir_repository
+        self.scheduler = scheduler
+        self.alarm_tracer = alarm_tracer
         self.alarm = False
+        self.trace: AlarmTrace | None = None
+        self.timers_lock = threading.Lock()
+        self.start_listening_job: ScheduledJob | None = None
+        self.fire_job: ScheduledJob | None = None
+        self.stop_job: ScheduledJob | None = None
+        # Replaced as a whole, never changed in place, so callbacks can read it without the lock
+        self.listening_group: ListeningGroup | None = None
+        self.restore_listening_group()
+
+
+    # A group left listening when the application stopped keeps listening after it starts again
+    def restore_listening_group(self):
+        try:
+            group = self.device_group_repository.find_listening_device_group()
+        except NotFoundException:
+            return
+        self.on_group_started_listening(
+            group,
+            self.device_group_repository.find_device_group_reeds_by_id(group.id),
+            self.device_group_repository.find_device_group_pirs_by_id(group.id))
+
+
+    def on_group_started_listening(self, group: DeviceGroup, reeds: Sequence[Reed], pirs: Sequence[Pir]):
+        self.listening_group = ListeningGroup.from_devices(group, reeds, pirs)
 
 
-    def on_reed_changed_status(self, reed_pin: int, status: ReedStatus):
-        reed = self.reed_repository.find_by_gpio_pin_number(reed_pin)
-        group = self.device_group_repository.find_listening_device_group()
+    def on_group_stopped_listening(self):
+        self.listening_group = None
 
+
+    def on_reed_changed_status(self, reed_pin: int, status: ReedStatus, edge_timestamp: Optional[int] = None, dispatched_at: Optional[int] = None):
+        handled_at = time.monotonic_ns()
         # This filters the case where a reed is open on alarm start, because a changed status event will not be triggered
         # unless reed is closed after. If closed, nothing really happens, but if opened again another changed status
         # event will be triggered and this time it will start the alarm.
-        if status == ReedStatus.OPEN and not self.alarm:
-            print(f"Changed status reed: {status}, starting alarm")
-            self.alarm = True
-            while not self.rabbitmq_client.publish(AlarmWaiting(True, int(time.time()))):
-                time.sleep(1)
-            delay_execution(
-                func=self.trigger_alarm,
-                args=(ReedAlarm(reed.name, int(time.time())), group.id),
-                delay_seconds=group.wait_to_fire_alarm)
-
-
-    def on_pir_changed_status(self, pir_pin: int, status: PirStatus):
-        pir = self.pir_repository.find_by_gpio_pin_number(pir_pin)
-        group = self.device_group_repository.find_listening_device_group()
+        if status != ReedStatus.OPEN:
+            return
+
+        if self.alarm:
+            self.extend_alarm()
+            return
+
+        listening_group = self.listening_group
+        if listening_group is None or reed_pin not in listening_group.reed_names:
+            return
+
+        print(f"Changed status reed: {status}, starting alarm")
+        name = listening_group.reed_names[reed_pin]
+        trace = self.start_trace(name, edge_timestamp, dispatched_at, handled_at)
+        group = listening_group.group
+        self.start_alarm(ReedAlarm(name, int(time.time())), group.id, group.wait_to_fire_alarm, trace)
+
+
+    def on_pir_changed_status(self, pir_pin: int, status: PirStatus, edge_timestamp: Optional[int] = None, dispatched_at: Optional[int] = None):
+        handled_at = time.monotonic_ns()
         print("PIR status changed, deciding if alarm should be triggered...")
-        if status == PirStatus.MOVEMENT and not self.alarm:
-            print(f"Triggering alarm")
+        if status != PirStatus.MOVEMENT:
+            return
 
-            self.alarm = True
-            while not self.rabbitmq_client.publish(AlarmWaiting(True, int(time.time()))):
-                time.sleep(1)
-            delay_execution(
-                func=self.trigger_alarm,
-                args=(PirAlarm(pir.name, int(time.time())), group.id),
-                delay_seconds=group.wait_to_fire_alarm)
+        if self.alarm:
+            self.extend_alarm()
+            return
+
+        listening_group = self.listening_group
+        if listening_group is None or pir_pin not in listening_group.pir_names:
+            return
+
+        print(f"Triggering alarm")
+        name = listening_group.pir_names[pir_pin]
+        trace = self.start_trace(name, edge_timestamp, dispatched_at, handled_at)
+        group = listening_group.group
+        self.start_alarm(PirAlarm(name, int(time.time())), group.id, group.wait_to_fire_alarm, trace)
+
+
+    # Callers not knowing when the edge happened or was dispatched get it from when it was handled
+    def start_trace(self, sensor: str, edge_timestamp: Optional[int], dispatched_at: Optional[int], handled_at: int) -> AlarmTrace:
+        trace = self.alarm_tracer.start_trace(
+            sensor,
+            edge_timestamp if edge_timestamp is not None else handled_at,
+            dispatched_at if dispatched_at is not None else handled_at)
+        trace.mark(AlarmStage.HANDLER, handled_at)
+        return trace
+
+
+    def start_alarm(self, event: BaseEvent, group_id: int, wait_to_fire_alarm: int, trace: Optional[AlarmTrace] = None):
+        self.alarm = True
+        self.trace = trace
+        self.event_publisher.publish(AlarmWaiting(True, int(time.time())))
+        if trace is not None:
+            trace.fire_delay_ns = wait_to_fire_alarm * 1_000_000_000
+            trace.mark(AlarmStage.WAITING)
+        with self.timers_lock:
+            self.fire_job = self.scheduler.schedule(
+                self.trigger_alarm,
+                args=(event, group_id),
+                delay_seconds=wait_to_fire_alarm,
+                name="trigger alarm")
+
+
+    # Sensors triggering again once the alarm fired keep it on for another full duration
+    def extend_alarm(self):
+        with self.timers_lock:
+            if self.stop_job is not None:
+                self.stop_job.reschedule(ALARM_DURATION_SECONDS)
 
 
     # OTHER ALARM FUNCTIONS
 
     def trigger_alarm(self, event: BaseEvent, group_id: int):
-        # Find listening group and set it to alarm
-        group = self.device_group_repository.find_device_group_by_id(group_id)
+        with self.timers_lock:
+            self.fire_job = None
+        trace = self.trace
+        if trace is not None:
+            trace.mark(AlarmStage.FIRE)
 
         # should check if still listening, to avoid triggering alarm if user stopped listening after a device triggered it
-        if group.status != DeviceGroupStatus.LISTENING:
+        listening_group = self.listening_group
+        if listening_group is None or listening_group.group.id != group_id:
             return
 
-        group.status = DeviceGroupStatus.ALARM
+        # Set listening group to alarm
+        group = listening_group.group.model_copy(update={"status": DeviceGroupStatus.ALARM})
         self.device_group_repository.update_device_group(group)
 
-        while not self.rabbitmq_client.publish(AlarmWaiting(False, int(time.time()))):
-            time.sleep(1)
+        self.event_publisher.publish(AlarmWaiting(False, int(time.time())))
 
         # After two minutes, stop audio and recordings. This does NOT stop devices from listening so alarm could be triggered
         # again. Only user can stop devices from listening.
-        delay_execution(
-            func=self.stop_alarm,
-            delay_seconds=120)
+        with self.timers_lock:
+            self.stop_job = self.scheduler.schedule(
+                self.stop_alarm,
+                delay_seconds=ALARM_DURATION_SECONDS,
+                name="stop alarm")
 
-        while not self.rabbitmq_client.publish(event):
-            time.sleep(1)
+        self.event_publisher.publish(event)
 
         # Start recording for cameras that are not always recording to save videos of alarm event
-        for camera in self.camera_repository.find_all():
-            if not camera.always_recording:
-                self.recording_service.create_and_start_recording(Recording.from_dto(RecordingInputDto(camera_ip=camera.ip, always_recording=False)), auto_restart=False)
+        self.recording_service.create_and_start_alarm_recordings(
+            [camera for camera in self.camera_repository.find_all() if not camera.always_recording],
+            on_started=(lambda recording: trace.mark_camera(recording.camera_ip)) if trace is not None else None)
 
 
     def stop_alarm(self):
+        # Nothing is left to fire or to stop later, whoever called this
+        with self.timers_lock:
+            for job in (self.fire_job, self.stop_job):
+                if job is not None:
+                    job.cancel()
+            self.fire_job = None
+            self.stop_job = None
+
         # Since this gets also called on stop listening, if alarm is not triggered there is no need to stop it
         if self.alarm:
-            while not self.rabbitmq_client.publish(AlarmStopped(int(time.time()))):
-                time.sleep(1)
+            self.event_publisher.publish(AlarmStopped(int(time.time())))
 
             for camera in self.camera_repository.find_all():
                 if not camera.always_recording:
                     self.recording_service.stop_by_camera_ip(camera.ip)
-            self.alarm = False
\ No newline at end of file
+            self.alarm = False
+
+
+    def schedule_start_listening(self, group_id: int, delay_seconds: int, start_listening: Callable[[int], None]):
+        with self.timers_lock:
+            if self.start_listening_job is not None:
+                self.start_listening_job.cancel()
+            self.start_listening_job = self.scheduler.schedule(
+                self.run_start_listening,
+                args=(start_listening, group_id),
+                delay_seconds=delay_seconds,
+                name=f"start listening group {group_id}")
+
+
+    def run_start_listening(self, start_listening: Callable[[int], None], group_id: int):
+        with self.timers_lock:
+            self.start_listening_job = None
+        start_listening(group_id)
+
+
+    # True if a group was still waiting to start listening
+    def cancel_start_listening(self) -> bool:
+        with self.timers_lock:
+            job = self.start_listening_job
+            self.start_listening_job = None
+        return job is not None and job.cancel()
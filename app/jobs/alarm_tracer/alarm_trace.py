@@ -0,0 +1,68 @@
+import threading
+import time
+import uuid
+from typing import Dict, Optional
+
+from prometheus_client import Histogram
+
+from app.models.alarm_trace import AlarmTraceDto
+from app.models.enums.alarm_stage import AlarmStage
+from app.utils.monotonic_time import monotonic_to_epoch
+
+STAGE_SECONDS = Histogram(
+    "alarm_stage_seconds",
+    "Time spent reaching each stage of an alarm from the previous one, the configured fire delay excluded",
+    ["stage"],
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10)
+)
+
+STAGES = list(AlarmStage)
+
+
+# Timings of a single alarm, stages are marked with time.monotonic_ns() timestamps from whatever thread reaches them.
+# Each stage is observed in the histogram as the time from the stage before it, cameras from FIRE.
+class AlarmTrace:
+    __slots__ = ("id", "sensor", "stages", "cameras", "fire_delay_ns", "lock")
+
+    def __init__(self, sensor: str):
+        self.id = uuid.uuid4().hex
+        self.sensor = sensor
+        self.stages: Dict[AlarmStage, int] = {}
+        self.cameras: Dict[str, int] = {}
+        # Expected wait between WAITING and FIRE, not counted as time spent
+        self.fire_delay_ns = 0
+        self.lock = threading.Lock()
+
+
+    def mark(self, stage: AlarmStage, timestamp: Optional[int] = None):
+        timestamp = timestamp if timestamp is not None else time.monotonic_ns()
+        with self.lock:
+            self.stages[stage] = timestamp
+            previous = STAGES[STAGES.index(stage) - 1] if stage != AlarmStage.EDGE else None
+            previous_timestamp = self.stages.get(previous)
+        if previous_timestamp is not None:
+            delay = self.fire_delay_ns if stage == AlarmStage.FIRE else 0
+            STAGE_SECONDS.labels(stage.value).observe(max(0, timestamp - previous_timestamp - delay) / 1e9)
+
+
+    def mark_camera(self, camera_ip: str):
+        timestamp = time.monotonic_ns()
+        with self.lock:
+            self.cameras[camera_ip] = timestamp
+            fired_at = self.stages.get(AlarmStage.FIRE)
+        if fired_at is not None:
+            STAGE_SECONDS.labels(AlarmStage.RECORDING.value).observe(max(0, timestamp - fired_at) / 1e9)
+
+
+    def to_dto(self) -> AlarmTraceDto:
+        with self.lock:
+            stages = dict(self.stages)
+            cameras = dict(self.cameras)
+        edge = stages.get(AlarmStage.EDGE, 0)
+        return AlarmTraceDto(
+            id=self.id,
+            sensor=self.sensor,
+            started_at=monotonic_to_epoch(edge),
+            stages_ms={stage.value: (timestamp - edge) / 1e6 for stage, timestamp in stages.items()},
+            cameras_ms={camera_ip: (timestamp - edge) / 1e6 for camera_ip, timestamp in cameras.items()},
+        )
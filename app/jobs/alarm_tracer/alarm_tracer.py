@@ -0,0 +1,20 @@
+from abc import abstractmethod
+from typing import Sequence
+
+from app.jobs.alarm_tracer.alarm_trace import AlarmTrace
+from app.models.alarm_trace import AlarmTraceDto
+
+
+class AlarmTracer:
+    # Timestamps are time.monotonic_ns() values, edge one is the timestamp of the sensor transition
+    @abstractmethod
+    def start_trace(self, sensor: str, edge_timestamp: int, dispatched_at: int) -> AlarmTrace:
+        pass
+
+    @abstractmethod
+    def get_traces(self) -> Sequence[AlarmTraceDto]:
+        pass
+
+    @abstractmethod
+    def get_trace(self, trace_id: str) -> AlarmTraceDto:
+        pass
@@ -0,0 +1,40 @@
+import threading
+from collections import deque
+from typing import Sequence
+
+from app.exceptions.not_found_exception import NotFoundException
+from app.jobs.alarm_tracer.alarm_trace import AlarmTrace
+from app.jobs.alarm_tracer.alarm_tracer import AlarmTracer
+from app.models.alarm_trace import AlarmTraceDto
+from app.models.enums.alarm_stage import AlarmStage
+
+
+# Only the last max_traces alarms are kept, in memory
+class AlarmTracerImpl(AlarmTracer):
+    def __init__(self, max_traces: int = 100):
+        self.traces = deque(maxlen=max_traces)
+        self.lock = threading.Lock()
+
+
+    def start_trace(self, sensor: str, edge_timestamp: int, dispatched_at: int) -> AlarmTrace:
+        trace = AlarmTrace(sensor)
+        trace.mark(AlarmStage.EDGE, edge_timestamp)
+        trace.mark(AlarmStage.DISPATCH, dispatched_at)
+        with self.lock:
+            self.traces.append(trace)
+        return trace
+
+
+    # Most recent first
+    def get_traces(self) -> Sequence[AlarmTraceDto]:
+        with self.lock:
+            traces = list(self.traces)
+        return [trace.to_dto() for trace in reversed(traces)]
+
+
+    def get_trace(self, trace_id: str) -> AlarmTraceDto:
+        with self.lock:
+            trace = next((trace for trace in self.traces if trace.id == trace_id), None)
+        if trace is None:
+            raise NotFoundException("Alarm trace was not found")
+        return trace.to_dto()
@@ -0,0 +1,13 @@
+from abc import abstractmethod
+
+from rabbitmq_sdk.event.base_event import BaseEvent
+
+
+class EventPublisher:
+    @abstractmethod
+    def stop(self):
+        pass
+
+    @abstractmethod
+    def publish(self, event: BaseEvent):
+        pass
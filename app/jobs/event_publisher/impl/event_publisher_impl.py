@@ -0,0 +1,140 @@
+import queue
+import threading
+import time
+
+from prometheus_client import Counter, Gauge, Histogram
+from rabbitmq_sdk.client.rabbitmq_client import RabbitMQClient
+from rabbitmq_sdk.event.base_event import BaseEvent
+
+from app.jobs.event_publisher.event_publisher import EventPublisher
+from app.jobs.event_publisher.impl.event_spool import EventSpool
+
+QUEUE_DEPTH = Gauge("events_publisher_queue_depth", "Events waiting to be written to the spool")
+SPOOL_PENDING_BYTES = Gauge("events_publisher_spool_pending_bytes", "Spooled events not published to RabbitMQ yet")
+SPOOL_WRITE_BATCH = Histogram(
+    "events_publisher_spool_batch_size",
+    "Events written to the spool with a single fsync",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500)
+)
+PUBLISH_LATENCY = Histogram(
+    "events_publisher_latency_seconds",
+    "Time from an event being enqueued to it being published to RabbitMQ",
+    ["event"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60)
+)
+PUBLISHED = Counter("events_publisher_published_total", "Events published to RabbitMQ", ["event"])
+FAILURES = Counter("events_publisher_failures_total", "Failed attempts to publish an event to RabbitMQ", ["event"])
+DROPPED = Counter("events_publisher_dropped_total", "Events never spooled because the queue was full", ["event"])
+
+
+# Callers only enqueue events and return. A writer thread appends whatever is queued to the spool file with a single
+# fsync (up to batch_size events), and a sender thread publishes spooled events in order, retrying a failed publish
+# with exponential backoff before moving on to the next one. So a broker outage delays events but never reorders them
+# (an AlarmWaiting(False) can't overtake its AlarmWaiting(True)), never blocks the sensor sampler or an HTTP request,
+# and events still in the spool when the application stops are published on the next start.
+# Batching only applies to the spool: RabbitMQClient of the SDK publishes a single event per call (it returns whether
+# that one made it, there is no batch publish or publisher confirm to wait on for several), so the sender still
+# publishes one event at a time, just without waiting on the disk or the callers.
+class EventPublisherImpl(EventPublisher):
+    def __init__(self,
+                 rabbitmq_client: RabbitMQClient,
+                 spool: EventSpool,
+                 max_queued: int = 1000,
+                 batch_size: int = 50,
+                 initial_backoff_seconds: float = 0.1,
+                 max_backoff_seconds: float = 10,
+                 drain_timeout_seconds: float = 5):
+        self.rabbitmq_client = rabbitmq_client
+        self.spool = spool
+        self.batch_size = batch_size
+        self.initial_backoff = initial_backoff_seconds
+        self.max_backoff = max_backoff_seconds
+        self.drain_timeout = drain_timeout_seconds
+        self.drain_deadline = None
+        self.events = queue.Queue(maxsize=max_queued)
+        QUEUE_DEPTH.set_function(self.events.qsize)
+        SPOOL_PENDING_BYTES.set_function(self.spool.pending_bytes)
+        self.stopped = threading.Event()
+        self.writer_thread = threading.Thread(target=self.spool_events)
+        self.sender_thread = threading.Thread(target=self.send_events)
+        self.writer_thread.start()
+        self.sender_thread.start()
+
+
+    # Everything queued gets spooled, then publishing goes on for at most drain_timeout_seconds and what is left
+    # stays in the spool for the next start
+    def stop(self):
+        self.drain_deadline = time.monotonic() + self.drain_timeout
+        self.stopped.set()
+        self.writer_thread.join()
+        self.sender_thread.join()
+        self.spool.close()
+
+
+    def publish(self, event: BaseEvent):
+        try:
+            self.events.put_nowait((time.time(), event))
+        except queue.Full:
+            DROPPED.labels(type(event).__name__).inc()
+            print(f"Events publisher queue is full, dropping {type(event).__name__}")
+
+
+    def spool_events(self):
+        while not self.stopped.is_set() or not self.events.empty():
+            batch = self.collect_batch()
+            if batch:
+                self.spool.append_all(batch)
+                SPOOL_WRITE_BATCH.observe(len(batch))
+
+
+    def collect_batch(self):
+        try:
+            batch = [self.events.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.events.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+
+    def send_events(self):
+        while not self.stopped.is_set() or (self.writer_thread.is_alive() or self.spool.pending_bytes() > 0):
+            if self.drain_deadline is not None and time.monotonic() >= self.drain_deadline:
+                return
+            spooled = self.spool.next_event(timeout=0.5)
+            if spooled is None:
+                continue
+            enqueued_at, event, end_offset = spooled
+            if not self.publish_with_retry(enqueued_at, event):
+                return
+            self.spool.commit(end_offset)
+
+
+    # False if the drain timeout ran out while the broker kept failing
+    def publish_with_retry(self, enqueued_at: float, event: BaseEvent) -> bool:
+        name = type(event).__name__
+        backoff = self.initial_backoff
+        while True:
+            try:
+                published = self.rabbitmq_client.publish(event)
+            except Exception as e:
+                print(f"Error while publishing {name}: {e}")
+                published = False
+
+            if published:
+                PUBLISH_LATENCY.labels(name).observe(max(0.0, time.time() - enqueued_at))
+                PUBLISHED.labels(name).inc()
+                return True
+
+            FAILURES.labels(name).inc()
+            if self.drain_deadline is not None:
+                remaining = self.drain_deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                backoff = min(backoff, remaining)
+            time.sleep(backoff)
+            backoff = min(backoff * 2, self.max_backoff)
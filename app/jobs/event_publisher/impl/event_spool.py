@@ -0,0 +1,147 @@
+import os
+import pickle
+import struct
+import threading
+from typing import Optional, Sequence, Tuple
+
+from rabbitmq_sdk.event.base_event import BaseEvent
+
+HEADER = struct.Struct(">I")
+
+
+# Append-only file of events not yet published, so they survive broker outages and restarts.
+# Records are a 4 bytes length followed by the pickled (enqueue epoch, event). Writers append whole batches with a
+# single write and fsync (group commit); the publisher reads records in order from the offset of the first one not
+# published yet, which is kept in a side file. A record that can't be unpickled (corrupted, or written by a version
+# with other event classes) is skipped so it doesn't hold up the ones after it.
+# Delivery guarantees, what the application promises about events across a crash or power loss:
+# - Records can be read as soon as they are written and the fsync runs after that, which keeps the fsync (tens of ms
+#   on an SD card) out of the time it takes an AlarmWaiting to reach the broker. So an event may be published before
+#   it is on disk, and the events of a batch whose fsync didn't complete are lost from the spool whether they were
+#   published or not: at most one batch, the ones enqueued in the last moments before the crash.
+# - The offset is written and fsynced every offset_sync_interval published events, so events on disk are published at
+#   least once: after a crash up to that many may be published a second time.
+# Once everything written is published and the file grew past truncate_bytes it is truncated back to empty, after the
+# offset went back to 0 on disk, so truncating costs an offset fsync once in a while rather than after every event.
+class EventSpool:
+    def __init__(self, path: str, offset_sync_interval: int = 64, truncate_bytes: int = 1024 * 1024):
+        self.path = path
+        self.offset_path = f"{path}.offset"
+        self.offset_sync_interval = offset_sync_interval
+        self.truncate_bytes = truncate_bytes
+        self.unsynced_commits = 0
+        self.condition = threading.Condition()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        self.write_offset = self.recover()
+        self.read_offset = min(self.read_stored_offset(), self.write_offset)
+
+
+    def close(self):
+        with self.condition:
+            self.sync_offset()
+            os.close(self.fd)
+
+
+    # Length of the complete records on disk, a record torn by a crash while it was written is cut off
+    def recover(self) -> int:
+        size = os.fstat(self.fd).st_size
+        offset = 0
+        while offset + HEADER.size <= size:
+            length, = HEADER.unpack(os.pread(self.fd, HEADER.size, offset))
+            if offset + HEADER.size + length > size:
+                break
+            offset += HEADER.size + length
+        if offset != size:
+            print(f"Dropping {size - offset} bytes of torn record at the end of {self.path}")
+            os.ftruncate(self.fd, offset)
+        return offset
+
+
+    def read_stored_offset(self) -> int:
+        try:
+            with open(self.offset_path) as file:
+                return int(file.read().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+
+    def pending_bytes(self) -> int:
+        return self.write_offset - self.read_offset
+
+
+    # Events come with the epoch they were enqueued at
+    def append_all(self, events: Sequence[Tuple[float, BaseEvent]]):
+        records = []
+        for enqueued_at, event in events:
+            try:
+                payload = pickle.dumps((enqueued_at, event))
+            except Exception as e:
+                print(f"Can't spool {type(event).__name__}: {e}")
+                continue
+            records.append(HEADER.pack(len(payload)))
+            records.append(payload)
+        if not records:
+            return
+
+        data = b"".join(records)
+        with self.condition:
+            os.pwrite(self.fd, data, self.write_offset)
+            self.write_offset += len(data)
+            self.condition.notify_all()
+        # Outside the lock, the sender reads and commits meanwhile
+        os.fsync(self.fd)
+
+
+    # Oldest event not published yet with its enqueue epoch and the offset right after it, or None if nothing was
+    # written within timeout
+    def next_event(self, timeout: float) -> Optional[Tuple[float, BaseEvent, int]]:
+        while True:
+            with self.condition:
+                if self.read_offset >= self.write_offset:
+                    self.condition.wait(timeout)
+                if self.read_offset >= self.write_offset:
+                    return None
+                offset = self.read_offset
+                length, = HEADER.unpack(os.pread(self.fd, HEADER.size, offset))
+                payload = os.pread(self.fd, length, offset + HEADER.size)
+
+            end_offset = offset + HEADER.size + length
+            try:
+                enqueued_at, event = pickle.loads(payload)
+                return enqueued_at, event, end_offset
+            except Exception as e:
+                print(f"Skipping unreadable event at offset {offset} of {self.path}: {e}")
+                self.commit(end_offset)
+
+
+    # Marks everything before end_offset as published
+    def commit(self, end_offset: int):
+        with self.condition:
+            self.read_offset = end_offset
+            self.unsynced_commits += 1
+            if self.read_offset == self.write_offset and self.write_offset >= self.truncate_bytes:
+                # Offset goes back to 0 on disk before truncating, a crash in between replays the spool instead of
+                # reading from a stale offset in a new generation of the file
+                self.read_offset = 0
+                self.write_offset = 0
+                self.sync_offset()
+                os.ftruncate(self.fd, 0)
+            elif self.unsynced_commits >= self.offset_sync_interval:
+                self.sync_offset()
+
+
+    def sync_offset(self):
+        temporary_path = f"{self.offset_path}.tmp"
+        with open(temporary_path, "w") as file:
+            file.write(str(self.read_offset))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary_path, self.offset_path)
+        # The rename is only on disk once the directory is
+        directory = os.open(os.path.dirname(self.offset_path) or ".", os.O_RDONLY)
+        try:
+            os.fsync(directory)
+        finally:
+            os.close(directory)
+        self.unsynced_commits = 0
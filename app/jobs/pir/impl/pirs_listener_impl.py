@@ -1,84 +1,170 @@
 import threading
 import time
-from typing import Dict
+from typing import Dict, Optional, Sequence
 
 try:
     import RPi.GPIO as GPIO
 except:
     from app.models.mock.GpioMock import GpioMock as GPIO
 
+from app.exceptions.not_found_exception import NotFoundException
 from app.exceptions.pirs_listener_exception import PirsListenerException
 from app.jobs.alarm.alarm_manager import AlarmManager
 from app.jobs.pir.pirs_listener import PirsListener
+from app.jobs.sensor.sensor_handler import SensorHandler
+from app.jobs.sensor.sensor_sampler import SensorSampler
+from app.jobs.sensor_event.sensor_events_writer import SensorEventsWriter
 from app.models.enums.pir_status import PirStatus
+from app.models.enums.sensor_type import SensorType
 from app.models.pir import Pir
-from app.repositories.pir.pir_repository import PirRepository
+from app.models.sensor_event import SensorEventDto
+from app.models.sensor_status import SensorStatusDto
+from app.models.sensor_transition import SensorTransition
+from app.utils.bitmask import get_bit, iter_pins, pin_bit, set_bit
+from app.utils.monotonic_time import epoch_to_monotonic, monotonic_to_epoch
 
 
-def read_current_status(gpio_pin_number: int) -> PirStatus:
-    GPIO.setup(gpio_pin_number, GPIO.IN)
-    if GPIO.input(gpio_pin_number):
+def decode_status(value: int) -> PirStatus:
+    if value:
         return PirStatus.MOVEMENT
     else:
         return PirStatus.IDLE
 
 
-class PirsListenerImpl(PirsListener):
-    def __init__(self, alarm_manager: AlarmManager, pir_repository: PirRepository):
+# Pins are sampled by the shared sensor sampler, this only decodes their levels into PIR statuses and forwards
+# the changes to the alarm manager.
+# Statuses and configuration of all pirs are kept as bitmasks, one bit per pin, a pir is in movement when HIGH.
+class PirsListenerImpl(PirsListener, SensorHandler):
+    def __init__(self, alarm_manager: AlarmManager, sensor_sampler: SensorSampler, sensor_events_writer: SensorEventsWriter):
         self.alarm_manager = alarm_manager
-        self.pir_repository = pir_repository
-        self.pir_infos: Dict[int, PirStatus] = {}
-        self.running = True
-        self.thread = threading.Thread(target=self.monitor_pins)
-        self.thread.start()
-        GPIO.setmode(GPIO.BCM)
+        self.sensor_sampler = sensor_sampler
+        self.sensor_events_writer = sensor_events_writer
+        # Masks are written from the API threads and the sampler thread, every update goes through the lock
+        self.masks_lock = threading.Lock()
+        self.monitored_mask = 0
+        self.movement_mask = 0
+        # Mirror of name and listening flag of every monitored pir, kept up to date by the services that change them
+        # so that transitions can be dispatched without going to the database
+        self.listening_mask = 0
+        self.pir_names: Dict[int, str] = {}
 
 
     def stop(self):
-        self.running = False
-        self.thread.join()
-        GPIO.cleanup()
+        for pin in iter_pins(self.monitored_mask):
+            self.sensor_sampler.unregister_pin(pin)
+        with self.masks_lock:
+            self.monitored_mask = 0
+            self.movement_mask = 0
+            self.listening_mask = 0
+        self.pir_names.clear()
+
+
+    def is_monitored(self, gpio_pin_number: int) -> bool:
+        return get_bit(self.monitored_mask, gpio_pin_number) == 1
 
 
     def add_pir(self, pir: Pir):
-        if self.pir_infos.get(pir.gpio_pin_number) is None:
-            self.pir_infos[pir.gpio_pin_number] = read_current_status(pir.gpio_pin_number)
+        if not self.is_monitored(pir.gpio_pin_number):
+            value = self.sensor_sampler.register_pin(pir.gpio_pin_number, GPIO.PUD_OFF, pir.debounce_ms, self)
+            self.pir_names[pir.gpio_pin_number] = pir.name
+            self.set_masks(pir, value)
         else:
             raise PirsListenerException(f"Pir with pin {pir.gpio_pin_number} already being monitored")
 
 
     def update_pir(self, pir: Pir):
-        if self.pir_infos.get(pir.gpio_pin_number) is None:
+        if not self.is_monitored(pir.gpio_pin_number):
             raise PirsListenerException(f"Pir with pin {pir.gpio_pin_number} not being monitored")
         else:
-            self.pir_infos[pir.gpio_pin_number] = read_current_status(pir.gpio_pin_number)
+            self.pir_names[pir.gpio_pin_number] = pir.name
+            value = self.sensor_sampler.update_pin(pir.gpio_pin_number, GPIO.PUD_OFF, pir.debounce_ms)
+            self.set_masks(pir, value)
+
+
+    def set_masks(self, pir: Pir, value: int):
+        pin = pir.gpio_pin_number
+        with self.masks_lock:
+            self.monitored_mask = set_bit(self.monitored_mask, pin, True)
+            self.movement_mask = set_bit(self.movement_mask, pin, value)
+            self.listening_mask = set_bit(self.listening_mask, pin, pir.listening)
 
 
     def remove_pir(self, pir: Pir):
-        if self.pir_infos.get(pir.gpio_pin_number) is None:
+        if not self.is_monitored(pir.gpio_pin_number):
             raise PirsListenerException(f"Pir with pin {pir.gpio_pin_number} not being monitored")
         else:
-            GPIO.cleanup(pir.gpio_pin_number)
-            del self.pir_infos[pir.gpio_pin_number]
+            self.sensor_sampler.unregister_pin(pir.gpio_pin_number)
+            pin = pir.gpio_pin_number
+            with self.masks_lock:
+                self.monitored_mask = set_bit(self.monitored_mask, pin, False)
+                self.movement_mask = set_bit(self.movement_mask, pin, False)
+                self.listening_mask = set_bit(self.listening_mask, pin, False)
+            del self.pir_names[pin]
+
+
+    def get_status_by_pin(self, gpio_pin_number: int) -> SensorStatusDto:
+        if not self.is_monitored(gpio_pin_number):
+            raise NotFoundException("Pir was not found")
+        else:
+            return self.to_status_dto(gpio_pin_number)
+
 
+    def get_all_statuses(self) -> Sequence[SensorStatusDto]:
+        return [self.to_status_dto(pin) for pin in iter_pins(self.monitored_mask)]
 
-    def get_status_by_pir(self, pir: Pir) -> PirStatus:
-        if self.pir_infos.get(pir.gpio_pin_number) is None:
+
+    # Built from the last sample of the sampler, so reading a status never touches the GPIO or the database
+    def to_status_dto(self, gpio_pin_number: int) -> SensorStatusDto:
+        value, sampled_at, changed_at = self.sensor_sampler.get_last_sample(gpio_pin_number)
+        now = time.monotonic_ns()
+        return SensorStatusDto(
+            gpio_pin_number=gpio_pin_number,
+            type=SensorType.PIR,
+            name=self.pir_names.get(gpio_pin_number),
+            status=decode_status(value),
+            age_ms=(now - sampled_at) // 1_000_000,
+            in_state_ms=(now - changed_at) // 1_000_000
+        )
+
+
+    def get_glitch_count_by_pir(self, pir: Pir) -> int:
+        if not self.is_monitored(pir.gpio_pin_number):
             raise PirsListenerException(f"Pir with pin {pir.gpio_pin_number} not being monitored")
         else:
-            return read_current_status(pir.gpio_pin_number)
+            return self.sensor_sampler.get_glitch_count(pir.gpio_pin_number)
 
 
-    def monitor_pins(self):
-        while self.running:
-            time.sleep(0.5) # check every half second
+    # Served from the in-memory history of the sampler, since is in epoch seconds
+    def get_events_by_pin(self, gpio_pin_number: int, since: Optional[float]) -> Sequence[SensorEventDto]:
+        if not self.is_monitored(gpio_pin_number):
+            raise NotFoundException("Pir was not found")
+        else:
+            transitions = self.sensor_sampler.get_transitions(gpio_pin_number, epoch_to_monotonic(since) if since is not None else 0)
+            return [SensorEventDto(timestamp=monotonic_to_epoch(timestamp), status=decode_status(value)) for timestamp, value in transitions]
 
-            for pin in self.pir_infos.keys():
-                current_status = read_current_status(pin)
-                if current_status != self.pir_infos.get(pin):
-                    self.pir_infos[pin] = current_status
 
-                    if self.pir_repository.find_by_gpio_pin_number(pin).listening:
-                        # Alarm manager should be interacted with only when alarm is on
-                        updated_pir = self.pir_repository.find_by_gpio_pin_number(pin)
-                        self.alarm_manager.on_pir_changed_status(updated_pir.gpio_pin_number, current_status)
+    def set_listening(self, pir: Pir, listening: bool):
+        if not self.is_monitored(pir.gpio_pin_number):
+            raise PirsListenerException(f"Pir with pin {pir.gpio_pin_number} not being monitored")
+        else:
+            self.pir_names[pir.gpio_pin_number] = pir.name
+            with self.masks_lock:
+                self.listening_mask = set_bit(self.listening_mask, pir.gpio_pin_number, listening)
+
+
+    def on_transition(self, transition: SensorTransition):
+        dispatched_at = time.monotonic_ns()
+        pin = transition.pin
+        bit = pin_bit(pin)
+        with self.masks_lock:
+            movement = bit if transition.value else 0
+            if movement == self.movement_mask & bit:
+                return
+            self.movement_mask ^= bit
+            listening = self.listening_mask & bit
+
+        current_status = decode_status(movement)
+        self.sensor_events_writer.record(pin, SensorType.PIR, current_status, transition.timestamp)
+        if listening:
+            # Alarm manager should be interacted with only when alarm is on
+            self.alarm_manager.on_pir_changed_status(pin, current_status, transition.timestamp, dispatched_at)
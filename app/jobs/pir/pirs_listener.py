@@ -1,7 +1,9 @@
 from abc import abstractmethod
+from typing import Optional, Sequence
 
-from app.models.enums.pir_status import PirStatus
 from app.models.pir import Pir
+from app.models.sensor_event import SensorEventDto
+from app.models.sensor_status import SensorStatusDto
 
 
 class PirsListener:
@@ -22,5 +24,21 @@ class PirsListener:
         pass
 
     @abstractmethod
-    def get_status_by_pir(self, pir: Pir) -> PirStatus:
+    def get_status_by_pin(self, gpio_pin_number: int) -> SensorStatusDto:
+        pass
+
+    @abstractmethod
+    def get_all_statuses(self) -> Sequence[SensorStatusDto]:
+        pass
+
+    @abstractmethod
+    def get_glitch_count_by_pir(self, pir: Pir) -> int:
+        pass
+
+    @abstractmethod
+    def get_events_by_pin(self, gpio_pin_number: int, since: Optional[float]) -> Sequence[SensorEventDto]:
+        pass
+
+    @abstractmethod
+    def set_listening(self, pir: Pir, listening: bool):
         pass
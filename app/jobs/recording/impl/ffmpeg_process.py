@@ -0,0 +1,114 @@
+import asyncio
+import collections
+import re
+import signal
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from app.exceptions.ffmpeg_exception import FfmpegException
+
+# How long ffmpeg gets to exit after each way of asking. 'q' is only read between packets, so a stalled stream never
+# sees it, SIGINT also interrupts a blocked read; both make ffmpeg write the trailer of its files before exiting.
+QUIT_SECONDS = 2
+INTERRUPT_SECONDS = 5
+# ffmpeg ends progress lines with a carriage return and the others with a newline
+LINE_END = re.compile(rb"[\r\n]+")
+# Last stderr lines put in the error when ffmpeg fails, the reason is usually there
+ERROR_LINES = 5
+
+
+# ffmpeg as an asyncio subprocess of our own: arguments come from a builder (python-ffmpeg only builds them), the
+# process handle is kept here so it can be stopped the way it is meant to be interactively, with stdin kept open until
+# it exits. stop asks with 'q', then SIGINT, then kills it, each time waiting at most the timeout above for done to
+# complete.
+# Progress comes from -progress on stdout, blocks of key=value lines (frame, fps, bitrate, total_size, drop_frames,
+# speed...) ended by progress=continue, about every half second; each block is passed to on_progress as a dict, on
+# the loop. stderr only has the log then, which is kept for errors.
+class FfmpegProcess:
+    def __init__(self, arguments: List[str], on_progress: Callable[[Dict[str, str]], None]):
+        self.arguments = [arguments[0], "-progress", "pipe:1", "-nostats", *arguments[1:]]
+        self.on_progress = on_progress
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.last_lines = collections.deque(maxlen=ERROR_LINES)
+
+
+    # Spawned and not exited yet
+    def is_running(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+
+
+    def get_pid(self) -> Optional[int]:
+        return None if self.process is None else self.process.pid
+
+
+    # Returns once ffmpeg exited, raises FfmpegException if it failed. Cancelling it kills ffmpeg
+    async def execute(self):
+        self.process = await asyncio.create_subprocess_exec(
+            *self.arguments,
+            stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+        try:
+            await asyncio.gather(self.read_progress(), self.read_stderr())
+            returncode = await self.process.wait()
+        except BaseException:
+            # Cancelled, or a progress handler failed: nothing reads its output anymore
+            self.kill()
+            raise
+        if returncode != 0:
+            raise FfmpegException(f"ffmpeg exited with {returncode}: {' / '.join(self.last_lines)}")
+
+
+    async def read_progress(self):
+        progress = {}
+        async for line in self.process.stdout:
+            key, _, value = line.decode(errors="replace").strip().partition("=")
+            progress[key] = value.strip()
+            if key == "progress":
+                self.on_progress(progress)
+                progress = {}
+
+
+    async def read_stderr(self):
+        pending = b""
+        while True:
+            chunk = await self.process.stderr.read(4096)
+            if not chunk:
+                break
+            *lines, pending = LINE_END.split(pending + chunk)
+            self.last_lines.extend(line.decode(errors="replace") for line in lines if line)
+        if pending:
+            self.last_lines.append(pending.decode(errors="replace"))
+
+
+    # Returns how ffmpeg was stopped, None when it is not running
+    async def stop(self, done: Awaitable) -> Optional[str]:
+        if not self.is_running():
+            return None
+        done = asyncio.ensure_future(done)
+        steps = [
+            ("q", self.quit, QUIT_SECONDS),
+            ("SIGINT", lambda: self.process.send_signal(signal.SIGINT), INTERRUPT_SECONDS),
+            ("SIGKILL", self.kill, None),
+        ]
+        for stopped_by, ask, timeout in steps:
+            try:
+                ask()
+            except ProcessLookupError:
+                # Exited meanwhile
+                pass
+            finished, _ = await asyncio.wait({done}, timeout=timeout)
+            if finished:
+                return stopped_by
+
+
+    def quit(self):
+        try:
+            self.process.stdin.write(b"q")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+    def kill(self):
+        if self.is_running():
+            try:
+                self.process.kill()
+            except ProcessLookupError:
+                pass
@@ -0,0 +1,46 @@
+import asyncio
+import os
+import sys
+import threading
+from concurrent.futures import Future
+from typing import Coroutine
+
+
+# A single thread running a single event loop for every ffmpeg subprocess (recordings and pre-roll buffers), so adding
+# cameras adds coroutines, not threads. Anything blocking (database, file copies) has to leave the loop through
+# run_in_executor.
+# Before Python 3.12 asyncio waits for every subprocess from a thread of its own unless told otherwise, a pidfd child
+# watcher attached to this loop waits for all of them from the loop instead. The child watcher is process wide: while
+# the supervisor runs, an asyncio subprocess started on any other loop would be waited for by this one, from the
+# wrong thread, and could not be started at all once it is stopped. So asyncio subprocesses are only ever created on
+# this loop (through submit or run, like ffmpeg recordings, pre-roll buffers and segment joins), anywhere else in the
+# application has to use subprocess instead. The previous watcher is put back when the supervisor stops.
+class FfmpegSupervisor:
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.watcher = None
+        self.previous_watcher = None
+        if sys.version_info < (3, 12) and hasattr(os, "pidfd_open"):
+            self.previous_watcher = asyncio.get_child_watcher()
+            self.watcher = asyncio.PidfdChildWatcher()
+            self.watcher.attach_loop(self.loop)
+            asyncio.set_child_watcher(self.watcher)
+        self.thread = threading.Thread(target=self.loop.run_forever, name="ffmpeg-supervisor", daemon=True)
+        self.thread.start()
+
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        if self.watcher is not None:
+            asyncio.set_child_watcher(self.previous_watcher)
+            self.watcher.close()
+
+
+    def submit(self, coroutine: Coroutine) -> Future:
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+
+    # Runs coroutine on the loop and waits for it, must not be called from the loop itself
+    def run(self, coroutine: Coroutine):
+        return self.submit(coroutine).result()
@@ -0,0 +1,284 @@
+import asyncio
+import os
+import shutil
+import threading
+import time
+from typing import Dict, List, Optional, Set
+
+from ffmpeg import FFmpeg
+
+from app.jobs.recording.impl.ffmpeg_supervisor import FfmpegSupervisor
+from app.jobs.recording.impl.ffmpeg_process import FfmpegProcess
+from app.models.camera import Camera
+from app.models.recording import Recording, get_pre_roll_path
+
+SEGMENT_SECONDS = 1
+# Waiting for the segment being written when capture stops, segments are cut on keyframes so this is the longest
+# keyframe interval expected from a camera
+SEGMENT_WAIT_SECONDS = 10
+# Joining is a stream copy bound by the disk, an SD card writes a long alarm in well under this
+JOIN_TIMEOUT_SECONDS = 300
+
+
+# Segments taken from the buffer for an alarm recording, from first to last once capture stopped
+class Capture:
+    def __init__(self, recording: Recording, first: str, parts_path: str):
+        self.recording = recording
+        self.first = first
+        self.parts_path = parts_path
+        self.stopped = False
+        self.last: Optional[str] = None
+
+
+    def covers(self, name: str) -> bool:
+        return name >= self.first and (not self.stopped or (self.last is not None and name <= self.last))
+
+
+# Keeps the stream of a camera connected and its last pre_roll_seconds in RAM, so an alarm recording can start with
+# what happened before the alarm fired instead of with the seconds lost to RTSP negotiation.
+# ffmpeg stream copies (no decoding or encoding) into short matroska segments on tmpfs, cut on keyframes, and segments
+# older than the pre-roll are deleted on every progress event. Memory per camera is about
+# bitrate * (pre_roll_seconds + keyframe interval), e.g. 5.5 MB for a 4 Mbit/s camera with 10 seconds and a keyframe
+# every second, and never more than max_bytes: the oldest segments go first past that.
+# While an alarm is captured, finished segments are moved to disk next to the recording instead of being deleted, so
+# RAM stays bounded however long the alarm lasts, and they are joined (stream copied again) into the recording file
+# once capture stops.
+# ffmpeg is restarted by a coroutine on the loop of the supervisor, pruning touches the file system so it runs on an
+# executor thread, one at a time. Stopping a capture returns right away: the segment being written is waited for
+# (every progress event sets an asyncio.Event) and the segments are joined by a coroutine on the same loop, so the
+# recording is stopped in the database while its file is still being written.
+class PreRollBuffer:
+    def __init__(self, supervisor: FfmpegSupervisor, camera: Camera, max_bytes: int):
+        self.supervisor = supervisor
+        self.camera = camera
+        self.max_bytes = max_bytes
+        self.buffer_path = os.path.join(get_pre_roll_path(), camera.ip)
+        self.lock = threading.Lock()
+        self.running = True
+        self.ffmpeg: Optional[FfmpegProcess] = None
+        self.task: Optional[asyncio.Task] = None
+        self.pruning = False
+        # Segment names start with the number of the ffmpeg process, so they keep sorting in order across restarts
+        self.generation = 0
+        # Captures not joined yet, only the last one can still be going on
+        self.captures: List[Capture] = []
+        self.finishing: Set[asyncio.Task] = set()
+        self.progressed: Optional[asyncio.Event] = None
+
+
+    def start(self):
+        shutil.rmtree(self.buffer_path, ignore_errors=True)
+        os.makedirs(self.buffer_path)
+        self.supervisor.run(self.create_task())
+
+
+    async def create_task(self):
+        self.progressed = asyncio.Event()
+        self.task = asyncio.get_running_loop().create_task(self.run())
+
+
+    async def run(self):
+        while self.running:
+            await self.start_ffmpeg()
+            # Captures waiting for a segment to be finished won't get one from this ffmpeg
+            self.progressed.set()
+            if self.running:
+                await asyncio.sleep(1)
+
+
+    async def start_ffmpeg(self):
+        try:
+            arguments = (
+                FFmpeg()
+                .option("y")
+                .input(
+                    f"rtsp://{self.camera.username}:{self.camera.password}@{self.camera.ip}:{self.camera.port}/{self.camera.path}",
+                    rtsp_transport="udp",
+                )
+                .output(
+                    os.path.join(self.buffer_path, f"{self.generation:04d}_%08d.mkv"),
+                    vcodec="copy", an=None, f="segment", segment_time=SEGMENT_SECONDS, segment_format="matroska",
+                    reset_timestamps=1)
+            ).arguments
+            self.ffmpeg = FfmpegProcess(arguments, self.on_ffmpeg_progress)
+            await self.ffmpeg.execute()
+
+        except asyncio.CancelledError:
+            return
+        except Exception as e:
+            print(f"Error from FFmpeg buffering pre-roll of camera on {self.camera.ip}:", e)
+        self.generation += 1
+
+
+    def on_ffmpeg_progress(self, progress: Dict[str, str]):
+        self.progressed.set()
+        if not self.pruning:
+            self.pruning = True
+            asyncio.get_running_loop().run_in_executor(None, self.prune)
+
+
+    def stop(self):
+        self.supervisor.run(self.terminate())
+        shutil.rmtree(self.buffer_path, ignore_errors=True)
+
+
+    async def terminate(self):
+        self.running = False
+        if self.task is not None and not self.task.done():
+            if self.ffmpeg is None or await self.ffmpeg.stop(self.task) is None:
+                # Not spawned, or waiting to be restarted
+                self.task.cancel()
+                await asyncio.wait({self.task})
+        # Captures stopped before get what was written of them joined
+        if self.finishing:
+            await asyncio.wait(set(self.finishing))
+
+
+    # Oldest first, the last one is still being written
+    def get_segments(self) -> List[str]:
+        try:
+            return sorted(name for name in os.listdir(self.buffer_path) if name.endswith(".mkv"))
+        except FileNotFoundError:
+            return []
+
+
+    def prune(self):
+        try:
+            with self.lock:
+                segments = self.move_captured(self.get_segments()[:-1])
+                if any(not capture.stopped for capture in self.captures):
+                    # Older than the capture going on, it won't be needed as pre-roll anymore
+                    self.delete(segments)
+                    return
+
+                # Finished segments end about when they were last written, the newest one ending before the pre-roll
+                # window still has its last seconds
+                threshold = time.time() - self.camera.pre_roll_seconds
+                paths = [os.path.join(self.buffer_path, name) for name in segments]
+                ended_before = [name for name, path in zip(segments, paths) if os.path.getmtime(path) < threshold]
+                self.delete(ended_before[:-1])
+
+                segments = self.get_segments()
+                sizes = [os.path.getsize(os.path.join(self.buffer_path, name)) for name in segments]
+                while len(segments) > 1 and sum(sizes) > self.max_bytes:
+                    self.delete([segments.pop(0)])
+                    sizes.pop(0)
+        finally:
+            self.pruning = False
+
+
+    def delete(self, names: List[str]):
+        for name in names:
+            try:
+                os.remove(os.path.join(self.buffer_path, name))
+            except FileNotFoundError:
+                pass
+
+
+    # Moves the segments of a capture to its parts and returns the others. An alarm starting again right after one
+    # stopped shares its pre-roll with the end of the previous one, those segments are copied to both.
+    def move_captured(self, names: List[str]) -> List[str]:
+        remaining = []
+        for name in names:
+            captures = [capture for capture in self.captures if capture.covers(name)]
+            if not captures:
+                remaining.append(name)
+                continue
+            path = shutil.move(os.path.join(self.buffer_path, name), os.path.join(captures[0].parts_path, name))
+            for capture in captures[1:]:
+                shutil.copyfile(path, os.path.join(capture.parts_path, name))
+        return remaining
+
+
+    # ffmpeg is connected to the camera and wrote some of its stream, an alarm recording can be taken from here
+    def is_buffering(self) -> bool:
+        return self.is_running() and len(self.get_segments()) > 0
+
+
+    def is_running(self) -> bool:
+        return self.ffmpeg is not None and self.ffmpeg.is_running()
+
+
+    # What is in the buffer now becomes the start of the recording, False if there is nothing in it yet
+    def start_capture(self, recording: Recording) -> bool:
+        with self.lock:
+            segments = self.get_segments()
+            first = segments[0] if segments else f"{self.generation:04d}_"
+            capture = Capture(recording, first, os.path.join(recording.path, f".{recording.name}.parts"))
+            os.makedirs(capture.parts_path, exist_ok=True)
+            self.captures.append(capture)
+            return len(segments) > 0
+
+
+    # Returns right away, the recording file is written by finish_capture on the loop of the supervisor
+    def stop_capture(self):
+        with self.lock:
+            capture = next((capture for capture in self.captures if not capture.stopped), None)
+            if capture is None:
+                return
+            segments = self.get_segments()
+            capture.stopped = True
+            capture.last = segments[-1] if segments else None
+        self.supervisor.submit(self.finish_capture(capture))
+
+
+    async def finish_capture(self, capture: Capture):
+        task = asyncio.current_task()
+        self.finishing.add(task)
+        try:
+            loop = asyncio.get_running_loop()
+            # The segment being written when the alarm stopped is included once ffmpeg moved to the next one
+            deadline = loop.time() + SEGMENT_WAIT_SECONDS
+            while capture.last is not None and self.is_running():
+                self.progressed.clear()
+                segments = await loop.run_in_executor(None, self.get_segments)
+                if segments[-1:] != [capture.last]:
+                    break
+                try:
+                    await asyncio.wait_for(self.progressed.wait(), max(0.0, deadline - loop.time()))
+                except asyncio.TimeoutError:
+                    break
+
+            await loop.run_in_executor(None, self.end_capture, capture)
+            await join_segments(capture.parts_path, os.path.join(capture.recording.path, capture.recording.name))
+        except Exception as e:
+            print(f"Error while writing pre-roll recording {capture.recording.name}: {e}")
+        finally:
+            self.finishing.discard(task)
+
+
+    def end_capture(self, capture: Capture):
+        with self.lock:
+            self.move_captured([name for name in self.get_segments() if capture.covers(name)])
+            self.captures.remove(capture)
+
+
+async def join_segments(parts_path: str, file_path: str):
+    loop = asyncio.get_running_loop()
+    list_path = await loop.run_in_executor(None, write_parts_list, parts_path)
+    if list_path is not None:
+        process = await asyncio.create_subprocess_exec(
+            "ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", list_path, "-c", "copy", "-f", "matroska", file_path,
+            stdin=asyncio.subprocess.DEVNULL, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE)
+        try:
+            _, stderr = await asyncio.wait_for(process.communicate(), JOIN_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            stderr = f"not done after {JOIN_TIMEOUT_SECONDS} seconds".encode()
+        if process.returncode != 0:
+            # Segments are left where they are, they still have the footage
+            print(f"Error from FFmpeg joining pre-roll segments into {file_path}: {stderr.decode(errors='replace')[-500:]}")
+            return
+    await loop.run_in_executor(None, shutil.rmtree, parts_path, True)
+
+
+# Concat demuxer list of the segments in parts_path, None if there are none
+def write_parts_list(parts_path: str) -> Optional[str]:
+    parts = sorted(name for name in os.listdir(parts_path) if name.endswith(".mkv"))
+    if not parts:
+        return None
+    list_path = os.path.join(parts_path, "parts.txt")
+    with open(list_path, "w") as file:
+        file.writelines(f"file '{os.path.join(parts_path, name)}'\n" for name in parts)
+    return list_path
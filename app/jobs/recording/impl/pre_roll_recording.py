@@ -0,0 +1,39 @@
+from typing import Optional
+
+from app.jobs.recording.impl.pre_roll_buffer import PreRollBuffer
+from app.models.recording import Recording
+from app.models.recording_stats import RecordingStatsDto
+
+
+# Alarm recording of a camera with a pre-roll buffer: no ffmpeg of its own, the buffer already connected to the
+# stream keeps what it has and what comes next until stopped. Same interface as RecordingProcess for the manager.
+class PreRollRecording:
+    def __init__(self, pre_roll: PreRollBuffer, recording: Recording, on_started_callback=None):
+        self.pre_roll = pre_roll
+        self.recording = recording
+        self.on_started_callback = on_started_callback
+
+
+    # The manager only takes the recording from a buffer that has segments, so frames are already there unless ffmpeg
+    # lost them in between; then it is not reported as started
+    def start(self):
+        if self.pre_roll.start_capture(self.recording) and self.on_started_callback is not None:
+            self.on_started_callback(self.recording)
+
+
+    # Returns right away, the file is written by the buffer once the segment being recorded is finished
+    def stop(self):
+        self.pre_roll.stop_capture()
+
+
+    def is_writing(self, name: str) -> bool:
+        return name == self.recording.name
+
+
+    def is_recording(self, recording: Recording) -> bool:
+        return recording.id == self.recording.id
+
+
+    # The ffmpeg of the buffer is not this recording's
+    def get_stats(self) -> Optional[RecordingStatsDto]:
+        return None
@@ -0,0 +1,247 @@
+import asyncio
+import os
+import time
+from typing import Dict, Optional
+
+from ffmpeg import FFmpeg
+from prometheus_client import Gauge, Histogram
+
+from app.jobs.recording.impl.ffmpeg_supervisor import FfmpegSupervisor
+from app.jobs.recording.impl.ffmpeg_process import FfmpegProcess
+from app.models.camera import Camera
+from app.models.enums.recording_profile import RecordingProfile
+from app.models.enums.recording_state import RecordingState
+from app.models.recording import Recording
+from app.models.recording_stats import RecordingStatsDto
+from app.utils.process_cpu import ProcessCpu
+
+RECORDING_CPU = Gauge(
+    "recording_cpu_percent",
+    "CPU used by the ffmpeg recording each camera, 100 is a full core",
+    ["camera", "profile"]
+)
+RECORDING_STOP = Histogram(
+    "recording_stop_seconds",
+    "Time from asking a recording to stop to its files being complete, by how ffmpeg was stopped",
+    ["stopped_by"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 3, 5, 8, 13)
+)
+RECORDING_FPS = Gauge("recording_fps", "Frames per second ffmpeg is writing for each camera", ["camera"])
+RECORDING_SPEED = Gauge(
+    "recording_speed",
+    "Media time written per second for each camera, below 1 is slower than real time",
+    ["camera"]
+)
+RECORDING_BITRATE = Gauge("recording_bitrate_kbps", "Bitrate of the recording of each camera", ["camera"])
+RECORDING_DROPPED_FRAMES = Gauge(
+    "recording_dropped_frames",
+    "Frames dropped by the ffmpeg recording each camera since it started",
+    ["camera"]
+)
+RECORDING_DUPLICATED_FRAMES = Gauge(
+    "recording_duplicated_frames",
+    "Frames duplicated by the ffmpeg recording each camera since it started",
+    ["camera"]
+)
+RECORDING_SIZE = Gauge(
+    "recording_size_bytes",
+    "Bytes written by the ffmpeg recording each camera since it started",
+    ["camera"]
+)
+STATS_GAUGES = (
+    RECORDING_FPS, RECORDING_SPEED, RECORDING_BITRATE,
+    RECORDING_DROPPED_FRAMES, RECORDING_DUPLICATED_FRAMES, RECORDING_SIZE
+)
+CPU_SAMPLE_SECONDS = 5
+
+
+# Number in a -progress value, without its unit ("12.5kbits/s", "0.98x"), 0 while ffmpeg reports N/A
+def get_number(progress: Dict[str, str], key: str, unit: str = "") -> float:
+    value = progress.get(key, "")
+    if unit and value.endswith(unit):
+        value = value[:-len(unit)]
+    try:
+        return float(value)
+    except ValueError:
+        return 0
+
+
+# With segment_seconds the segment muxer writes a new matroska file every segment_seconds, aligned on the clock
+def get_output_options(profile: RecordingProfile, segment_seconds: Optional[int] = None) -> dict:
+    if profile == RecordingProfile.COPY:
+        options = dict(vcodec="copy", an=None)
+    else:
+        options = dict(vcodec="libx264", vf="fps=4", preset="fast", an=None, reset_timestamps=1)
+
+    if segment_seconds is None:
+        return dict(options, f="matroska", cluster_time_limit=5000)
+    return dict(options, f="segment", segment_format="matroska", segment_format_options="cluster_time_limit=5000",
+                segment_time=segment_seconds, segment_atclocktime=1, reset_timestamps=1)
+
+
+# The ffmpeg recording a camera, run as a coroutine on the loop of the supervisor. start and stop are called from
+# other threads, stop waits until ffmpeg exited and wrote the trailer of the file, for a bounded time (see
+# FfmpegProcess) even when the stream stalled.
+# The error callback gets the recording and whether it failed in COPY mode before writing anything, in which case the
+# camera stream is most likely not something matroska can take as is and should be transcoded. It runs on an executor
+# thread, like every callback that may block.
+# Every progress block replaces stats with a new snapshot, readers on other threads take it as is without locking.
+class RecordingProcess:
+    def __init__(self,
+                 supervisor: FfmpegSupervisor,
+                 camera: Camera,
+                 recording: Recording,
+                 on_error_callback,
+                 on_started_callback=None,
+                 profile: RecordingProfile = RecordingProfile.TRANSCODE):
+        self.supervisor = supervisor
+        self.camera = camera
+        self.recording = recording
+        self.on_error_callback = on_error_callback
+        # Called once with the recording on the first progress of ffmpeg, when frames are actually being written
+        self.on_started_callback = on_started_callback
+        self.profile = profile
+        self.file_path = os.path.join(recording.path, recording.name)
+        self.output_options = get_output_options(profile)
+        self.state = RecordingState.STARTING
+        self.ffmpeg: Optional[FfmpegProcess] = None
+        self.task: Optional[asyncio.Task] = None
+        self.cpu = None
+        self.cpu_sampled_at = 0
+        self.stats: Optional[RecordingStatsDto] = None
+        self.stats_gauges = None
+
+
+    def start(self):
+        self.supervisor.run(self.create_task())
+
+
+    async def create_task(self):
+        self.task = asyncio.get_running_loop().create_task(self.run())
+
+
+    def stop(self):
+        self.supervisor.run(self.terminate())
+
+
+    async def terminate(self):
+        if self.task is None or self.task.done():
+            return
+        self.state = RecordingState.STOPPING
+        started = time.monotonic()
+        stopped_by = None if self.ffmpeg is None else await self.ffmpeg.stop(self.task)
+        if stopped_by is None:
+            # Not spawned yet, or already exited with an error
+            self.task.cancel()
+            await asyncio.wait({self.task})
+            stopped_by = "cancel"
+        RECORDING_STOP.labels(stopped_by).observe(time.monotonic() - started)
+
+
+    async def run(self):
+        try:
+            await self.start_ffmpeg()
+            self.state = RecordingState.STOPPED
+        except asyncio.CancelledError:
+            self.state = RecordingState.STOPPED
+        except Exception as e:
+            if self.state == RecordingState.STOPPING:
+                self.state = RecordingState.STOPPED
+                return
+            print("Error from FFmpeg:", e)
+            copy_failed = self.profile == RecordingProfile.COPY and self.state == RecordingState.STARTING
+            self.state = RecordingState.FAILED
+            await asyncio.sleep(1)
+            await asyncio.get_running_loop().run_in_executor(None, self.on_error_callback, self.recording, copy_failed)
+        finally:
+            try:
+                RECORDING_CPU.remove(self.camera.ip, self.profile.value)
+            except KeyError:
+                pass
+            if self.stats_gauges is not None:
+                for gauge in STATS_GAUGES:
+                    gauge.remove(self.camera.ip)
+
+
+    async def start_ffmpeg(self):
+        arguments = (
+            FFmpeg()
+            .option("y")
+            .input(
+                f"rtsp://{self.camera.username}:{self.camera.password}@{self.camera.ip}:{self.camera.port}/{self.camera.path}",
+                rtsp_transport="udp",
+            )
+            .output(self.file_path, **self.output_options)
+        ).arguments
+        self.ffmpeg = FfmpegProcess(arguments, self.on_ffmpeg_progress)
+        await self.ffmpeg.execute()
+
+
+    def on_ffmpeg_progress(self, progress: Dict[str, str]):
+        self.update_stats(progress)
+        if self.state == RecordingState.STARTING:
+            self.state = RecordingState.RECORDING
+        self.sample_cpu()
+        if self.on_started_callback is not None:
+            on_started_callback, self.on_started_callback = self.on_started_callback, None
+            on_started_callback(self.recording)
+        self.on_progress()
+
+
+    # For subclasses, called on the loop on every progress event of ffmpeg
+    def on_progress(self):
+        pass
+
+
+    # Whether ffmpeg may still write to the file with this name
+    def is_writing(self, name: str) -> bool:
+        return name == self.recording.name
+
+
+    # Whether stopping recording has to stop this process
+    def is_recording(self, recording: Recording) -> bool:
+        return recording.id == self.recording.id
+
+
+    def get_stats(self) -> Optional[RecordingStatsDto]:
+        stats = self.stats
+        if stats is None:
+            return None
+        return stats.model_copy(update={"state": self.state})
+
+
+    def update_stats(self, progress: Dict[str, str]):
+        self.stats = RecordingStatsDto(
+            camera_ip=self.camera.ip,
+            recording_name=self.recording.name,
+            profile=self.profile,
+            state=self.state,
+            frames=int(get_number(progress, "frame")),
+            fps=get_number(progress, "fps"),
+            bitrate_kbps=get_number(progress, "bitrate", "kbits/s"),
+            speed=get_number(progress, "speed", "x"),
+            dropped_frames=int(get_number(progress, "drop_frames")),
+            duplicated_frames=int(get_number(progress, "dup_frames")),
+            size_bytes=int(get_number(progress, "total_size")),
+            updated_at=time.time())
+
+        if self.stats_gauges is None:
+            self.stats_gauges = [gauge.labels(self.camera.ip) for gauge in STATS_GAUGES]
+        stats = self.stats
+        values = (stats.fps, stats.speed, stats.bitrate_kbps,
+                  stats.dropped_frames, stats.duplicated_frames, stats.size_bytes)
+        for gauge, value in zip(self.stats_gauges, values):
+            gauge.set(value)
+
+
+    def sample_cpu(self):
+        now = time.monotonic()
+        if now - self.cpu_sampled_at < CPU_SAMPLE_SECONDS:
+            return
+        self.cpu_sampled_at = now
+        if self.cpu is None:
+            self.cpu = ProcessCpu(self.ffmpeg.get_pid())
+            return
+        percent = self.cpu.percent()
+        if percent is not None:
+            RECORDING_CPU.labels(self.camera.ip, self.profile.value).set(percent)
@@ -1,10 +1,21 @@
 import glob
 import os
-
-from app.jobs.recording.impl.recording_thread import RecordingThread
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, Dict, Optional, Sequence
+
+from app.exceptions.not_found_exception import NotFoundException
+from app.jobs.recording.impl.ffmpeg_supervisor import FfmpegSupervisor
+from app.jobs.recording.impl.pre_roll_buffer import PreRollBuffer
+from app.jobs.recording.impl.pre_roll_recording import PreRollRecording
+from app.jobs.recording.impl.recording_process import RecordingProcess
+from app.jobs.recording.impl.segmented_recording_process import SegmentedRecordingProcess
 from app.jobs.recording.recordings_manager import RecordingsManager
+from app.models.camera import Camera
 from app.models.disk_usage import DiskUsage
-from app.models.recording import Recording, get_recordings_path, RecordingInputDto
+from app.models.enums.recording_profile import RecordingProfile
+from app.models.recording import Recording, get_recordings_path, RecordingInputDto, get_segment_name
+from app.models.recording_stats import RecordingStatsDto
 from app.repositories.camera.camera_repository import CameraRepository
 from app.repositories.recording.recording_repository import RecordingRepository
 
@@ -16,54 +27,170 @@ def delete_file(file_path):
     return None
 
 
-def get_oldest_file():
-    files = glob.glob(os.path.join(get_recordings_path(), '*'))
+# Oldest file of the recordings directory whose name is not excluded
+def get_oldest_file(is_excluded: Callable[[str], bool] = lambda name: False):
+    files = [file for file in glob.glob(os.path.join(get_recordings_path(), '*')) if not is_excluded(os.path.basename(file))]
     if files:
         oldest_file = min(files, key=os.path.getctime)
         return oldest_file
     return None
 
 
+# Recordings of an alarm are started together on a bounded pool, so with many cameras the last one does not wait for
+# every other one to be started before its own ffmpeg is spawned.
+# Cameras with a pre-roll have their stream buffered all the time, their alarm recordings take it over instead of
+# spawning an ffmpeg, unless the buffer has nothing to give (stream down), then they are recorded like the others.
+# Always recording cameras are split in files of segment_seconds by the segment muxer of a single ffmpeg, every file
+# getting its recording once the next one starts; with segment_seconds None they are restarted by the recording service.
+# Every ffmpeg runs on the loop of a single supervisor thread, however many cameras there are.
 class RecordingsManagerImpl(RecordingsManager):
-    def __init__(self, camera_repository: CameraRepository, recording_repository: RecordingRepository):
+    def __init__(self,
+                 camera_repository: CameraRepository,
+                 recording_repository: RecordingRepository,
+                 start_workers: int = 4,
+                 pre_roll_max_bytes: int = 16 * 1024 * 1024,
+                 segment_seconds: Optional[int] = 3600):
         self.camera_repository = camera_repository
         self.recording_repository = recording_repository
-        self.threads = []
+        self.supervisor = FfmpegSupervisor()
+        self.processes = []
+        # Processes are added from the start pool and removed from API, scheduler and executor threads
+        self.processes_lock = threading.Lock()
+        self.start_executor = ThreadPoolExecutor(max_workers=start_workers, thread_name_prefix="recording-start")
+        self.pre_roll_max_bytes = pre_roll_max_bytes
+        self.pre_rolls: Dict[str, PreRollBuffer] = {}
+        # Cameras whose stream could not be recorded as is, transcoded until the application restarts
+        self.transcode_fallbacks = set()
+        self.segment_seconds = segment_seconds
+
+
+    def is_segmented(self, camera: Camera) -> bool:
+        return self.segment_seconds is not None and camera.always_recording
+
+
+    def stop(self):
+        with self.processes_lock:
+            processes, self.processes = self.processes, []
+        for process in processes:
+            process.stop()
+        for camera_ip in list(self.pre_rolls):
+            self.stop_pre_roll(camera_ip)
+        self.start_executor.shutdown()
+        self.supervisor.stop()
+
+
+    def start_pre_roll(self, camera: Camera):
+        if camera.pre_roll_seconds <= 0 or camera.always_recording or camera.ip in self.pre_rolls:
+            return
+        pre_roll = PreRollBuffer(self.supervisor, camera, self.pre_roll_max_bytes)
+        pre_roll.start()
+        self.pre_rolls[camera.ip] = pre_roll
+        print(f"Buffering {camera.pre_roll_seconds} seconds of pre-roll for camera on {camera.ip}")
+
+
+    def stop_pre_roll(self, camera_ip: str):
+        pre_roll = self.pre_rolls.pop(camera_ip, None)
+        if pre_roll is not None:
+            pre_roll.stop()
 
 
     def is_recording(self, camera_ip: str):
-        for thread in self.threads:
-            if thread.recording.camera_ip == camera_ip:
-                return True
+        with self.processes_lock:
+            for process in self.processes:
+                if process.recording.camera_ip == camera_ip:
+                    return True
         return False
 
 
     def start_recording(self, recording: Recording):
         camera = self.camera_repository.find_by_ip(recording.camera_ip)
+        self.free_disk_space()
+        self.start_process(camera, recording)
+
 
-        # Delete the oldest file if free space is less than 10%
+    def start_recordings(self, cameras: Sequence[Camera], recordings: Sequence[Recording], on_started: Optional[Callable[[Recording], None]] = None) -> Sequence[Recording]:
+        # A single check for all of them, it is about the same disk
+        self.free_disk_space()
+        # Returns once every process is started and registered, so that stopping the alarm right after finds them all
+        futures = [self.start_executor.submit(self.try_start_process, camera, recording, on_started) for camera, recording in zip(cameras, recordings)]
+        wait(futures)
+        return [recording for recording, future in zip(recordings, futures) if not future.result()]
+
+
+    def free_disk_space(self):
+        # Delete the oldest file if free space is less than 10%, never one being recorded
         usage = DiskUsage.from_path(get_recordings_path())
         threshold = 0.10
         if usage.free / usage.total < threshold:
-            oldest_file = get_oldest_file()
+            with self.processes_lock:
+                processes = list(self.processes)
+            oldest_file = get_oldest_file(lambda name: any(process.is_writing(name) for process in processes))
             if oldest_file is not None:
                 deleted_filename = delete_file(oldest_file)
-                recording = self.recording_repository.find_by_name(deleted_filename)
+                try:
+                    recording = self.recording_repository.find_by_name(deleted_filename)
+                except NotFoundException:
+                    # A file without its recording, nothing else to delete
+                    return
                 self.recording_repository.delete_by_id(recording.id)
 
-        thread = RecordingThread(camera, recording, self.thread_error_callback)
-        thread.start()
-        self.threads.append(thread)
+
+    def start_process(self, camera: Camera, recording: Recording, on_started: Optional[Callable[[Recording], None]] = None):
+        pre_roll = self.pre_rolls.get(camera.ip)
+        if pre_roll is not None and pre_roll.is_buffering():
+            process = PreRollRecording(pre_roll, recording, on_started)
+        else:
+            profile = RecordingProfile.TRANSCODE if camera.ip in self.transcode_fallbacks else camera.recording_profile
+            if self.is_segmented(camera):
+                process = SegmentedRecordingProcess(self.supervisor, camera, recording, self.process_error_callback, self.on_segment_completed, self.segment_seconds, on_started, profile)
+            else:
+                process = RecordingProcess(self.supervisor, camera, recording, self.process_error_callback, on_started, profile)
+        process.start()
+        with self.processes_lock:
+            self.processes.append(process)
         print(f"Start recording for camera on {recording.camera_ip}")
 
 
-    def stop_recording(self, recording: Recording):
-        for thread in self.threads:
-            if thread.recording.id == recording.id:
-                thread.stop()
-                self.threads.remove(thread)
-                break
+    # False when it could not be started, its recording is then stopped right away so it doesn't stay open forever
+    def try_start_process(self, camera: Camera, recording: Recording, on_started: Optional[Callable[[Recording], None]]) -> bool:
+        try:
+            self.start_process(camera, recording, on_started)
+            return True
+        except Exception as e:
+            print(f"Error while starting recording for camera on {camera.ip}: {e}")
+        try:
+            self.recording_repository.set_stopped(recording)
+        except Exception as e:
+            print(f"Error while stopping recording for camera on {camera.ip}: {e}")
+        return False
+
+
+    # Segmented cameras never start again, so this is where they keep some disk free. Runs on an executor thread and
+    # is called again the next second if it raises, so disk space is freed only once the next segment is registered:
+    # once per completed segment however many attempts registering it takes
+    def on_segment_completed(self, recording: Recording, next_name: str) -> Recording:
+        self.recording_repository.set_stopped(recording)
+        next_recording = self.recording_repository.create(Recording(camera_ip=recording.camera_ip, name=next_name, path=recording.path, is_completed=False))
+        try:
+            self.free_disk_space()
+        except Exception as e:
+            print(f"Error while freeing disk space: {e}")
+        return next_recording
+
+
+    def stop_recording(self, recording: Recording) -> Recording:
+        # A segmented recording may have moved to its next file since the caller got it, its process still matches
+        with self.processes_lock:
+            process = next((process for process in self.processes if process.is_recording(recording)), None)
+            if process is not None:
+                self.processes.remove(process)
+        if process is None:
+            print(f"No recording {recording.name} going on for camera on {recording.camera_ip}, nothing to stop")
+            return recording
+        # Stopping waits for ffmpeg, others can start and stop meanwhile
+        process.stop()
         print(f"Stopped recording for camera on {recording.camera_ip}")
+        return process.recording
 
 
     def delete_recording_file(self, recording: Recording):
@@ -71,18 +198,38 @@ class RecordingsManagerImpl(RecordingsManager):
 
 
     def get_current_recording_by_camera_ip(self, camera_ip: str):
-        for thread in self.threads:
-            if thread.recording.camera_ip == camera_ip:
-                return thread.recording
+        with self.processes_lock:
+            for process in self.processes:
+                if process.recording.camera_ip == camera_ip:
+                    return process.recording
         return None
 
 
-    def thread_error_callback(self, recording: Recording):
-        # no need to restart since restart operation is already scheduled for the camera ip, just
-        # create a new recording and start it so if something fails we will have two separate files, who cares
+    def get_recording_stats(self, camera_ip: str) -> Optional[RecordingStatsDto]:
+        with self.processes_lock:
+            process = next((process for process in self.processes if process.recording.camera_ip == camera_ip), None)
+        return None if process is None else process.get_stats()
+
+
+    def process_error_callback(self, recording: Recording, copy_failed: bool = False):
+        if copy_failed:
+            print(f"Camera on {recording.camera_ip} can't be recorded without transcoding, falling back to it")
+            self.transcode_fallbacks.add(recording.camera_ip)
+
+        # no need to restart since restart operation is already scheduled for the camera ip (or the camera is
+        # segmented), just create a new recording and start it so if something fails we will have two separate files,
+        # who cares
         print(f"Error while recording for camera on {recording.camera_ip}, restarting...")
 
+        # The failed process is done, it must not be found as the current recording of the camera anymore
+        with self.processes_lock:
+            self.processes = [process for process in self.processes if process.recording.id != recording.id]
+        self.recording_repository.set_stopped(recording)
+
         camera = self.camera_repository.find_by_ip(recording.camera_ip)  # will throw if not found
-        recording = self.recording_repository.create(Recording.from_dto(RecordingInputDto(camera_ip=camera.ip, always_recording=camera.always_recording)))
+        recording = Recording.from_dto(RecordingInputDto(camera_ip=camera.ip, always_recording=camera.always_recording))
+        if self.is_segmented(camera):
+            recording.name = get_segment_name(recording.name, 0)
+        recording = self.recording_repository.create(recording)
         self.start_recording(recording)
 
@@ -0,0 +1,74 @@
+import asyncio
+import os
+import time
+from typing import Callable
+
+from app.jobs.recording.impl.ffmpeg_supervisor import FfmpegSupervisor
+from app.jobs.recording.impl.recording_process import RecordingProcess, get_output_options
+from app.models.camera import Camera
+from app.models.enums.recording_profile import RecordingProfile
+from app.models.recording import Recording, get_segment_pattern
+
+ROTATION_CHECK_SECONDS = 1
+
+
+# Recording of an always recording camera with a single long lived ffmpeg, whose segment muxer starts a new file every
+# segment_seconds on the clock, so rotating files loses no footage and doesn't reconnect to the camera.
+# Segment files are numbered from the name of the first recording, once the next one exists the current one is done:
+# on_segment_callback gets the finished recording and the name of the new file and returns the recording of it, which
+# becomes the recording of this process. It goes to the database, so it runs on an executor thread.
+class SegmentedRecordingProcess(RecordingProcess):
+    def __init__(self,
+                 supervisor: FfmpegSupervisor,
+                 camera: Camera,
+                 recording: Recording,
+                 on_error_callback,
+                 on_segment_callback: Callable[[Recording, str], Recording],
+                 segment_seconds: int,
+                 on_started_callback=None,
+                 profile: RecordingProfile = RecordingProfile.TRANSCODE):
+        super().__init__(supervisor, camera, recording, on_error_callback, on_started_callback, profile)
+        self.on_segment_callback = on_segment_callback
+        self.pattern = get_segment_pattern(recording.name)
+        self.prefix = self.pattern.split("%")[0]
+        self.file_path = os.path.join(recording.path, self.pattern)
+        self.output_options = get_output_options(profile, segment_seconds)
+        self.index = 0
+        self.rotation_checked_at = 0
+        self.rotating = False
+
+
+    # A single stat of the next file name, at most every ROTATION_CHECK_SECONDS
+    def on_progress(self):
+        now = time.monotonic()
+        if self.rotating or now - self.rotation_checked_at < ROTATION_CHECK_SECONDS:
+            return
+        self.rotation_checked_at = now
+
+        next_name = self.pattern % (self.index + 1)
+        if os.path.exists(os.path.join(self.recording.path, next_name)):
+            self.rotating = True
+            asyncio.get_running_loop().create_task(self.rotate(next_name))
+
+
+    # The current file and the next ones, which ffmpeg may have started before they are registered
+    def is_writing(self, name: str) -> bool:
+        index = name[len(self.prefix):-len(".mkv")]
+        return name.startswith(self.prefix) and index.isdigit() and int(index) >= self.index
+
+
+    # Also the recordings of the files before, a caller may have got one before the process moved to the next file
+    def is_recording(self, recording: Recording) -> bool:
+        if super().is_recording(recording):
+            return True
+        return recording.camera_ip == self.recording.camera_ip and recording.name is not None and recording.name.startswith(self.prefix)
+
+
+    async def rotate(self, next_name: str):
+        try:
+            self.recording = await asyncio.get_running_loop().run_in_executor(None, self.on_segment_callback, self.recording, next_name)
+            self.index += 1
+        except Exception as e:
+            print(f"Error while registering segment {next_name}: {e}")
+        finally:
+            self.rotating = False
@@ -1,6 +1,9 @@
 from abc import abstractmethod
+from typing import Callable, Optional, Sequence
 
+from app.models.camera import Camera
 from app.models.recording import Recording
+from app.models.recording_stats import RecordingStatsDto
 
 
 class RecordingsManager:
@@ -12,8 +15,33 @@ class RecordingsManager:
     def start_recording(self, recording: Recording):
         pass
 
+    # Recordings already in the database, started together on the given cameras (same order). Returns once all of them
+    # are started, not once they are writing frames, with the ones that could not be started (already set as stopped)
     @abstractmethod
-    def stop_recording(self, recording: Recording):
+    def start_recordings(self, cameras: Sequence[Camera], recordings: Sequence[Recording], on_started: Optional[Callable[[Recording], None]] = None) -> Sequence[Recording]:
+        pass
+
+    # Keeps the last camera.pre_roll_seconds of video in RAM, alarm recordings of the camera start with them
+    @abstractmethod
+    def start_pre_roll(self, camera: Camera):
+        pass
+
+    @abstractmethod
+    def stop_pre_roll(self, camera_ip: str):
+        pass
+
+    @abstractmethod
+    def stop(self):
+        pass
+
+    # Always recording cameras written in segments by a single ffmpeg, that must not be restarted to split files
+    @abstractmethod
+    def is_segmented(self, camera: Camera) -> bool:
+        pass
+
+    # Returns the recording actually stopped, which for a segmented one is its latest file
+    @abstractmethod
+    def stop_recording(self, recording: Recording) -> Recording:
         pass
 
     @abstractmethod
@@ -23,3 +51,8 @@ class RecordingsManager:
     @abstractmethod
     def get_current_recording_by_camera_ip(self, camera_ip: str):
         pass
+
+    # None when the camera is not recording, or not with an ffmpeg of its own (alarm recordings taken from a pre-roll)
+    @abstractmethod
+    def get_recording_stats(self, camera_ip: str) -> Optional[RecordingStatsDto]:
+        pass
@@ -1,103 +1,184 @@
 import threading
 import time
-from typing import Dict, Tuple
+from typing import Dict, Optional, Sequence
 
 try:
     import RPi.GPIO as GPIO
 except:
     from app.models.mock.GpioMock import GpioMock as GPIO
 
+from app.exceptions.not_found_exception import NotFoundException
 from app.exceptions.reeds_listener_exception import ReedsListenerException
 from app.jobs.alarm.alarm_manager import AlarmManager
 from app.jobs.reed.reeds_listener import ReedsListener
+from app.jobs.sensor.sensor_handler import SensorHandler
+from app.jobs.sensor.sensor_sampler import SensorSampler
+from app.jobs.sensor_event.sensor_events_writer import SensorEventsWriter
 from app.models.enums.reed_status import ReedStatus
+from app.models.enums.sensor_type import SensorType
 from app.models.reed import Reed
-from app.repositories.reed.reed_repository import ReedRepository
+from app.models.sensor_event import SensorEventDto
+from app.models.sensor_status import SensorStatusDto
+from app.models.sensor_transition import SensorTransition
+from app.utils.bitmask import get_bit, iter_pins, pin_bit, set_bit
+from app.utils.monotonic_time import epoch_to_monotonic, monotonic_to_epoch
 
 
-def read_current_status(gpio_pin_number: int, vcc: bool, normally_closed: bool) -> ReedStatus:
+def get_pull(vcc: bool, normally_closed: bool) -> int:
     if vcc:
-        pull = GPIO.PUD_DOWN if normally_closed else GPIO.PUD_UP
+        return GPIO.PUD_DOWN if normally_closed else GPIO.PUD_UP
     else:
-        pull = GPIO.PUD_UP if normally_closed else GPIO.PUD_DOWN
+        return GPIO.PUD_UP if normally_closed else GPIO.PUD_DOWN
 
-    GPIO.setup(gpio_pin_number, GPIO.IN, pull_up_down=pull)
-    current_value = GPIO.input(gpio_pin_number)
 
+def decode_status(current_value: int, normally_closed: bool) -> ReedStatus:
     if (normally_closed and current_value == GPIO.HIGH) or (not normally_closed and current_value == GPIO.LOW):
         return ReedStatus.CLOSED
     else:
         return ReedStatus.OPEN
 
 
-class ReedsListenerImpl(ReedsListener):
-    def __init__(self, alarm_manager: AlarmManager, reed_repository: ReedRepository):
+# Pins are sampled by the shared sensor sampler, this only decodes their levels into reed statuses and forwards
+# the changes to the alarm manager.
+# Statuses and configuration of all reeds are kept as bitmasks, one bit per pin. A normally closed reed is closed when
+# its level is HIGH and the others when it is LOW, so the open bit of a pin is its level XOR its normally closed bit.
+class ReedsListenerImpl(ReedsListener, SensorHandler):
+    def __init__(self, alarm_manager: AlarmManager, sensor_sampler: SensorSampler, sensor_events_writer: SensorEventsWriter):
         self.alarm_manager = alarm_manager
-        self.reed_repository = reed_repository
-        self.reed_infos: Dict[int, Tuple[bool, bool, ReedStatus]] = {}
-        self.running = True
-        self.thread = threading.Thread(target=self.monitor_pins)
-        self.thread.start()
-        GPIO.setmode(GPIO.BCM)
+        self.sensor_sampler = sensor_sampler
+        self.sensor_events_writer = sensor_events_writer
+        # Masks are written from the API threads and the sampler thread, every update goes through the lock
+        self.masks_lock = threading.Lock()
+        self.monitored_mask = 0
+        self.normally_closed_mask = 0
+        self.open_mask = 0
+        # Mirror of name and listening flag of every monitored reed, kept up to date by the services that change them
+        # so that transitions can be dispatched without going to the database
+        self.listening_mask = 0
+        self.reed_names: Dict[int, str] = {}
 
 
     def stop(self):
-        self.running = False
-        self.thread.join()
-        GPIO.cleanup()
+        for pin in iter_pins(self.monitored_mask):
+            self.sensor_sampler.unregister_pin(pin)
+        with self.masks_lock:
+            self.monitored_mask = 0
+            self.normally_closed_mask = 0
+            self.open_mask = 0
+            self.listening_mask = 0
+        self.reed_names.clear()
+
+
+    def is_monitored(self, gpio_pin_number: int) -> bool:
+        return get_bit(self.monitored_mask, gpio_pin_number) == 1
 
 
     def add_reed(self, reed: Reed):
-        if self.reed_infos.get(reed.gpio_pin_number) is None:
-            self.reed_infos[reed.gpio_pin_number] = (
-                reed.vcc,
-                reed.normally_closed,
-                read_current_status(reed.gpio_pin_number, reed.vcc, reed.normally_closed)
-            )
+        if not self.is_monitored(reed.gpio_pin_number):
+            value = self.sensor_sampler.register_pin(reed.gpio_pin_number, get_pull(reed.vcc, reed.normally_closed), reed.debounce_ms, self)
+            self.reed_names[reed.gpio_pin_number] = reed.name
+            self.set_masks(reed, value)
         else:
             raise ReedsListenerException(f"Reed with pin {reed.gpio_pin_number} already being monitored")
 
 
     def update_reed(self, reed: Reed):
-        if self.reed_infos.get(reed.gpio_pin_number) is None:
+        if not self.is_monitored(reed.gpio_pin_number):
             raise ReedsListenerException(f"Reed with pin {reed.gpio_pin_number} not being monitored")
         else:
-            self.reed_infos[reed.gpio_pin_number] = (
-                reed.vcc,
-                reed.normally_closed,
-                read_current_status(reed.gpio_pin_number, reed.vcc, reed.normally_closed)
-            )
+            self.reed_names[reed.gpio_pin_number] = reed.name
+            # Sampler sets up the pin again only if the pull resistor changes
+            value = self.sensor_sampler.update_pin(reed.gpio_pin_number, get_pull(reed.vcc, reed.normally_closed), reed.debounce_ms)
+            self.set_masks(reed, value)
+
+
+    def set_masks(self, reed: Reed, value: int):
+        pin = reed.gpio_pin_number
+        with self.masks_lock:
+            self.monitored_mask = set_bit(self.monitored_mask, pin, True)
+            self.normally_closed_mask = set_bit(self.normally_closed_mask, pin, reed.normally_closed)
+            self.open_mask = set_bit(self.open_mask, pin, decode_status(value, reed.normally_closed) == ReedStatus.OPEN)
+            self.listening_mask = set_bit(self.listening_mask, pin, reed.listening)
 
 
     def remove_reed(self, reed: Reed):
-        if self.reed_infos.get(reed.gpio_pin_number) is None:
+        if not self.is_monitored(reed.gpio_pin_number):
+            raise ReedsListenerException(f"Reed with pin {reed.gpio_pin_number} not being monitored")
+        else:
+            self.sensor_sampler.unregister_pin(reed.gpio_pin_number)
+            pin = reed.gpio_pin_number
+            with self.masks_lock:
+                self.monitored_mask = set_bit(self.monitored_mask, pin, False)
+                self.normally_closed_mask = set_bit(self.normally_closed_mask, pin, False)
+                self.open_mask = set_bit(self.open_mask, pin, False)
+                self.listening_mask = set_bit(self.listening_mask, pin, False)
+            del self.reed_names[pin]
+
+
+    def get_status_by_pin(self, gpio_pin_number: int) -> SensorStatusDto:
+        if not self.is_monitored(gpio_pin_number):
+            raise NotFoundException("Reed was not found")
+        else:
+            return self.to_status_dto(gpio_pin_number)
+
+
+    def get_all_statuses(self) -> Sequence[SensorStatusDto]:
+        return [self.to_status_dto(pin) for pin in iter_pins(self.monitored_mask)]
+
+
+    # Built from the last sample of the sampler, so reading a status never touches the GPIO or the database
+    def to_status_dto(self, gpio_pin_number: int) -> SensorStatusDto:
+        value, sampled_at, changed_at = self.sensor_sampler.get_last_sample(gpio_pin_number)
+        now = time.monotonic_ns()
+        return SensorStatusDto(
+            gpio_pin_number=gpio_pin_number,
+            type=SensorType.REED,
+            name=self.reed_names.get(gpio_pin_number),
+            status=decode_status(value, get_bit(self.normally_closed_mask, gpio_pin_number)),
+            age_ms=(now - sampled_at) // 1_000_000,
+            in_state_ms=(now - changed_at) // 1_000_000
+        )
+
+
+    def get_glitch_count_by_reed(self, reed: Reed) -> int:
+        if not self.is_monitored(reed.gpio_pin_number):
             raise ReedsListenerException(f"Reed with pin {reed.gpio_pin_number} not being monitored")
         else:
-            GPIO.cleanup(reed.gpio_pin_number)
-            del self.reed_infos[reed.gpio_pin_number]
+            return self.sensor_sampler.get_glitch_count(reed.gpio_pin_number)
+
+
+    # Served from the in-memory history of the sampler, since is in epoch seconds
+    def get_events_by_pin(self, gpio_pin_number: int, since: Optional[float]) -> Sequence[SensorEventDto]:
+        if not self.is_monitored(gpio_pin_number):
+            raise NotFoundException("Reed was not found")
+        else:
+            normally_closed = get_bit(self.normally_closed_mask, gpio_pin_number)
+            transitions = self.sensor_sampler.get_transitions(gpio_pin_number, epoch_to_monotonic(since) if since is not None else 0)
+            return [SensorEventDto(timestamp=monotonic_to_epoch(timestamp), status=decode_status(value, normally_closed)) for timestamp, value in transitions]
 
 
-    def get_status_by_reed(self, reed: Reed) -> ReedStatus:
-        if self.reed_infos.get(reed.gpio_pin_number) is None:
+    def set_listening(self, reed: Reed, listening: bool):
+        if not self.is_monitored(reed.gpio_pin_number):
             raise ReedsListenerException(f"Reed with pin {reed.gpio_pin_number} not being monitored")
         else:
-            return read_current_status(reed.gpio_pin_number, reed.vcc, reed.normally_closed)
-
-
-    def monitor_pins(self):
-        while self.running:
-            time.sleep(0.5) # check every half second
-
-            for pin in self.reed_infos.keys():
-                current_status = read_current_status(pin, self.reed_infos.get(pin)[0], self.reed_infos.get(pin)[1])
-                if current_status != self.reed_infos.get(pin)[2]:
-                    self.reed_infos[pin] = (
-                        self.reed_infos.get(pin)[0],
-                        self.reed_infos.get(pin)[1],
-                        current_status
-                    )
-
-                    if self.reed_repository.find_by_gpio_pin_number(pin).listening:
-                        # Alarm manager should be interacted with only when alarm is on
-                        updated_reed = self.reed_repository.find_by_gpio_pin_number(pin)
-                        self.alarm_manager.on_reed_changed_status(updated_reed.gpio_pin_number, current_status)
+            self.reed_names[reed.gpio_pin_number] = reed.name
+            with self.masks_lock:
+                self.listening_mask = set_bit(self.listening_mask, reed.gpio_pin_number, listening)
+
+
+    def on_transition(self, transition: SensorTransition):
+        dispatched_at = time.monotonic_ns()
+        pin = transition.pin
+        bit = pin_bit(pin)
+        with self.masks_lock:
+            opened = ((bit if transition.value else 0) ^ self.normally_closed_mask) & bit
+            if opened == self.open_mask & bit:
+                return
+            self.open_mask ^= bit
+            listening = self.listening_mask & bit
+
+        current_status = ReedStatus.OPEN if opened else ReedStatus.CLOSED
+        self.sensor_events_writer.record(pin, SensorType.REED, current_status, transition.timestamp)
+        if listening:
+            # Alarm manager should be interacted with only when alarm is on
+            self.alarm_manager.on_reed_changed_status(pin, current_status, transition.timestamp, dispatched_at)
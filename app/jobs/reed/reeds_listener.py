@@ -1,7 +1,9 @@
 from abc import abstractmethod
+from typing import Optional, Sequence
 
-from app.models.enums.reed_status import ReedStatus
 from app.models.reed import Reed
+from app.models.sensor_event import SensorEventDto
+from app.models.sensor_status import SensorStatusDto
 
 
 class ReedsListener:
@@ -22,5 +24,21 @@ class ReedsListener:
         pass
 
     @abstractmethod
-    def get_status_by_reed(self, reed: Reed) -> ReedStatus:
+    def get_status_by_pin(self, gpio_pin_number: int) -> SensorStatusDto:
+        pass
+
+    @abstractmethod
+    def get_all_statuses(self) -> Sequence[SensorStatusDto]:
+        pass
+
+    @abstractmethod
+    def get_glitch_count_by_reed(self, reed: Reed) -> int:
+        pass
+
+    @abstractmethod
+    def get_events_by_pin(self, gpio_pin_number: int, since: Optional[float]) -> Sequence[SensorEventDto]:
+        pass
+
+    @abstractmethod
+    def set_listening(self, reed: Reed, listening: bool):
         pass
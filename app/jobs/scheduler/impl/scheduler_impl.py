@@ -0,0 +1,101 @@
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Sequence
+
+from app.jobs.scheduler.scheduled_job import ScheduledJob
+from app.jobs.scheduler.scheduler import Scheduler
+from app.models.scheduled_job import ScheduledJobDto
+
+
+# Single place where delayed calls wait: a heap ordered by due time watched by one thread, which sleeps until the
+# first job is due and hands due jobs to a bounded pool of workers (jobs like trigger_alarm can block for a while on
+# RabbitMQ or the database, so they don't run on the timer thread). Thousands of pending jobs cost heap entries, not
+# threads.
+# Cancelling or rescheduling leaves the old heap entry in place and it gets skipped when popped; the heap is rebuilt
+# when skipped entries outnumber the pending jobs.
+class SchedulerImpl(Scheduler):
+    def __init__(self, max_workers: int = 4):
+        self.condition = threading.Condition()
+        self.heap = []
+        self.jobs: Dict[int, ScheduledJob] = {}
+        self.ids = itertools.count(1)
+        self.workers = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="scheduler")
+        self.stopped = False
+        self.thread = threading.Thread(target=self.run_due_jobs)
+        self.thread.start()
+
+
+    # Pending jobs are dropped
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            self.condition.notify()
+        self.thread.join()
+        self.workers.shutdown(wait=False, cancel_futures=True)
+
+
+    def schedule(self, func: Callable, args: tuple = (), delay_seconds: float = 0, name: Optional[str] = None) -> ScheduledJob:
+        with self.condition:
+            job = ScheduledJob(self, next(self.ids), name or func.__name__, func, args, time.monotonic() + delay_seconds)
+            self.jobs[job.id] = job
+            heapq.heappush(self.heap, (job.due, job.id, job))
+            self.condition.notify()
+        return job
+
+
+    def cancel(self, job: ScheduledJob) -> bool:
+        with self.condition:
+            if self.jobs.pop(job.id, None) is None:
+                return False
+            job.cancelled = True
+            self.compact()
+            return True
+
+
+    def reschedule(self, job: ScheduledJob, delay_seconds: float) -> bool:
+        with self.condition:
+            if job.id not in self.jobs:
+                return False
+            job.due = time.monotonic() + delay_seconds
+            heapq.heappush(self.heap, (job.due, job.id, job))
+            self.compact()
+            self.condition.notify()
+            return True
+
+
+    def get_jobs(self) -> Sequence[ScheduledJobDto]:
+        with self.condition:
+            jobs = sorted(self.jobs.values(), key=lambda job: job.due)
+        return [ScheduledJobDto(id=job.id, name=job.name, remaining_seconds=round(job.remaining(), 3)) for job in jobs]
+
+
+    def compact(self):
+        if len(self.heap) > 2 * len(self.jobs) + 64:
+            self.heap = [(job.due, job.id, job) for job in self.jobs.values()]
+            heapq.heapify(self.heap)
+
+
+    def run_due_jobs(self):
+        with self.condition:
+            while not self.stopped:
+                now = time.monotonic()
+                while self.heap and self.heap[0][0] <= now:
+                    due, job_id, job = heapq.heappop(self.heap)
+                    # Entries of cancelled jobs and old entries of rescheduled ones
+                    if self.jobs.get(job_id) is not job or job.due != due:
+                        continue
+                    del self.jobs[job_id]
+                    job.started = True
+                    self.workers.submit(self.run_job, job)
+
+                self.condition.wait(self.heap[0][0] - now if self.heap else None)
+
+
+    def run_job(self, job: ScheduledJob):
+        try:
+            job.func(*job.args)
+        except Exception as e:
+            print(f"Error while running scheduled job {job.name}: {e}")
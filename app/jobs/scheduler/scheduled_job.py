@@ -0,0 +1,35 @@
+import time
+from typing import Callable
+
+
+# Handle of a call waiting in the scheduler. Due times are monotonic seconds so wall clock changes don't move them.
+class ScheduledJob:
+    __slots__ = ("scheduler", "id", "name", "func", "args", "due", "cancelled", "started")
+
+    def __init__(self, scheduler, job_id: int, name: str, func: Callable, args: tuple, due: float):
+        self.scheduler = scheduler
+        self.id = job_id
+        self.name = name
+        self.func = func
+        self.args = args
+        self.due = due
+        self.cancelled = False
+        self.started = False
+
+
+    # False if the job already started or was already cancelled
+    def cancel(self) -> bool:
+        return self.scheduler.cancel(self)
+
+
+    # Moves the job to delay_seconds from now, False if it already started or was cancelled
+    def reschedule(self, delay_seconds: float) -> bool:
+        return self.scheduler.reschedule(self, delay_seconds)
+
+
+    def remaining(self) -> float:
+        return max(0.0, self.due - time.monotonic())
+
+
+    def is_pending(self) -> bool:
+        return not self.cancelled and not self.started
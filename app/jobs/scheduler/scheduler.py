@@ -0,0 +1,27 @@
+from abc import abstractmethod
+from typing import Callable, Optional, Sequence
+
+from app.jobs.scheduler.scheduled_job import ScheduledJob
+from app.models.scheduled_job import ScheduledJobDto
+
+
+class Scheduler:
+    @abstractmethod
+    def stop(self):
+        pass
+
+    @abstractmethod
+    def schedule(self, func: Callable, args: tuple = (), delay_seconds: float = 0, name: Optional[str] = None) -> ScheduledJob:
+        pass
+
+    @abstractmethod
+    def cancel(self, job: ScheduledJob) -> bool:
+        pass
+
+    @abstractmethod
+    def reschedule(self, job: ScheduledJob, delay_seconds: float) -> bool:
+        pass
+
+    @abstractmethod
+    def get_jobs(self) -> Sequence[ScheduledJobDto]:
+        pass
@@ -0,0 +1,101 @@
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+try:
+    import RPi.GPIO as GPIO
+except:
+    from app.models.mock.GpioMock import GpioMock as GPIO
+
+from app.jobs.sensor.impl.sensor_sampler_impl import SensorSamplerImpl
+from app.jobs.sensor.sensor_handler import SensorHandler
+from app.models.enums.gpio_backend import GpioBackend
+from app.models.sensor_transition import SensorTransition
+
+
+# Same sampler running as tasks on the event loop of the application instead of its own thread: pins, debounce,
+# history and dispatch are shared with the threaded implementation, only the way levels get in changes.
+# - EDGE: the GPIO library callback timestamps and reads the level on its own thread and hands it to the loop
+#   through an asyncio.Queue, drained by a task that debounces and dispatches. The queue belongs to the loop and is
+#   only touched from it, the callback goes through call_soon_threadsafe, and edges seen before start wait in a
+#   thread safe queue until then.
+# - POLLING: the only blocking call of a tick, reading every pin, runs on a single worker executor while the
+#   decoding and dispatch happen back on the loop.
+# Handlers block (database lookups, waiting for the broker), so they are called in order on a single dispatch thread
+# instead of the loop, where they would hold up every HTTP request.
+class AsyncioSensorSamplerImpl(SensorSamplerImpl):
+    def __init__(self, backend: GpioBackend = GpioBackend.EDGE, sample_rate_hz: float = 2, history_size: int = 4096, clock: Callable[[], int] = time.monotonic_ns):
+        super().__init__(backend, sample_rate_hz, history_size, clock)
+        self.loop = None
+        # Edges seen before start stay here and are moved to the queue of the loop once it is running
+        self.early_edges = queue.SimpleQueue()
+        self.edges: Optional[asyncio.Queue] = None
+        self.loop_lock = threading.Lock()
+        self.gpio_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="gpio-read")
+        self.dispatch_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sensor-dispatch")
+        self.tasks: List[asyncio.Task] = []
+
+
+    # Has to be called from the event loop, usually by the FastAPI lifespan
+    def start(self):
+        self.edges = asyncio.Queue()
+        with self.loop_lock:
+            self.loop = asyncio.get_running_loop()
+            while not self.early_edges.empty():
+                self.edges.put_nowait(self.early_edges.get_nowait())
+        if self.backend == GpioBackend.POLLING:
+            self.tasks.append(self.loop.create_task(self.poll_pins_async()))
+        else:
+            self.tasks.append(self.loop.create_task(self.drain_edges_async()))
+
+
+    def stop(self):
+        self.stopped.set()
+        if self.loop is not None:
+            for task in self.tasks:
+                self.loop.call_soon_threadsafe(task.cancel)
+        self.gpio_executor.shutdown(wait=False)
+        self.dispatch_executor.shutdown(wait=False)
+        GPIO.cleanup()
+
+
+    def handle_transition(self, handler: SensorHandler, transition: SensorTransition):
+        self.dispatch_executor.submit(super().handle_transition, handler, transition)
+
+
+    def on_edge(self, gpio_pin_number: int):
+        timestamp = self.clock()
+        edge = (gpio_pin_number, GPIO.input(gpio_pin_number), timestamp)
+        loop = self.loop
+        if loop is None:
+            # Checked again under the lock, start could be moving the early edges meanwhile
+            with self.loop_lock:
+                if self.loop is None:
+                    self.early_edges.put(edge)
+                    return
+                loop = self.loop
+        loop.call_soon_threadsafe(self.edges.put_nowait, edge)
+
+
+    async def drain_edges_async(self):
+        while not self.stopped.is_set():
+            try:
+                gpio_pin_number, value, timestamp = await asyncio.wait_for(self.edges.get(), self.get_pending_timeout())
+                self.on_sample(gpio_pin_number, value, timestamp)
+            except asyncio.TimeoutError:
+                pass
+            # With edges there is no next sample to confirm a pending level, so hold times are checked here
+            self.sampled_at = self.clock()
+            self.confirm_pending(self.sampled_at)
+
+
+    async def poll_pins_async(self):
+        next_tick = time.monotonic()
+        while not self.stopped.is_set():
+            next_tick = self.get_next_tick(next_tick)
+            levels, timestamp = await self.loop.run_in_executor(self.gpio_executor, self.read_levels)
+            self.on_levels(levels, timestamp)
+            await asyncio.sleep(self.get_poll_timeout(next_tick))
@@ -0,0 +1,42 @@
+from typing import Optional, Tuple
+
+
+# Hold-time filter for a single pin: a level different from the stable one becomes pending and is accepted only if
+# it is still there after the hold time. Flipping back to the stable level before that drops it as a glitch.
+class DebounceFilter:
+    __slots__ = ("hold_ns", "pending_value", "pending_since", "glitches")
+
+    def __init__(self, debounce_ms: int):
+        self.hold_ns = debounce_ms * 1_000_000
+        self.pending_value = None
+        self.pending_since = 0
+        self.glitches = 0
+
+
+    # Returns the accepted (value, timestamp of its first edge) or None while nothing new is stable
+    def feed(self, stable_value: int, value: int, timestamp: int) -> Optional[Tuple[int, int]]:
+        if value == stable_value:
+            if self.pending_value is not None:
+                self.glitches += 1
+                self.pending_value = None
+            return None
+
+        if self.pending_value != value:
+            self.pending_value = value
+            self.pending_since = timestamp
+        return self.confirm(timestamp)
+
+
+    def confirm(self, now: int) -> Optional[Tuple[int, int]]:
+        if self.pending_value is None or now - self.pending_since < self.hold_ns:
+            return None
+
+        accepted = (self.pending_value, self.pending_since)
+        self.pending_value = None
+        return accepted
+
+
+    def deadline(self) -> Optional[int]:
+        if self.pending_value is None:
+            return None
+        return self.pending_since + self.hold_ns
@@ -0,0 +1,268 @@
+import queue
+import threading
+import time
+from typing import Callable, Dict, List, Tuple
+
+try:
+    import RPi.GPIO as GPIO
+except:
+    from app.models.mock.GpioMock import GpioMock as GPIO
+
+from app.exceptions.sensor_sampler_exception import SensorSamplerException
+from app.jobs.sensor.impl.debounce_filter import DebounceFilter
+from app.jobs.sensor.impl.transition_ring_buffer import TransitionRingBuffer
+from app.jobs.sensor.sensor_handler import SensorHandler
+from app.jobs.sensor.sensor_sampler import SensorSampler
+from app.models.enums.gpio_backend import GpioBackend
+from app.models.sensor_transition import SensorTransition
+from app.utils.bitmask import get_bit, iter_pins, set_bit
+
+
+class SampledPin:
+    __slots__ = ("pull", "debounce", "history", "handler", "changed_at")
+
+    def __init__(self, pull: int, debounce: DebounceFilter, history: TransitionRingBuffer, handler: SensorHandler, changed_at: int):
+        self.pull = pull
+        self.debounce = debounce
+        self.history = history
+        self.handler = handler
+        self.changed_at = changed_at
+
+
+# Single owner of every monitored pin. A single thread either reads all pins in one pass at the configured rate
+# (POLLING) or drains the edges reported by the GPIO library (EDGE), and dispatches level changes to the handler
+# registered for the pin (reed and PIR listeners decode them into their own statuses).
+# Every level change goes through the debounce filter of its pin first, so handlers only see stable transitions, and
+# the last history_size stable transitions of each pin are kept in memory.
+# With POLLING, a pending level can only be confirmed by a later sample, so while a pin is pending the next sample is
+# taken when its hold time is over instead of at the next tick: a transition is seen up to one sample period after it
+# happened (500 ms at the default 2 Hz) and debouncing adds its hold time to that, not another period. EDGE sees it
+# right away and confirms it as soon as its hold time is over.
+# Levels are kept as bitmasks, one bit per pin: a polling tick packs the levels it reads in an int and a single XOR
+# with the stable levels finds the pins that changed, so only those (and the ones being debounced) get any more work.
+class SensorSamplerImpl(SensorSampler):
+    def __init__(self, backend: GpioBackend = GpioBackend.EDGE, sample_rate_hz: float = 2, history_size: int = 4096, clock: Callable[[], int] = time.monotonic_ns):
+        self.backend = backend
+        # Source of the transition timestamps, replaced by a virtual clock when running simulated scenarios
+        self.clock = clock
+        self.sample_period = 1 / sample_rate_hz
+        self.history_size = history_size
+        self.pins: Dict[int, SampledPin] = {}
+        self.pins_lock = threading.Lock()
+        # Sampled pins, their last stable level after debouncing and the pins with a level waiting for its hold time
+        self.pins_mask = 0
+        self.levels_mask = 0
+        self.pending_mask = 0
+        # When the levels were last known to be current: the last polling tick, or the last time edges were drained
+        self.sampled_at = clock()
+        self.edges = queue.Queue()
+        self.stopped = threading.Event()
+        self.thread = None
+        GPIO.setmode(GPIO.BCM)
+
+
+    # Pins can be registered before this, with EDGE their edges are queued until the thread drains them
+    def start(self):
+        if self.backend == GpioBackend.POLLING:
+            self.thread = threading.Thread(target=self.poll_pins)
+        else:
+            self.thread = threading.Thread(target=self.drain_edges)
+        self.thread.start()
+
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+        GPIO.cleanup()
+
+
+    def register_pin(self, gpio_pin_number: int, pull: int, debounce_ms: int, handler: SensorHandler) -> int:
+        with self.pins_lock:
+            if gpio_pin_number in self.pins:
+                raise SensorSamplerException(f"Pin {gpio_pin_number} already being sampled")
+            GPIO.setup(gpio_pin_number, GPIO.IN, pull_up_down=pull)
+            value = GPIO.input(gpio_pin_number)
+            self.pins[gpio_pin_number] = SampledPin(pull, DebounceFilter(debounce_ms), TransitionRingBuffer(self.history_size), handler, self.clock())
+            self.pins_mask = set_bit(self.pins_mask, gpio_pin_number, True)
+            self.levels_mask = set_bit(self.levels_mask, gpio_pin_number, value)
+            if self.backend == GpioBackend.EDGE:
+                GPIO.add_event_detect(gpio_pin_number, GPIO.BOTH, callback=self.on_edge)
+        return value
+
+
+    def update_pin(self, gpio_pin_number: int, pull: int, debounce_ms: int) -> int:
+        with self.pins_lock:
+            sampled_pin = self.get_sampled_pin(gpio_pin_number)
+            sampled_pin.debounce.hold_ns = debounce_ms * 1_000_000
+
+            # Pin configuration only changes with the pull resistor, otherwise the current setup is kept as is
+            if sampled_pin.pull == pull:
+                return get_bit(self.levels_mask, gpio_pin_number)
+
+            if self.backend == GpioBackend.EDGE:
+                GPIO.remove_event_detect(gpio_pin_number)
+            GPIO.setup(gpio_pin_number, GPIO.IN, pull_up_down=pull)
+            sampled_pin.pull = pull
+            sampled_pin.debounce.pending_value = None
+            value = GPIO.input(gpio_pin_number)
+            self.levels_mask = set_bit(self.levels_mask, gpio_pin_number, value)
+            sampled_pin.changed_at = self.clock()
+            if self.backend == GpioBackend.EDGE:
+                GPIO.add_event_detect(gpio_pin_number, GPIO.BOTH, callback=self.on_edge)
+        return value
+
+
+    def unregister_pin(self, gpio_pin_number: int):
+        with self.pins_lock:
+            self.get_sampled_pin(gpio_pin_number)
+            if self.backend == GpioBackend.EDGE:
+                GPIO.remove_event_detect(gpio_pin_number)
+            GPIO.cleanup(gpio_pin_number)
+            del self.pins[gpio_pin_number]
+            self.pins_mask = set_bit(self.pins_mask, gpio_pin_number, False)
+            self.levels_mask = set_bit(self.levels_mask, gpio_pin_number, False)
+
+
+    # Last stable level, the monotonic timestamps of the sample it is known from and of its change, no GPIO access so
+    # it can be called from any thread
+    def get_last_sample(self, gpio_pin_number: int) -> Tuple[int, int, int]:
+        sampled_pin = self.get_sampled_pin(gpio_pin_number)
+        return get_bit(self.levels_mask, gpio_pin_number), self.sampled_at, sampled_pin.changed_at
+
+
+    def get_glitch_count(self, gpio_pin_number: int) -> int:
+        return self.get_sampled_pin(gpio_pin_number).debounce.glitches
+
+
+    def get_transitions(self, gpio_pin_number: int, since: int = 0) -> List[Tuple[int, int]]:
+        return self.get_sampled_pin(gpio_pin_number).history.since(since)
+
+
+    def get_sampled_pin(self, gpio_pin_number: int) -> SampledPin:
+        sampled_pin = self.pins.get(gpio_pin_number)
+        if sampled_pin is None:
+            raise SensorSamplerException(f"Pin {gpio_pin_number} not being sampled")
+        return sampled_pin
+
+
+    # Called by the GPIO library from its event thread: only read and timestamp the level here, everything else
+    # happens on the sampler thread so a slow handler never delays the next edge.
+    def on_edge(self, gpio_pin_number: int):
+        timestamp = self.clock()
+        self.edges.put((gpio_pin_number, GPIO.input(gpio_pin_number), timestamp))
+
+
+    def drain_edges(self):
+        while not self.stopped.is_set():
+            try:
+                gpio_pin_number, value, timestamp = self.edges.get(timeout=self.get_pending_timeout())
+                self.on_sample(gpio_pin_number, value, timestamp)
+            except queue.Empty:
+                pass
+            # With edges there is no next sample to confirm a pending level, so hold times are checked here
+            self.sampled_at = self.clock()
+            self.confirm_pending(self.sampled_at)
+
+
+    # Wait for the next edge or sample at most until the first pending level is due to be confirmed
+    def get_pending_timeout(self) -> float:
+        now = self.clock()
+        timeout = 0.5
+        for gpio_pin_number in iter_pins(self.pending_mask):
+            sampled_pin = self.pins.get(gpio_pin_number)
+            deadline = sampled_pin.debounce.deadline() if sampled_pin is not None else None
+            if deadline is not None:
+                timeout = min(timeout, max(0.0, (deadline - now) / 1e9))
+        return timeout
+
+
+    def confirm_pending(self, now: int):
+        for gpio_pin_number in iter_pins(self.pending_mask):
+            sampled_pin = self.pins.get(gpio_pin_number)
+            if sampled_pin is None:
+                self.pending_mask = set_bit(self.pending_mask, gpio_pin_number, False)
+                continue
+
+            accepted = sampled_pin.debounce.confirm(now)
+            self.track_pending(gpio_pin_number, sampled_pin)
+            if accepted is not None:
+                self.dispatch(gpio_pin_number, sampled_pin, *accepted)
+
+
+    def poll_pins(self):
+        next_tick = time.monotonic()
+        while not self.stopped.is_set():
+            next_tick = self.get_next_tick(next_tick)
+            self.sample_all()
+            self.stopped.wait(self.get_poll_timeout(next_tick))
+
+
+    # Ticks keep to the sample period, the extra samples taken for pending levels in between don't move them
+    def get_next_tick(self, next_tick: float) -> float:
+        now = time.monotonic()
+        return now + self.sample_period if now >= next_tick else next_tick
+
+
+    def get_poll_timeout(self, next_tick: float) -> float:
+        timeout = max(0.0, next_tick - time.monotonic())
+        if self.pending_mask:
+            timeout = min(timeout, self.get_pending_timeout())
+        return timeout
+
+
+    # One polling tick: pins are configured when registered, so this is a bare input read per pin packed in a mask
+    def sample_all(self):
+        self.on_levels(*self.read_levels())
+
+
+    def read_levels(self) -> Tuple[int, int]:
+        with self.pins_lock:
+            pins = list(self.pins.keys())
+
+        timestamp = self.clock()
+        levels = 0
+        for gpio_pin_number in pins:
+            if GPIO.input(gpio_pin_number):
+                levels |= 1 << gpio_pin_number
+        return levels, timestamp
+
+
+    def on_levels(self, levels: int, timestamp: int):
+        self.sampled_at = timestamp
+        changed = ((levels ^ self.levels_mask) | self.pending_mask) & self.pins_mask
+        for gpio_pin_number in iter_pins(changed):
+            self.on_sample(gpio_pin_number, get_bit(levels, gpio_pin_number), timestamp)
+
+
+    def on_sample(self, gpio_pin_number: int, value: int, timestamp: int):
+        sampled_pin = self.pins.get(gpio_pin_number)
+        if sampled_pin is None:
+            self.pending_mask = set_bit(self.pending_mask, gpio_pin_number, False)
+            return
+
+        accepted = sampled_pin.debounce.feed(get_bit(self.levels_mask, gpio_pin_number), value, timestamp)
+        self.track_pending(gpio_pin_number, sampled_pin)
+        if accepted is not None:
+            self.dispatch(gpio_pin_number, sampled_pin, *accepted)
+
+
+    # Pending bits are only changed from the thread sampling the pins, so they need no lock
+    def track_pending(self, gpio_pin_number: int, sampled_pin: SampledPin):
+        self.pending_mask = set_bit(self.pending_mask, gpio_pin_number, sampled_pin.debounce.pending_value is not None)
+
+
+    def dispatch(self, gpio_pin_number: int, sampled_pin: SampledPin, value: int, timestamp: int):
+        with self.pins_lock:
+            self.levels_mask = set_bit(self.levels_mask, gpio_pin_number, value)
+        sampled_pin.changed_at = timestamp
+        sampled_pin.history.append(timestamp, value)
+        self.handle_transition(sampled_pin.handler, SensorTransition(gpio_pin_number, value, timestamp))
+
+
+    def handle_transition(self, handler: SensorHandler, transition: SensorTransition):
+        try:
+            handler.on_transition(transition)
+        except Exception as e:
+            # Keep sampling the other pins even if a handler fails on this transition
+            print(f"Error while handling transition on pin {transition.pin}: {e}")
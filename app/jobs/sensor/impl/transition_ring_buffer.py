@@ -0,0 +1,38 @@
+import threading
+from array import array
+from bisect import bisect_left
+from typing import List, Tuple
+
+
+# Fixed size history of the transitions of a single pin. Timestamps and levels are stored in two preallocated typed
+# arrays (9 bytes per transition) used as a circular buffer, so the oldest transitions get overwritten once full.
+class TransitionRingBuffer:
+    __slots__ = ("capacity", "timestamps", "values", "next_index", "size", "lock")
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.timestamps = array("q", bytes(8 * capacity))
+        self.values = array("b", bytes(capacity))
+        self.next_index = 0
+        self.size = 0
+        self.lock = threading.Lock()
+
+
+    def append(self, timestamp: int, value: int):
+        with self.lock:
+            self.timestamps[self.next_index] = timestamp
+            self.values[self.next_index] = value
+            self.next_index = (self.next_index + 1) % self.capacity
+            self.size = min(self.size + 1, self.capacity)
+
+
+    # Transitions with a timestamp greater or equal than since, oldest first
+    def since(self, since: int = 0) -> List[Tuple[int, int]]:
+        with self.lock:
+            start = (self.next_index - self.size) % self.capacity
+            order = [(start + i) % self.capacity for i in range(self.size)]
+            timestamps = [self.timestamps[i] for i in order]
+            values = [self.values[i] for i in order]
+
+        first = bisect_left(timestamps, since)
+        return list(zip(timestamps[first:], values[first:]))
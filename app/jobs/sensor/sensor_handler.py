@@ -0,0 +1,9 @@
+from abc import abstractmethod
+
+from app.models.sensor_transition import SensorTransition
+
+
+class SensorHandler:
+    @abstractmethod
+    def on_transition(self, transition: SensorTransition):
+        pass
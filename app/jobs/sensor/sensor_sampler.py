@@ -0,0 +1,38 @@
+from abc import abstractmethod
+from typing import List, Tuple
+
+from app.jobs.sensor.sensor_handler import SensorHandler
+
+
+class SensorSampler:
+    @abstractmethod
+    def start(self):
+        pass
+
+    @abstractmethod
+    def stop(self):
+        pass
+
+    @abstractmethod
+    def register_pin(self, gpio_pin_number: int, pull: int, debounce_ms: int, handler: SensorHandler) -> int:
+        pass
+
+    @abstractmethod
+    def update_pin(self, gpio_pin_number: int, pull: int, debounce_ms: int) -> int:
+        pass
+
+    @abstractmethod
+    def unregister_pin(self, gpio_pin_number: int):
+        pass
+
+    @abstractmethod
+    def get_last_sample(self, gpio_pin_number: int) -> Tuple[int, int, int]:
+        pass
+
+    @abstractmethod
+    def get_glitch_count(self, gpio_pin_number: int) -> int:
+        pass
+
+    @abstractmethod
+    def get_transitions(self, gpio_pin_number: int, since: int = 0) -> List[Tuple[int, int]]:
+        pass
@@ -0,0 +1,116 @@
+import datetime
+import queue
+import threading
+import time
+
+from app.jobs.sensor_event.sensor_events_writer import SensorEventsWriter
+from app.models.enums.sensor_type import SensorType
+from app.models.sensor_event import SensorEvent
+from app.models.sensor_events_writer_stats import SensorEventsWriterStats
+from app.repositories.sensor_event.sensor_event_repository import SensorEventRepository
+from app.utils.monotonic_time import monotonic_to_epoch
+
+RETRY_MIN_SECONDS = 1
+RETRY_MAX_SECONDS = 30
+
+
+# Listeners only put transitions in a bounded buffer, a background thread turns them into rows and writes them in
+# a single INSERT every batch_size events or flush_interval_ms, whatever comes first. When the database can't keep
+# up and the buffer is full, new transitions are dropped and counted instead of blocking the sampler thread.
+# A batch the database refused is retried with a growing delay while new transitions keep being buffered, it only
+# counts as failed when it still can't be written after stop was requested.
+class SensorEventsWriterImpl(SensorEventsWriter):
+    def __init__(self, sensor_event_repository: SensorEventRepository, batch_size: int = 100, flush_interval_ms: int = 1000, max_buffered: int = 10000):
+        self.sensor_event_repository = sensor_event_repository
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.buffer = queue.Queue(maxsize=max_buffered)
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.retries = 0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.write_batches)
+        self.thread.start()
+
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+
+    def record(self, gpio_pin_number: int, sensor_type: SensorType, status: str, timestamp: int):
+        try:
+            self.buffer.put_nowait((gpio_pin_number, sensor_type, status, monotonic_to_epoch(timestamp)))
+        except queue.Full:
+            self.dropped += 1
+
+
+    def get_stats(self) -> SensorEventsWriterStats:
+        return SensorEventsWriterStats(
+            buffered=self.buffer.qsize(),
+            written=self.written,
+            dropped=self.dropped,
+            failed=self.failed,
+            retries=self.retries
+        )
+
+
+    def write_batches(self):
+        # Keep going after stop is requested until the buffer is empty, so nothing recorded gets lost on shutdown
+        while not self.stopped.is_set() or not self.buffer.empty():
+            batch = self.collect_batch()
+            if batch:
+                self.write(batch)
+
+
+    def collect_batch(self):
+        try:
+            batch = [self.buffer.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self.stopped.is_set():
+                break
+            try:
+                batch.append(self.buffer.get(timeout=remaining))
+            except queue.Empty:
+                break
+        # Whatever is already buffered still goes in this batch without waiting, up to its size
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.buffer.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+
+    def write(self, batch):
+        delay = RETRY_MIN_SECONDS
+        while True:
+            # Rows are built again for every attempt, a failed session may have left the previous ones half persisted
+            sensor_events = [
+                SensorEvent(
+                    gpio_pin_number=gpio_pin_number,
+                    type=sensor_type,
+                    status=status,
+                    timestamp=datetime.datetime.fromtimestamp(epoch)
+                )
+                for gpio_pin_number, sensor_type, status, epoch in batch
+            ]
+            try:
+                self.sensor_event_repository.create_all(sensor_events)
+                self.written += len(sensor_events)
+                return
+            except Exception as e:
+                print(f"Error while writing {len(sensor_events)} sensor events: {e}")
+                if self.stopped.is_set():
+                    self.failed += len(sensor_events)
+                    return
+            self.retries += 1
+            # Stop cuts the wait short for a last attempt
+            self.stopped.wait(delay)
+            delay = min(delay * 2, RETRY_MAX_SECONDS)
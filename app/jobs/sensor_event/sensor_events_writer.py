@@ -0,0 +1,18 @@
+from abc import abstractmethod
+
+from app.models.enums.sensor_type import SensorType
+from app.models.sensor_events_writer_stats import SensorEventsWriterStats
+
+
+class SensorEventsWriter:
+    @abstractmethod
+    def stop(self):
+        pass
+
+    @abstractmethod
+    def record(self, gpio_pin_number: int, sensor_type: SensorType, status: str, timestamp: int):
+        pass
+
+    @abstractmethod
+    def get_stats(self) -> SensorEventsWriterStats:
+        pass
@@ -1,14 +1,25 @@
+from contextlib import asynccontextmanager
 from typing import List
 
 from fastapi import FastAPI
 
+from app.config.bindings import resolve
 from app.config.handlers import get_exception_handlers
+from app.jobs.event_publisher.event_publisher import EventPublisher
+from app.jobs.recording.recordings_manager import RecordingsManager
+from app.jobs.scheduler.scheduler import Scheduler
+from app.jobs.sensor.sensor_sampler import SensorSampler
+from app.jobs.sensor_event.sensor_events_writer import SensorEventsWriter
+from app.routers.impl.alarm_trace_router import AlarmTraceRouter
 from app.routers.impl.camera_router import CameraRouter
 from app.routers.impl.device_group_router import DeviceGroupRouter
 from app.routers.impl.disk_usage_router import DiskUsageRouter
+from app.routers.impl.metrics_router import MetricsRouter
 from app.routers.impl.pir_router import PirRouter
 from app.routers.impl.recording_router import RecordingRouter
 from app.routers.impl.reed_router import ReedRouter
+from app.routers.impl.scheduler_router import SchedulerRouter
+from app.routers.impl.sensor_router import SensorRouter
 from app.routers.router_wrapper import RouterWrapper
 
 exception_handlers = get_exception_handlers()
@@ -18,10 +29,29 @@ routers: List[RouterWrapper] = [
     PirRouter(),
     RecordingRouter(),
     DiskUsageRouter(),
-    DeviceGroupRouter()
+    DeviceGroupRouter(),
+    SensorRouter(),
+    SchedulerRouter(),
+    AlarmTraceRouter(),
+    MetricsRouter()
 ]
 
-app = FastAPI()
+
+# Sensor sampler is started once the event loop is running, so that it can also run as tasks on it
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    sensor_sampler = resolve(SensorSampler)
+    sensor_sampler.start()
+    yield
+    sensor_sampler.stop()
+    # After the sampler, so the transitions it recorded last are flushed too
+    resolve(SensorEventsWriter).stop()
+    resolve(Scheduler).stop()
+    resolve(EventPublisher).stop()
+    resolve(RecordingsManager).stop()
+
+
+app = FastAPI(lifespan=lifespan)
 
 for exc, handler in exception_handlers:
     app.add_exception_handler(exc, handler)
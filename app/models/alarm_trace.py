@@ -0,0 +1,13 @@
+from typing import Dict
+
+from sqlmodel import SQLModel
+
+
+class AlarmTraceDto(SQLModel):
+    id: str
+    sensor: str
+    # Epoch of the sensor edge, all offsets are from it
+    started_at: float
+    stages_ms: Dict[str, float]
+    # First progress of ffmpeg for each camera, by ip
+    cameras_ms: Dict[str, float]
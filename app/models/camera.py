@@ -1,7 +1,10 @@
 import subprocess
+from typing import Optional
 
 from sqlmodel import SQLModel, Field
 
+from app.models.enums.recording_profile import RecordingProfile
+
 
 class CameraInputDto(SQLModel):
     ip: str
@@ -11,6 +14,8 @@ class CameraInputDto(SQLModel):
     path: str
     name: str
     always_recording: bool
+    pre_roll_seconds: int = 0
+    recording_profile: RecordingProfile = RecordingProfile.AUTO
 
 
 class Camera(SQLModel, table=True):
@@ -21,6 +26,10 @@ class Camera(SQLModel, table=True):
     path: str
     name: str
     always_recording: bool
+    # Seconds of video from before an alarm fired put at the start of its recording, 0 disables it. The stream is kept
+    # connected and stream copied into RAM, costing about bitrate * (pre_roll_seconds + keyframe interval) of memory
+    pre_roll_seconds: int = Field(default=0, sa_column_kwargs={"server_default": "0"}, nullable=False)
+    recording_profile: RecordingProfile = Field(default=RecordingProfile.TRANSCODE, sa_column_kwargs={"server_default": RecordingProfile.TRANSCODE.value}, nullable=False)
 
 
     @classmethod
@@ -32,7 +41,9 @@ class Camera(SQLModel, table=True):
             password=dto.password,
             path=dto.path,
             name=dto.name,
-            always_recording=dto.always_recording
+            always_recording=dto.always_recording,
+            pre_roll_seconds=dto.pre_roll_seconds,
+            recording_profile=dto.recording_profile
         )
 
     def is_reachable(self):
@@ -52,6 +63,27 @@ class Camera(SQLModel, table=True):
         except Exception:
             return False
 
+    # Codec name of the first video stream as ffprobe calls it (h264, hevc, mjpeg...), None if it can't be probed
+    def get_video_codec(self) -> Optional[str]:
+        try:
+            command = [
+                "ffprobe",
+                "-v", "error",
+                "-rtsp_transport", "udp",
+                "-select_streams", "v:0",
+                "-show_entries", "stream=codec_name",
+                "-of", "default=noprint_wrappers=1:nokey=1",
+                f"rtsp://{self.username}:{self.password}@{self.ip}:{self.port}/{self.path}"
+            ]
+            result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=15)
+            codec = result.stdout.decode().strip()
+            if result.returncode == 0 and codec:
+                return codec
+            else:
+                return None
+        except Exception:
+            return None
+
     def __hash__(self):
         return id(self)
 
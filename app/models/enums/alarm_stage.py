@@ -0,0 +1,12 @@
+from enum import Enum
+
+
+# Stages an alarm goes through, in order: sensor edge, listener getting the transition, alarm manager handler,
+# AlarmWaiting handed to the events publisher, fire delay expired (trigger_alarm) and each camera recording
+class AlarmStage(str, Enum):
+    EDGE = "EDGE",
+    DISPATCH = "DISPATCH",
+    HANDLER = "HANDLER",
+    WAITING = "WAITING",
+    FIRE = "FIRE",
+    RECORDING = "RECORDING"
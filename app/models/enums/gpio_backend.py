@@ -0,0 +1,8 @@
+from enum import Enum
+
+
+# How listeners get notified of pin changes: EDGE uses the GPIO library interrupts, POLLING reads every pin
+# periodically and is kept as a fallback for boards/kernels where edge detection is not available.
+class GpioBackend(str, Enum):
+    EDGE = "EDGE",
+    POLLING = "POLLING"
@@ -0,0 +1,10 @@
+from enum import Enum
+
+
+# How ffmpeg writes a camera stream: COPY passes the video through as it comes (H.264/H.265 only), TRANSCODE
+# re-encodes it with libx264 at 4 fps. AUTO picks COPY when the camera codec allows it, it is resolved when the
+# camera is created so it is never stored.
+class RecordingProfile(str, Enum):
+    AUTO = "AUTO",
+    COPY = "COPY",
+    TRANSCODE = "TRANSCODE"
@@ -0,0 +1,11 @@
+from enum import Enum
+
+
+# Lifecycle of the ffmpeg of a camera: STARTING until it reports progress, RECORDING while it does, STOPPING once asked
+# to stop until it exits (STOPPED), FAILED if it exited on its own
+class RecordingState(str, Enum):
+    STARTING = "STARTING",
+    RECORDING = "RECORDING",
+    STOPPING = "STOPPING",
+    STOPPED = "STOPPED",
+    FAILED = "FAILED"
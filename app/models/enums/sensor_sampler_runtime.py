@@ -0,0 +1,7 @@
+from enum import Enum
+
+
+# Where the sensor sampler runs: THREAD on a dedicated thread, ASYNCIO as tasks on the event loop of the application
+class SensorSamplerRuntime(str, Enum):
+    THREAD = "THREAD",
+    ASYNCIO = "ASYNCIO"
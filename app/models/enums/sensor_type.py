@@ -0,0 +1,6 @@
+from enum import Enum
+
+
+class SensorType(str, Enum):
+    REED = "REED",
+    PIR = "PIR"
@@ -0,0 +1,25 @@
+from typing import Dict, Sequence
+
+from app.models.device_group import DeviceGroup
+from app.models.pir import Pir
+from app.models.reed import Reed
+
+
+# In memory copy of the group that is listening, with the names of its sensors by GPIO pin number, so that sensor
+# callbacks can decide whether to start the alarm without going to the database.
+# Never changed once built, a new one replaces it when another group starts listening.
+class ListeningGroup:
+    __slots__ = ("group", "reed_names", "pir_names")
+
+    def __init__(self, group: DeviceGroup, reed_names: Dict[int, str], pir_names: Dict[int, str]):
+        self.group = group
+        self.reed_names = reed_names
+        self.pir_names = pir_names
+
+    @classmethod
+    def from_devices(cls, group: DeviceGroup, reeds: Sequence[Reed], pirs: Sequence[Pir]):
+        return cls(
+            group=group,
+            reed_names={reed.gpio_pin_number: reed.name for reed in reeds},
+            pir_names={pir.gpio_pin_number: pir.name for pir in pirs},
+        )
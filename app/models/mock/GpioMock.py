@@ -8,6 +8,13 @@ class GpioMock:
     PUD_UP = 1
     PUD_DOWN = -1
     PUD_OFF = 0
+    RISING = 31
+    FALLING = 32
+    BOTH = 33
+
+    # Mocked pin levels and edge detection callbacks, shared like the real library state
+    values = {}
+    edge_detections = {}
 
     def __init__(self):
         pass
@@ -22,12 +29,48 @@ class GpioMock:
 
     @staticmethod
     def output(channel, state):
-        pass
+        GpioMock.inject_edge(channel, state)
 
     @staticmethod
     def input(channel):
-        return GpioMock.LOW
+        return GpioMock.values.get(channel, GpioMock.LOW)
+
+    @staticmethod
+    def add_event_detect(channel, edge, callback=None, bouncetime=None):
+        if channel in GpioMock.edge_detections:
+            raise RuntimeError("Conflicting edge detection already enabled for this GPIO channel")
+        GpioMock.edge_detections[channel] = (edge, [callback] if callback is not None else [])
+
+    @staticmethod
+    def add_event_callback(channel, callback):
+        if channel not in GpioMock.edge_detections:
+            raise RuntimeError("Add event detection using add_event_detect first before adding a callback")
+        GpioMock.edge_detections[channel][1].append(callback)
+
+    @staticmethod
+    def remove_event_detect(channel):
+        GpioMock.edge_detections.pop(channel, None)
 
     @staticmethod
     def cleanup(channel=None):
-        pass
+        if channel is None:
+            GpioMock.values.clear()
+            GpioMock.edge_detections.clear()
+        else:
+            GpioMock.values.pop(channel, None)
+            GpioMock.edge_detections.pop(channel, None)
+
+    # Not part of RPi.GPIO: sets the level of a pin as if it changed on the board, running the edge callbacks
+    # registered for it like the library would do from its own event thread.
+    @staticmethod
+    def inject_edge(channel, value):
+        previous = GpioMock.values.get(channel, GpioMock.LOW)
+        GpioMock.values[channel] = value
+        if previous == value or channel not in GpioMock.edge_detections:
+            return
+
+        edge, callbacks = GpioMock.edge_detections[channel]
+        rising = value == GpioMock.HIGH
+        if edge == GpioMock.BOTH or (edge == GpioMock.RISING and rising) or (edge == GpioMock.FALLING and not rising):
+            for callback in list(callbacks):
+                callback(channel)
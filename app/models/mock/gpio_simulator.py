@@ -0,0 +1,121 @@
+import csv
+import heapq
+import itertools
+import random
+import threading
+import time
+from typing import Iterable, Optional, Tuple
+
+from app.models.mock.GpioMock import GpioMock
+from app.models.mock.virtual_clock import VirtualClock
+
+
+# Drives GpioMock pin levels from a script of timed level changes, to exercise listeners and alarm manager off-device.
+# Events are (seconds from the start of the scenario, pin, level) and can be added one by one, loaded from a recorded
+# trace or generated. They are replayed either:
+# - on a VirtualClock with advance(), injecting every due change in order and moving the clock to its exact time, so
+#   scenarios are deterministic and run as fast as the consumers allow;
+# - in real time (optionally sped up) with start(), from a single thread that injects all the changes that are due
+#   on each wake up, which keeps up with hundreds of pins at kHz rates.
+#
+# Example, door opening at t=3s and motion at t=3.2s:
+#   GpioSimulator(clock).at(3.0, REED_PIN, GpioMock.HIGH).at(3.2, PIR_PIN, GpioMock.HIGH).advance(5)
+class GpioSimulator:
+    def __init__(self, clock: Optional[VirtualClock] = None):
+        self.clock = clock
+        self.start_ns = clock.monotonic_ns() if clock is not None else 0
+        self.events = []
+        self.sequence = itertools.count()
+        self.elapsed = 0.0
+        self.injected = 0
+        self.stopped = threading.Event()
+        self.thread = None
+
+
+    def at(self, seconds: float, gpio_pin_number: int, value: int):
+        heapq.heappush(self.events, (seconds, next(self.sequence), gpio_pin_number, value))
+        return self
+
+
+    def load_trace(self, rows: Iterable[Tuple[float, int, int]]):
+        for seconds, gpio_pin_number, value in rows:
+            self.at(float(seconds), int(gpio_pin_number), int(value))
+        return self
+
+
+    # Recorded trace as csv lines of seconds,pin,level
+    def load_trace_csv(self, path: str):
+        with open(path, newline="") as file:
+            return self.load_trace(row for row in csv.reader(file) if row and not row[0].startswith("#"))
+
+
+    def square_wave(self, gpio_pin_number: int, frequency_hz: float, duration: float, start: float = 0.0):
+        half_period = 1 / (2 * frequency_hz)
+        for i in range(int(duration / half_period)):
+            self.at(start + i * half_period, gpio_pin_number, GpioMock.HIGH if i % 2 == 0 else GpioMock.LOW)
+        return self
+
+
+    # Random level flips on every pin, rate_hz is the average number of flips per second on each pin
+    def random_chatter(self, gpio_pin_numbers: Iterable[int], rate_hz: float, duration: float, start: float = 0.0, seed: int = 0):
+        generator = random.Random(seed)
+        for gpio_pin_number in gpio_pin_numbers:
+            seconds = start
+            value = GpioMock.input(gpio_pin_number)
+            while True:
+                seconds += generator.expovariate(rate_hz)
+                if seconds >= start + duration:
+                    break
+                value = GpioMock.LOW if value == GpioMock.HIGH else GpioMock.HIGH
+                self.at(seconds, gpio_pin_number, value)
+        return self
+
+
+    def pending(self) -> int:
+        return len(self.events)
+
+
+    # Virtual clock only: replay everything due in the next seconds of simulated time
+    def advance(self, seconds: float):
+        if self.clock is None:
+            raise RuntimeError("advance needs a virtual clock, use start for real time replay")
+
+        self.elapsed += seconds
+        while self.events and self.events[0][0] <= self.elapsed:
+            event_seconds, _, gpio_pin_number, value = heapq.heappop(self.events)
+            self.clock.advance_to(self.start_ns + int(event_seconds * 1e9))
+            self.inject(gpio_pin_number, value)
+        self.clock.advance_to(self.start_ns + int(self.elapsed * 1e9))
+        return self
+
+
+    def start(self, speed: float = 1.0):
+        self.thread = threading.Thread(target=self.replay, args=(speed,))
+        self.thread.start()
+        return self
+
+
+    def wait(self):
+        if self.thread is not None:
+            self.thread.join()
+
+
+    def stop(self):
+        self.stopped.set()
+        self.wait()
+
+
+    def replay(self, speed: float):
+        started = time.monotonic()
+        while self.events and not self.stopped.is_set():
+            self.elapsed = (time.monotonic() - started) * speed
+            while self.events and self.events[0][0] <= self.elapsed:
+                _, _, gpio_pin_number, value = heapq.heappop(self.events)
+                self.inject(gpio_pin_number, value)
+            if self.events:
+                self.stopped.wait(max(0.0, (self.events[0][0] - self.elapsed) / speed))
+
+
+    def inject(self, gpio_pin_number: int, value: int):
+        GpioMock.inject_edge(gpio_pin_number, value)
+        self.injected += 1
@@ -0,0 +1,23 @@
+import threading
+
+
+# Clock that only moves when told to, so simulated sensor scenarios run as fast as possible and always produce the
+# same timestamps. Can be passed wherever time.monotonic_ns is expected.
+class VirtualClock:
+    def __init__(self, start_ns: int = 0):
+        self.now_ns = start_ns
+        self.lock = threading.Lock()
+
+    def monotonic_ns(self) -> int:
+        return self.now_ns
+
+    def __call__(self) -> int:
+        return self.now_ns
+
+    def advance_to(self, timestamp_ns: int):
+        with self.lock:
+            self.now_ns = max(self.now_ns, timestamp_ns)
+
+    def advance(self, seconds: float):
+        with self.lock:
+            self.now_ns += int(seconds * 1e9)
@@ -4,17 +4,22 @@ from sqlmodel import SQLModel, Field
 class PirInputDto(SQLModel):
     gpio_pin_number: int
     name: str
+    debounce_ms: int = 0
 
 
 class Pir(SQLModel, table=True):
     gpio_pin_number: int = Field(primary_key=True)
     name: str
     listening: bool
+    # A new level has to hold for this long before being considered a real transition, shorter flips are glitches.
+    # When polled, that is checked on the next sample, see SensorSamplerImpl
+    debounce_ms: int = Field(default=0, sa_column_kwargs={"server_default": "0"}, nullable=False)
 
     @classmethod
     def from_dto(cls, dto: PirInputDto):
         return cls(
             gpio_pin_number=dto.gpio_pin_number,
             name=dto.name,
-            listening=False
+            listening=False,
+            debounce_ms=dto.debounce_ms
         )
@@ -1,4 +1,5 @@
 import datetime
+import os
 
 from sqlmodel import SQLModel, Field
 
@@ -10,6 +11,17 @@ def get_alarm_recordings_path():
 def get_recordings_path():
     return "/var/lib/devices-manager/data/recordings"
 
+# tmpfs, pre-roll segments of cameras are kept in RAM
+def get_pre_roll_path():
+    return "/dev/shm/devices-manager/pre_roll"
+
+# Files written by a segmented recording are numbered, starting from the name the first one was created with
+def get_segment_name(name: str, index: int) -> str:
+    return f"{os.path.splitext(name)[0]}_{index:04d}.mkv"
+
+def get_segment_pattern(first_segment_name: str) -> str:
+    return f"{first_segment_name[:-len('_0000.mkv')]}_%04d.mkv"
+
 # Recordings and cameras are shallowly linked: each recording was made with a camera, but if a camera
 # gets deleted we do not want to delete the recording, so we just keep the camera ip as a link that can be
 # broken and should not raise exceptions because of that.
@@ -0,0 +1,22 @@
+from sqlmodel import SQLModel
+
+from app.models.enums.recording_profile import RecordingProfile
+from app.models.enums.recording_state import RecordingState
+
+
+# Latest progress report of the ffmpeg recording a camera. Counters are since that ffmpeg started.
+class RecordingStatsDto(SQLModel):
+    camera_ip: str
+    recording_name: str
+    profile: RecordingProfile
+    state: RecordingState
+    frames: int
+    fps: float
+    bitrate_kbps: float
+    # Media time written per second, below 1 the camera is recorded slower than real time and footage gets lost
+    speed: float
+    dropped_frames: int
+    duplicated_frames: int
+    size_bytes: int
+    # Epoch of the progress report
+    updated_at: float
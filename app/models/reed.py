@@ -6,6 +6,7 @@ class ReedInputDto(SQLModel):
     name: str
     normally_closed: bool
     vcc: bool
+    debounce_ms: int = 50
 
 
 class Reed(SQLModel, table=True):
@@ -14,6 +15,9 @@ class Reed(SQLModel, table=True):
     normally_closed: bool
     vcc: bool
     listening: bool
+    # A new level has to hold for this long before being considered a real transition, shorter flips are glitches.
+    # When polled, that is checked on the next sample, see SensorSamplerImpl
+    debounce_ms: int = Field(default=50, sa_column_kwargs={"server_default": "50"}, nullable=False)
 
     @classmethod
     def from_dto(cls, dto: ReedInputDto):
@@ -22,5 +26,6 @@ class Reed(SQLModel, table=True):
             name=dto.name,
             normally_closed=dto.normally_closed,
             vcc=dto.vcc,
-            listening=False
+            listening=False,
+            debounce_ms=dto.debounce_ms
         )
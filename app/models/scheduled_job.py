@@ -0,0 +1,7 @@
+from sqlmodel import SQLModel
+
+
+class ScheduledJobDto(SQLModel):
+    id: int
+    name: str
+    remaining_seconds: float
@@ -0,0 +1,22 @@
+import datetime
+from typing import Optional
+
+from sqlmodel import SQLModel, Field
+
+from app.models.enums.sensor_type import SensorType
+
+
+class SensorEventDto(SQLModel):
+    timestamp: float
+    status: str
+
+
+# Stable transitions persisted for forensics after an alarm, written in batches by the sensor events writer
+class SensorEvent(SQLModel, table=True):
+    __tablename__ = "sensor_event"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    gpio_pin_number: int = Field(index=True)
+    type: SensorType
+    status: str
+    timestamp: datetime.datetime = Field(index=True)
@@ -0,0 +1,11 @@
+from sqlmodel import SQLModel
+
+
+class SensorEventsWriterStats(SQLModel):
+    buffered: int
+    written: int
+    dropped: int
+    # Given up on, only once stopping
+    failed: int
+    # Attempts at writing a batch again after the database refused it
+    retries: int
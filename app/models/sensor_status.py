@@ -0,0 +1,15 @@
+from sqlmodel import SQLModel
+
+from app.models.enums.sensor_type import SensorType
+
+
+# Last stable state of a sensor as seen by the sampler
+class SensorStatusDto(SQLModel):
+    gpio_pin_number: int
+    type: SensorType
+    name: str
+    status: str
+    # Since the sample the state is known from, at most a sample period when polling and the drain timeout with edges
+    age_ms: int
+    # Since the state last changed
+    in_state_ms: int
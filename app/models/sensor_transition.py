@@ -0,0 +1,9 @@
+# A raw level change seen on a monitored pin, timestamped with time.monotonic_ns() as close as possible to the edge.
+# Decoding the level into a device status is left to the handler registered for the pin.
+class SensorTransition:
+    __slots__ = ("pin", "value", "timestamp")
+
+    def __init__(self, pin: int, value: int, timestamp: int):
+        self.pin = pin
+        self.value = value
+        self.timestamp = timestamp
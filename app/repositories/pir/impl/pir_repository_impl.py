@@ -53,6 +53,7 @@ class PirRepositoryImpl(PirRepository):
             raise NotFoundException("Pir was not found")
 
         pir_db.name = pir.name
+        pir_db.debounce_ms = pir.debounce_ms
         session.commit()
         session.refresh(pir_db)
         session.close()
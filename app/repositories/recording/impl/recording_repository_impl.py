@@ -48,6 +48,18 @@ class RecordingRepositoryImpl(RecordingRepository):
         raise BadRequestException("Recording already exists")
 
 
+    # Single transaction and insert for all of them. Ids are assigned by the flush, detaching before the commit keeps
+    # the loaded values instead of reloading every row
+    def create_all(self, recordings: Sequence[Recording]) -> Sequence[Recording]:
+        session = self.database_connector.get_new_session()
+        session.add_all(recordings)
+        session.flush()
+        session.expunge_all()
+        session.commit()
+        session.close()
+        return recordings
+
+
     def set_stopped(self, recording: Recording) -> Recording:
         statement = select(Recording).where(Recording.id == recording.id)
         session = self.database_connector.get_new_session()
@@ -17,6 +17,10 @@ class RecordingRepository(ABC):
     def create(self, recording: Recording) -> Recording:
         pass
 
+    @abstractmethod
+    def create_all(self, recordings: Sequence[Recording]) -> Sequence[Recording]:
+        pass
+
     @abstractmethod
     def set_stopped(self, recording: Recording) -> Recording:
         pass
@@ -55,6 +55,7 @@ class ReedRepositoryImpl(ReedRepository):
         reed_db.vcc = reed.vcc
         reed_db.normally_closed = reed.normally_closed
         reed_db.name = reed.name
+        reed_db.debounce_ms = reed.debounce_ms
         session.commit()
         session.refresh(reed_db)
         session.close()
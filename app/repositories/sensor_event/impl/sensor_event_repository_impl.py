@@ -0,0 +1,20 @@
+from typing import Sequence
+
+from app.database.database_connector import DatabaseConnector
+from app.models.sensor_event import SensorEvent
+from app.repositories.sensor_event.sensor_event_repository import SensorEventRepository
+
+
+class SensorEventRepositoryImpl(SensorEventRepository):
+    def __init__(self, database_connector: DatabaseConnector):
+        self.database_connector = database_connector
+
+
+    def create_all(self, sensor_events: Sequence[SensorEvent]):
+        # Objects of the same table added together are flushed by SQLAlchemy as a single multi-row INSERT
+        session = self.database_connector.get_new_session()
+        try:
+            session.add_all(sensor_events)
+            session.commit()
+        finally:
+            session.close()
@@ -0,0 +1,10 @@
+from abc import ABC, abstractmethod
+from typing import Sequence
+
+from app.models.sensor_event import SensorEvent
+
+
+class SensorEventRepository(ABC):
+    @abstractmethod
+    def create_all(self, sensor_events: Sequence[SensorEvent]):
+        pass
@@ -0,0 +1,24 @@
+from typing import Sequence
+
+from app.config.bindings import inject
+from app.jobs.alarm_tracer.alarm_tracer import AlarmTracer
+from app.models.alarm_trace import AlarmTraceDto
+from app.routers.router_wrapper import RouterWrapper
+
+
+class AlarmTraceRouter(RouterWrapper):
+    @inject
+    def __init__(self, alarm_tracer: AlarmTracer):
+        super().__init__(prefix=f"/alarm-traces")
+        self.alarm_tracer = alarm_tracer
+
+
+    def _define_routes(self):
+        @self.router.get("")
+        def get_alarm_traces() -> Sequence[AlarmTraceDto]:
+            return self.alarm_tracer.get_traces()
+
+
+        @self.router.get("/{trace_id}")
+        def get_alarm_trace(trace_id: str) -> AlarmTraceDto:
+            return self.alarm_tracer.get_trace(trace_id)
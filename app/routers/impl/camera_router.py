@@ -8,6 +8,7 @@ from fastapi.responses import StreamingResponse
 
 from app.config.bindings import inject
 from app.models.camera import Camera, CameraInputDto
+from app.models.recording_stats import RecordingStatsDto
 from app.routers.router_wrapper import RouterWrapper
 from app.services.camera.camera_service import CameraService
 
@@ -42,6 +43,11 @@ class CameraRouter(RouterWrapper):
             return self.camera_service.get_all()
 
 
+        @self.router.get("/{ip}/recording-stats")
+        def get_camera_recording_stats_by_ip(ip: str) -> RecordingStatsDto:
+            return self.camera_service.get_recording_stats_by_ip(ip)
+
+
         @self.router.get("/{ip}/stream")
         async def get_camera_stream_by_ip(request: Request, ip: str):
             return None
\ No newline at end of file
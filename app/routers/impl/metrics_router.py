@@ -0,0 +1,16 @@
+from fastapi import Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+from app.routers.router_wrapper import RouterWrapper
+
+
+class MetricsRouter(RouterWrapper):
+    def __init__(self):
+        super().__init__(prefix=f"")
+
+
+    def _define_routes(self):
+        # Prometheus text format, for scraping
+        @self.router.get("/metrics")
+        def get_metrics():
+            return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -1,7 +1,9 @@
-from typing import Sequence
+from typing import Optional, Sequence
 
 from app.config.bindings import inject
 from app.models.pir import Pir, PirInputDto
+from app.models.sensor_event import SensorEventDto
+from app.models.sensor_status import SensorStatusDto
 from app.routers.router_wrapper import RouterWrapper
 from app.services.pir.pir_service import PirService
 
@@ -43,5 +45,15 @@ class PirRouter(RouterWrapper):
 
 
         @self.router.get("/{gpio_pin_number}/status")
-        def get_pir_status_by_gpio_pin_number(gpio_pin_number: int):
-            return self.pir_service.get_status_by_pin(gpio_pin_number).to_dict()
+        def get_pir_status_by_gpio_pin_number(gpio_pin_number: int) -> SensorStatusDto:
+            return self.pir_service.get_status_by_pin(gpio_pin_number)
+
+
+        @self.router.get("/{gpio_pin_number}/glitches")
+        def get_pir_glitch_count_by_gpio_pin_number(gpio_pin_number: int):
+            return {"glitches": self.pir_service.get_glitch_count_by_pin(gpio_pin_number)}
+
+
+        @self.router.get("/{gpio_pin_number}/events")
+        def get_pir_events_by_gpio_pin_number(gpio_pin_number: int, since: Optional[float] = None) -> Sequence[SensorEventDto]:
+            return self.pir_service.get_events_by_pin(gpio_pin_number, since)
@@ -1,7 +1,9 @@
-from typing import Sequence
+from typing import Optional, Sequence
 
 from app.config.bindings import inject
 from app.models.reed import Reed, ReedInputDto
+from app.models.sensor_event import SensorEventDto
+from app.models.sensor_status import SensorStatusDto
 from app.routers.router_wrapper import RouterWrapper
 from app.services.reed.reed_service import ReedService
 
@@ -43,5 +45,15 @@ class ReedRouter(RouterWrapper):
 
 
         @self.router.get("/{gpio_pin_number}/status")
-        def get_reed_status_by_gpio_pin_number(gpio_pin_number: int):
-            return self.reed_service.get_status_by_pin(gpio_pin_number).to_dict()
+        def get_reed_status_by_gpio_pin_number(gpio_pin_number: int) -> SensorStatusDto:
+            return self.reed_service.get_status_by_pin(gpio_pin_number)
+
+
+        @self.router.get("/{gpio_pin_number}/glitches")
+        def get_reed_glitch_count_by_gpio_pin_number(gpio_pin_number: int):
+            return {"glitches": self.reed_service.get_glitch_count_by_pin(gpio_pin_number)}
+
+
+        @self.router.get("/{gpio_pin_number}/events")
+        def get_reed_events_by_gpio_pin_number(gpio_pin_number: int, since: Optional[float] = None) -> Sequence[SensorEventDto]:
+            return self.reed_service.get_events_by_pin(gpio_pin_number, since)
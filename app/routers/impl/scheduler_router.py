@@ -0,0 +1,19 @@
+from typing import Sequence
+
+from app.config.bindings import inject
+from app.jobs.scheduler.scheduler import Scheduler
+from app.models.scheduled_job import ScheduledJobDto
+from app.routers.router_wrapper import RouterWrapper
+
+
+class SchedulerRouter(RouterWrapper):
+    @inject
+    def __init__(self, scheduler: Scheduler):
+        super().__init__(prefix=f"/scheduler")
+        self.scheduler = scheduler
+
+
+    def _define_routes(self):
+        @self.router.get("/jobs")
+        def get_scheduled_jobs() -> Sequence[ScheduledJobDto]:
+            return self.scheduler.get_jobs()
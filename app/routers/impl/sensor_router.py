@@ -0,0 +1,29 @@
+from typing import Sequence
+
+from app.config.bindings import inject
+from app.models.sensor_events_writer_stats import SensorEventsWriterStats
+from app.models.sensor_status import SensorStatusDto
+from app.routers.router_wrapper import RouterWrapper
+from app.services.pir.pir_service import PirService
+from app.services.reed.reed_service import ReedService
+from app.services.sensor_event.sensor_event_service import SensorEventService
+
+
+class SensorRouter(RouterWrapper):
+    @inject
+    def __init__(self, reed_service: ReedService, pir_service: PirService, sensor_event_service: SensorEventService):
+        super().__init__(prefix=f"/sensors")
+        self.reed_service = reed_service
+        self.pir_service = pir_service
+        self.sensor_event_service = sensor_event_service
+
+
+    def _define_routes(self):
+        @self.router.get("/status")
+        def get_all_sensors_status() -> Sequence[SensorStatusDto]:
+            return [*self.reed_service.get_all_statuses(), *self.pir_service.get_all_statuses()]
+
+
+        @self.router.get("/events-writer")
+        def get_sensor_events_writer_stats() -> SensorEventsWriterStats:
+            return self.sensor_event_service.get_writer_stats()
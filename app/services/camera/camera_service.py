@@ -2,6 +2,7 @@ from abc import ABC, abstractmethod
 from typing import Sequence
 
 from app.models.camera import Camera
+from app.models.recording_stats import RecordingStatsDto
 
 
 class CameraService(ABC):
@@ -20,3 +21,7 @@ class CameraService(ABC):
     @abstractmethod
     def get_all(self) -> Sequence[Camera]:
         pass
+
+    @abstractmethod
+    def get_recording_stats_by_ip(self, ip: str) -> RecordingStatsDto:
+        pass
@@ -2,21 +2,31 @@ from typing import Sequence
 
 from app.exceptions.bad_request_exception import BadRequestException
 from app.models.camera import Camera
+from app.models.enums.recording_profile import RecordingProfile
 from app.models.recording import RecordingInputDto, Recording
+from app.models.recording_stats import RecordingStatsDto
 from app.repositories.camera.camera_repository import CameraRepository
 from app.services.camera.camera_service import CameraService
 from app.services.recording.recording_service import RecordingService
 
+# Pre-roll is kept in RAM, so it can't be as long as anyone wants
+MAX_PRE_ROLL_SECONDS = 60
+# Codecs matroska takes as they come from the camera, others have to be transcoded
+COPY_CODECS = ("h264", "hevc")
+
 
 class CameraServiceImpl(CameraService):
     def __init__(self, camera_repository: CameraRepository, recording_service: RecordingService):
         self.camera_repository = camera_repository
         self.recording_service = recording_service
 
-        # Start recording existing cameras on boot (only if always recording is set to true)
+        # Start recording existing cameras on boot (only if always recording is set to true), buffering the others
+        # if they have a pre-roll
         for camera in self.camera_repository.find_all():
             if camera.always_recording:
                 self.recording_service.create_and_start_recording(Recording.from_dto(RecordingInputDto(camera_ip=camera.ip, always_recording=True)), auto_restart=True)
+            else:
+                self.recording_service.start_pre_roll(camera)
 
 
     def get_by_ip(self, ip: str) -> Camera:
@@ -24,24 +34,51 @@ class CameraServiceImpl(CameraService):
 
 
     def create(self, camera: Camera) -> Camera:
+        if not 0 <= camera.pre_roll_seconds <= MAX_PRE_ROLL_SECONDS:
+            raise BadRequestException(f"Pre-roll must be between 0 and {MAX_PRE_ROLL_SECONDS} seconds")
+
         # Stop user from adding an unreachable camera.
         # A camera can still become unreachable but prevent creating one that already is.
         if not camera.is_reachable():
             raise BadRequestException("Camera is not reachable")
 
+        camera.recording_profile = self.resolve_recording_profile(camera)
         camera = self.camera_repository.create(camera)
 
         # Start recording new camera if needed
         if camera.always_recording:
             self.recording_service.create_and_start_recording(Recording.from_dto(RecordingInputDto(camera_ip=camera.ip, always_recording=True)), auto_restart=True)
+        else:
+            self.recording_service.start_pre_roll(camera)
         return camera
 
 
+    # AUTO and COPY become COPY only if ffprobe finds a codec that can be copied, a camera asking for COPY that can't
+    # have it is transcoded instead of being refused
+    def resolve_recording_profile(self, camera: Camera) -> RecordingProfile:
+        if camera.recording_profile == RecordingProfile.TRANSCODE:
+            return RecordingProfile.TRANSCODE
+
+        codec = camera.get_video_codec()
+        if codec in COPY_CODECS:
+            return RecordingProfile.COPY
+
+        print(f"Camera on {camera.ip} streams {codec}, recording it transcoded")
+        return RecordingProfile.TRANSCODE
+
+
     def delete_by_ip(self, ip: str) -> Camera:
         camera = self.camera_repository.delete_by_ip(ip)
         self.recording_service.stop_by_camera_ip(ip)
+        self.recording_service.stop_pre_roll(ip)
         return camera
 
 
     def get_all(self) -> Sequence[Camera]:
         return self.camera_repository.find_all()
+
+
+    def get_recording_stats_by_ip(self, ip: str) -> RecordingStatsDto:
+        # Not found for an unknown camera rather than for one that is not recording
+        camera = self.camera_repository.find_by_ip(ip)
+        return self.recording_service.get_stats_by_camera_ip(camera.ip)
@@ -2,11 +2,12 @@ import asyncio
 import time
 from typing import Sequence
 
-from rabbitmq_sdk.client.rabbitmq_client import RabbitMQClient
 from rabbitmq_sdk.event.impl.devices_manager.alarm_waiting import AlarmWaiting
 
 from app.exceptions.bad_request_exception import BadRequestException
 from app.jobs.alarm.alarm_manager import AlarmManager
+from app.jobs.event_publisher.event_publisher import EventPublisher
+from app.jobs.pir.pirs_listener import PirsListener
 from app.jobs.reed.reeds_listener import ReedsListener
 from app.models.device_group import DeviceGroup
 from app.models.enums.device_group_status import DeviceGroupStatus
@@ -17,7 +18,6 @@ from app.repositories.device_group.device_group_repository import DeviceGroupRep
 from app.repositories.pir.pir_repository import PirRepository
 from app.repositories.reed.reed_repository import ReedRepository
 from app.services.device_group.device_group_service import DeviceGroupService
-from app.utils.delayed_execution import delay_execution
 
 
 class DeviceGroupServiceImpl(DeviceGroupService):
@@ -25,14 +25,18 @@ class DeviceGroupServiceImpl(DeviceGroupService):
                  camera_repository: CameraRepository,
                  reed_repository: ReedRepository,
                  pir_repository: PirRepository,
+                 reeds_listener: ReedsListener,
+                 pirs_listener: PirsListener,
                  alarm_manager: AlarmManager,
-                 rabbitmq_client: RabbitMQClient):
+                 event_publisher: EventPublisher):
         self.device_group_repository = device_group_repository
         self.camera_repository = camera_repository
         self.reed_repository = reed_repository
         self.pir_repository = pir_repository
+        self.reeds_listener = reeds_listener
+        self.pirs_listener = pirs_listener
         self.alarm_manager = alarm_manager
-        self.rabbitmq_client = rabbitmq_client
+        self.event_publisher = event_publisher
 
 
     def create_device_group(self, device_group: DeviceGroup) -> DeviceGroup:
@@ -100,9 +104,8 @@ class DeviceGroupServiceImpl(DeviceGroupService):
         if not self.device_group_repository.are_all_groups_idle():
             raise BadRequestException("Not all groups are idle, can't start listening")
 
-        while not self.rabbitmq_client.publish(AlarmWaiting(True, int(time.time()))):
-            time.sleep(1)
-        delay_execution(func=self.do_start_listening, args=(group_id, ), delay_seconds=group.wait_to_start_alarm)
+        self.event_publisher.publish(AlarmWaiting(True, int(time.time())))
+        self.alarm_manager.schedule_start_listening(group_id, group.wait_to_start_alarm, self.do_start_listening)
 
         group.status = DeviceGroupStatus.WAITING_TO_START_LISTENING
         self.device_group_repository.update_device_group(group)
@@ -112,8 +115,8 @@ class DeviceGroupServiceImpl(DeviceGroupService):
 
     def stop_listening(self, group_id: int) -> DeviceGroup:
         group = self.get_device_group_by_id(group_id)
-        if group.status != DeviceGroupStatus.LISTENING and group.status != DeviceGroupStatus.ALARM:
-            raise BadRequestException("Group is not listening or in alarm")
+        if group.status not in (DeviceGroupStatus.WAITING_TO_START_LISTENING, DeviceGroupStatus.LISTENING, DeviceGroupStatus.ALARM):
+            raise BadRequestException("Group is not waiting to listen, listening or in alarm")
         self.do_stop_listening(group_id)
         return self.get_device_group_by_id(group_id)
 
@@ -123,26 +126,37 @@ class DeviceGroupServiceImpl(DeviceGroupService):
         group.status = DeviceGroupStatus.LISTENING
         self.device_group_repository.update_device_group(group)
 
+        # The alarm manager has to know the group before its sensors start calling back
         reeds = self.get_device_group_reeds_by_id(group_id)
+        pirs = self.get_device_group_pirs_by_id(group_id)
+        self.alarm_manager.on_group_started_listening(group, reeds, pirs)
+
         for reed in reeds:
             self.reed_repository.update_listening(reed, True)
+            self.reeds_listener.set_listening(reed, True)
 
-        pirs = self.get_device_group_pirs_by_id(group_id)
         for pir in pirs:
             self.pir_repository.update_listening(pir, True)
+            self.pirs_listener.set_listening(pir, True)
 
-        while not self.rabbitmq_client.publish(AlarmWaiting(False, int(time.time()))):
-            time.sleep(1)
+        self.event_publisher.publish(AlarmWaiting(False, int(time.time())))
 
 
     def do_stop_listening(self, group_id: int):
+        # A group still waiting to start listening never gets to it, and clients were told it was waiting
+        if self.alarm_manager.cancel_start_listening():
+            self.event_publisher.publish(AlarmWaiting(False, int(time.time())))
+        self.alarm_manager.on_group_stopped_listening()
+
         reeds = self.get_device_group_reeds_by_id(group_id)
         for reed in reeds:
             self.reed_repository.update_listening(reed, False)
+            self.reeds_listener.set_listening(reed, False)
 
         pirs = self.get_device_group_pirs_by_id(group_id)
         for pir in pirs:
             self.pir_repository.update_listening(pir, False)
+            self.pirs_listener.set_listening(pir, False)
 
         self.alarm_manager.stop_alarm()
 
@@ -1,10 +1,11 @@
-from typing import Sequence
+from typing import Optional, Sequence
 
 from app.exceptions.bad_request_exception import BadRequestException
 from app.exceptions.unupdateable_data_exception import UnupdateableDataException
 from app.jobs.pir.pirs_listener import PirsListener
-from app.models.enums.pir_status import PirStatus
 from app.models.pir import Pir
+from app.models.sensor_event import SensorEventDto
+from app.models.sensor_status import SensorStatusDto
 from app.repositories.pir.pir_repository import PirRepository
 from app.services.pir.pir_service import PirService
 
@@ -24,6 +25,9 @@ class PirServiceImpl(PirService):
 
 
     def create(self, pir: Pir) -> Pir:
+        if pir.debounce_ms < 0:
+            raise BadRequestException("Debounce can't be negative")
+
         pir = self.pir_repository.create(pir)
         self.pirs_listener.add_pir(pir)
         return pir
@@ -36,6 +40,9 @@ class PirServiceImpl(PirService):
         if pir.listening:
             raise BadRequestException("Can't set listening here")
 
+        if pir.debounce_ms < 0:
+            raise BadRequestException("Debounce can't be negative")
+
         if self.pir_repository.find_by_gpio_pin_number(gpio_pin_number).listening:
             raise BadRequestException("Can't update while listening")
 
@@ -57,6 +64,19 @@ class PirServiceImpl(PirService):
         return self.pir_repository.find_all()
 
 
-    def get_status_by_pin(self, gpio_pin_number: int) -> PirStatus:
+    def get_status_by_pin(self, gpio_pin_number: int) -> SensorStatusDto:
+        return self.pirs_listener.get_status_by_pin(gpio_pin_number)
+
+
+    def get_all_statuses(self) -> Sequence[SensorStatusDto]:
+        return self.pirs_listener.get_all_statuses()
+
+
+    def get_glitch_count_by_pin(self, gpio_pin_number: int) -> int:
         pir = self.pir_repository.find_by_gpio_pin_number(gpio_pin_number)
-        return self.pirs_listener.get_status_by_pir(pir)
+        return self.pirs_listener.get_glitch_count_by_pir(pir)
+
+
+    def get_events_by_pin(self, gpio_pin_number: int, since: Optional[float]) -> Sequence[SensorEventDto]:
+        # No repository lookup here, history is only kept for monitored pins so the listener already knows them
+        return self.pirs_listener.get_events_by_pin(gpio_pin_number, since)
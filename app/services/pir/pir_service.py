@@ -1,8 +1,9 @@
 from abc import ABC, abstractmethod
-from typing import Sequence
+from typing import Optional, Sequence
 
-from app.models.enums.pir_status import PirStatus
 from app.models.pir import Pir
+from app.models.sensor_event import SensorEventDto
+from app.models.sensor_status import SensorStatusDto
 
 
 class PirService(ABC):
@@ -27,5 +28,17 @@ class PirService(ABC):
         pass
 
     @abstractmethod
-    def get_status_by_pin(self, gpio_pin_number: int) -> PirStatus:
+    def get_status_by_pin(self, gpio_pin_number: int) -> SensorStatusDto:
+        pass
+
+    @abstractmethod
+    def get_all_statuses(self) -> Sequence[SensorStatusDto]:
+        pass
+
+    @abstractmethod
+    def get_glitch_count_by_pin(self, gpio_pin_number: int) -> int:
+        pass
+
+    @abstractmethod
+    def get_events_by_pin(self, gpio_pin_number: int, since: Optional[float]) -> Sequence[SensorEventDto]:
         pass
@@ -1,23 +1,86 @@
 import os
-from typing import BinaryIO, Sequence
+import threading
+import time
+from typing import BinaryIO, Callable, Optional, Sequence
 
 from fastapi import FastAPI, HTTPException, Request, status
 from fastapi.responses import StreamingResponse, FileResponse
+from prometheus_client import Counter, Histogram
 
 from app.exceptions.bad_request_exception import BadRequestException
+from app.exceptions.not_found_exception import NotFoundException
 from app.jobs.recording.recordings_manager import RecordingsManager
-from app.models.recording import Recording, RecordingInputDto
+from app.jobs.scheduler.scheduled_job import ScheduledJob
+from app.jobs.scheduler.scheduler import Scheduler
+from app.models.camera import Camera
+from app.models.recording import Recording, RecordingInputDto, get_segment_name
+from app.models.recording_stats import RecordingStatsDto
 from app.repositories.camera.camera_repository import CameraRepository
 from app.repositories.recording.recording_repository import RecordingRepository
 from app.services.recording.recording_service import RecordingService
-from app.utils.delayed_execution import delay_execution
+
+ALARM_RECORDINGS_START = Histogram(
+    "alarm_recordings_start_seconds",
+    "Time from an alarm firing to the last of its cameras recording",
+    buckets=(0.5, 1, 2, 3, 5, 10, 20, 30, 60)
+)
+ALARM_RECORDINGS_START_FAILURES = Counter(
+    "alarm_recordings_start_failures_total",
+    "Alarm recordings whose ffmpeg could not be started"
+)
+# Past this the start is observed anyway, in the +Inf bucket, with the cameras still not recording
+ALARM_RECORDINGS_START_TIMEOUT_SECONDS = 60
+
+
+# Observes the start time of the alarm recordings once every camera wrote its first frames. Cameras that failed to
+# start are counted apart and not waited for, and an alarm whose cameras are not all recording after the timeout is
+# observed then, so slow or broken starts still show up.
+class AlarmRecordingsStart:
+    def __init__(self, cameras: int, started_at: float, on_started: Optional[Callable[[Recording], None]], scheduler: Scheduler):
+        self.started_at = started_at
+        self.remaining = cameras
+        self.callback = on_started
+        self.scheduler = scheduler
+        self.timeout_job: Optional[ScheduledJob] = None
+        self.lock = threading.Lock()
+
+    def start_timeout(self):
+        self.timeout_job = self.scheduler.schedule(self.on_timeout, delay_seconds=ALARM_RECORDINGS_START_TIMEOUT_SECONDS, name="alarm recordings start timeout")
+
+    def on_started(self, recording: Recording):
+        if self.callback is not None:
+            self.callback(recording)
+        self.count_down()
+
+    def on_failed(self, recording: Recording):
+        ALARM_RECORDINGS_START_FAILURES.inc()
+        self.count_down()
+
+    def count_down(self):
+        with self.lock:
+            self.remaining -= 1
+            if self.remaining != 0:
+                return
+        if self.timeout_job is not None:
+            self.scheduler.cancel(self.timeout_job)
+        ALARM_RECORDINGS_START.observe(time.monotonic() - self.started_at)
+
+    def on_timeout(self):
+        with self.lock:
+            if self.remaining <= 0:
+                return
+            # Cameras starting after this don't observe it again
+            self.remaining = -1
+        print("Alarm recordings still not all started, observing the start as timed out")
+        ALARM_RECORDINGS_START.observe(time.monotonic() - self.started_at)
 
 
 class RecordingServiceImpl(RecordingService):
-    def __init__(self, recording_repository: RecordingRepository, camera_repository: CameraRepository, recording_manager: RecordingsManager):
+    def __init__(self, recording_repository: RecordingRepository, camera_repository: CameraRepository, recording_manager: RecordingsManager, scheduler: Scheduler):
         self.recording_repository = recording_repository
         self.camera_repository = camera_repository
         self.recording_manager = recording_manager
+        self.scheduler = scheduler
 
         # If on boot some recording were not stopped properly, set them as stopped here
         for recording in self.recording_repository.find_all():
@@ -33,20 +96,41 @@ class RecordingServiceImpl(RecordingService):
         camera = self.camera_repository.find_by_ip(recording.camera_ip) # will throw if not found
 
         if not self.recording_manager.is_recording(recording.camera_ip):
+            segmented = self.recording_manager.is_segmented(camera)
+            if segmented:
+                recording.name = get_segment_name(recording.name, 0)
             recording = self.recording_repository.create(recording)
             self.recording_manager.start_recording(recording)
 
-            if auto_restart:
-                delay_execution(
-                    func=self.restart,
+            # Segmented recordings split files on their own
+            if auto_restart and not segmented:
+                self.scheduler.schedule(
+                    self.restart,
                     args=(camera.ip,),
-                    delay_seconds= 60 * 60) # restart recording after n minutes to have separate files
+                    delay_seconds=60 * 60, # restart recording after n minutes to have separate files
+                    name=f"restart recording {camera.ip}")
 
             return recording
         else:
             raise BadRequestException("Recording already started")
 
 
+    # Cameras already recording are left alone, the others get their rows inserted together and start at once
+    def create_and_start_alarm_recordings(self, cameras: Sequence[Camera], on_started: Optional[Callable[[Recording], None]] = None) -> Sequence[Recording]:
+        started_at = time.monotonic()
+        cameras = [camera for camera in cameras if not self.recording_manager.is_recording(camera.ip)]
+        if not cameras:
+            return []
+
+        recordings = self.recording_repository.create_all([Recording.from_dto(RecordingInputDto(camera_ip=camera.ip, always_recording=False)) for camera in cameras])
+        start = AlarmRecordingsStart(len(recordings), started_at, on_started, self.scheduler)
+        start.start_timeout()
+        failed = self.recording_manager.start_recordings(cameras, recordings, start.on_started)
+        for recording in failed:
+            start.on_failed(recording)
+        return recordings
+
+
     def restart(self, camera_ip: str):
         try:
             print(f"Restarting recording for camera on {camera_ip}")
@@ -58,14 +142,29 @@ class RecordingServiceImpl(RecordingService):
             pass
 
 
+    def start_pre_roll(self, camera: Camera):
+        self.recording_manager.start_pre_roll(camera)
+
+
+    def stop_pre_roll(self, camera_ip: str):
+        self.recording_manager.stop_pre_roll(camera_ip)
+
+
     def stop_by_camera_ip(self, camera_ip: str) -> Recording:
         recording = self.recording_manager.get_current_recording_by_camera_ip(camera_ip)
         if recording is not None:
-            self.recording_manager.stop_recording(recording)
+            recording = self.recording_manager.stop_recording(recording)
             self.recording_repository.set_stopped(recording)
         return recording
 
 
+    def get_stats_by_camera_ip(self, camera_ip: str) -> RecordingStatsDto:
+        stats = self.recording_manager.get_recording_stats(camera_ip)
+        if stats is None:
+            raise NotFoundException("Camera has no recording stats, it is not recording or ffmpeg did not report progress yet")
+        return stats
+
+
     def delete_by_id(self, rec_id: int) -> Recording:
         recording = self.recording_repository.delete_by_id(rec_id)
         if not recording.is_completed:
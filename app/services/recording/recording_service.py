@@ -1,7 +1,9 @@
 from abc import ABC, abstractmethod
-from typing import Sequence
+from typing import Callable, Optional, Sequence
 
+from app.models.camera import Camera
 from app.models.recording import Recording
+from app.models.recording_stats import RecordingStatsDto
 
 
 class RecordingService(ABC):
@@ -13,10 +15,26 @@ class RecordingService(ABC):
     def create_and_start_recording(self, recording: Recording, auto_restart: bool) -> Recording:
         pass
 
+    @abstractmethod
+    def create_and_start_alarm_recordings(self, cameras: Sequence[Camera], on_started: Optional[Callable[[Recording], None]] = None) -> Sequence[Recording]:
+        pass
+
+    @abstractmethod
+    def start_pre_roll(self, camera: Camera):
+        pass
+
+    @abstractmethod
+    def stop_pre_roll(self, camera_ip: str):
+        pass
+
     @abstractmethod
     def stop_by_camera_ip(self, camera_ip: str) -> Recording:
         pass
 
+    @abstractmethod
+    def get_stats_by_camera_ip(self, camera_ip: str) -> RecordingStatsDto:
+        pass
+
     @abstractmethod
     def delete_by_id(self, rec_id: int) -> Recording:
         pass
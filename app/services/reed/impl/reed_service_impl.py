@@ -1,10 +1,11 @@
-from typing import Sequence
+from typing import Optional, Sequence
 
 from app.exceptions.bad_request_exception import BadRequestException
 from app.exceptions.unupdateable_data_exception import UnupdateableDataException
 from app.jobs.reed.reeds_listener import ReedsListener
-from app.models.enums.reed_status import ReedStatus
 from app.models.reed import Reed
+from app.models.sensor_event import SensorEventDto
+from app.models.sensor_status import SensorStatusDto
 from app.repositories.reed.reed_repository import ReedRepository
 from app.services.reed.reed_service import ReedService
 
@@ -24,6 +25,9 @@ class ReedServiceImpl(ReedService):
 
 
     def create(self, reed: Reed) -> Reed:
+        if reed.debounce_ms < 0:
+            raise BadRequestException("Debounce can't be negative")
+
         reed = self.reed_repository.create(reed)
         self.reeds_listener.add_reed(reed)
         return reed
@@ -36,6 +40,9 @@ class ReedServiceImpl(ReedService):
         if reed.listening:
             raise BadRequestException("Can't set listening here")
 
+        if reed.debounce_ms < 0:
+            raise BadRequestException("Debounce can't be negative")
+
         if self.reed_repository.find_by_gpio_pin_number(gpio_pin_number).listening:
             raise BadRequestException("Can't update while listening")
 
@@ -57,6 +64,19 @@ class ReedServiceImpl(ReedService):
         return self.reed_repository.find_all()
 
 
-    def get_status_by_pin(self, gpio_pin_number: int) -> ReedStatus:
+    def get_status_by_pin(self, gpio_pin_number: int) -> SensorStatusDto:
+        return self.reeds_listener.get_status_by_pin(gpio_pin_number)
+
+
+    def get_all_statuses(self) -> Sequence[SensorStatusDto]:
+        return self.reeds_listener.get_all_statuses()
+
+
+    def get_glitch_count_by_pin(self, gpio_pin_number: int) -> int:
         reed = self.reed_repository.find_by_gpio_pin_number(gpio_pin_number)
-        return self.reeds_listener.get_status_by_reed(reed)
+        return self.reeds_listener.get_glitch_count_by_reed(reed)
+
+
+    def get_events_by_pin(self, gpio_pin_number: int, since: Optional[float]) -> Sequence[SensorEventDto]:
+        # No repository lookup here, history is only kept for monitored pins so the listener already knows them
+        return self.reeds_listener.get_events_by_pin(gpio_pin_number, since)
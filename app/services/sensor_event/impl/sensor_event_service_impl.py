@@ -0,0 +1,12 @@
+from app.jobs.sensor_event.sensor_events_writer import SensorEventsWriter
+from app.models.sensor_events_writer_stats import SensorEventsWriterStats
+from app.services.sensor_event.sensor_event_service import SensorEventService
+
+
+class SensorEventServiceImpl(SensorEventService):
+    def __init__(self, sensor_events_writer: SensorEventsWriter):
+        self.sensor_events_writer = sensor_events_writer
+
+
+    def get_writer_stats(self) -> SensorEventsWriterStats:
+        return self.sensor_events_writer.get_stats()
@@ -0,0 +1,9 @@
+from abc import ABC, abstractmethod
+
+from app.models.sensor_events_writer_stats import SensorEventsWriterStats
+
+
+class SensorEventService(ABC):
+    @abstractmethod
+    def get_writer_stats(self) -> SensorEventsWriterStats:
+        pass
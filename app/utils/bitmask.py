@@ -0,0 +1,24 @@
+from typing import Iterator
+
+
+# Pin states are packed in Python ints, one bit per GPIO pin number (bit n is pin n)
+def pin_bit(gpio_pin_number: int) -> int:
+    return 1 << gpio_pin_number
+
+
+def set_bit(mask: int, gpio_pin_number: int, value) -> int:
+    if value:
+        return mask | (1 << gpio_pin_number)
+    return mask & ~(1 << gpio_pin_number)
+
+
+def get_bit(mask: int, gpio_pin_number: int) -> int:
+    return (mask >> gpio_pin_number) & 1
+
+
+# Pin numbers of the set bits, lowest first; costs one step per set bit, not per monitored pin
+def iter_pins(mask: int) -> Iterator[int]:
+    while mask:
+        lowest = mask & -mask
+        yield lowest.bit_length() - 1
+        mask ^= lowest
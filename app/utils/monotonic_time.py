@@ -0,0 +1,11 @@
+import time
+
+
+# Sensor timestamps are taken with time.monotonic_ns() so they are not affected by clock adjustments; these convert
+# them from/to epoch seconds when they have to be shown or stored.
+def monotonic_to_epoch(timestamp_ns: int) -> float:
+    return time.time() - (time.monotonic_ns() - timestamp_ns) / 1e9
+
+
+def epoch_to_monotonic(epoch: float) -> int:
+    return time.monotonic_ns() - int((time.time() - epoch) * 1e9)
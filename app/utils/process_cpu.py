@@ -0,0 +1,35 @@
+import os
+import time
+from typing import Optional
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+
+
+# CPU used by a process between two calls, from /proc, 100 being a full core
+class ProcessCpu:
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.last_ticks = self.read_ticks()
+        self.last_time = time.monotonic()
+
+
+    def read_ticks(self) -> Optional[int]:
+        try:
+            with open(f"/proc/{self.pid}/stat") as file:
+                # Fields after the command name, which is in parentheses and can contain spaces
+                fields = file.read().rsplit(")", 1)[1].split()
+            # utime and stime
+            return int(fields[11]) + int(fields[12])
+        except (OSError, IndexError, ValueError):
+            return None
+
+
+    def percent(self) -> Optional[float]:
+        ticks = self.read_ticks()
+        now = time.monotonic()
+        if ticks is None or self.last_ticks is None or now <= self.last_time:
+            return None
+        percent = (ticks - self.last_ticks) / CLOCK_TICKS / (now - self.last_time) * 100
+        self.last_ticks = ticks
+        self.last_time = now
+        return percent
@@ -0,0 +1,328 @@
+# Latency of the alarm path, from a sensor pin transition to:
+#   handler    AlarmManagerImpl.on_reed/pir_changed_status called
+#   waiting    AlarmWaiting published
+#   trigger    AlarmManagerImpl.trigger_alarm running (groups fire right away, wait_to_fire_alarm is 0)
+#   recording  first RecordingProcess running
+# Everything runs off-device: pins are GpioMock ones, the database comes from --database-url (a SQLite file in a
+# temporary directory by default, a throwaway Postgres works as well since tables are dropped and created again),
+# RabbitMQ is replaced by a client that only timestamps published events and recording processes don't launch ffmpeg.
+# For every sensor count and rate, one reed and one PIR listen and trigger the alarm in turns while the other
+# sensors, not listening, flip at the given total rate through the sampler and the sensor events writer.
+# p50/p95/p99 are reported, p50 and p95 are compared with benchmarks/alarm_latency_baseline.json and the run fails
+# when one got worse than --tolerance times the baseline one and by more than --slack-ms, since a millisecond point
+# doubles whenever the scheduler feels like it. p99 is only a few trials and moves with whatever else the machine does,
+# so it is not gated, and neither is a run of fewer than MIN_GATED_TRIALS trials.
+# Baselines depend on the machine, the committed one was recorded on a development machine and is a reference, not a
+# gate for any other: record one on the machine running the comparison with --save-baseline (at least
+# MIN_GATED_TRIALS trials, more make the percentiles steadier).
+# Run from the repository root: python -m benchmarks.alarm_latency_benchmark --sensors 8,64,256 --rates 0,1000,5000
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from sqlmodel import SQLModel, Session, create_engine
+
+from app.database.database_connector import DatabaseConnector
+from app.jobs.alarm.impl.alarm_manager_impl import AlarmManagerImpl
+from app.jobs.alarm_tracer.impl.alarm_tracer_impl import AlarmTracerImpl
+from app.jobs.event_publisher.impl.event_publisher_impl import EventPublisherImpl
+from app.jobs.event_publisher.impl.event_spool import EventSpool
+from app.jobs.pir.impl.pirs_listener_impl import PirsListenerImpl
+from app.jobs.recording.impl import recordings_manager_impl
+from app.jobs.recording.impl.recording_process import RecordingProcess
+from app.jobs.recording.impl.recordings_manager_impl import RecordingsManagerImpl
+from app.jobs.reed.impl.reeds_listener_impl import ReedsListenerImpl
+from app.jobs.scheduler.impl.scheduler_impl import SchedulerImpl
+from app.jobs.sensor.impl.sensor_sampler_impl import SensorSamplerImpl
+from app.jobs.sensor_event.impl.sensor_events_writer_impl import SensorEventsWriterImpl
+from app.models.camera import Camera
+from app.models.device_group import DeviceGroup
+from app.models.enums.device_group_status import DeviceGroupStatus
+from app.models.enums.pir_status import PirStatus
+from app.models.enums.reed_status import ReedStatus
+from app.models.mock.GpioMock import GpioMock
+from app.models.mock.gpio_simulator import GpioSimulator
+from app.models.pir import Pir
+from app.models.reed import Reed
+from app.repositories.camera.impl.camera_repository_impl import CameraRepositoryImpl
+from app.repositories.device_group.impl.device_group_repository_impl import DeviceGroupRepositoryImpl
+from app.repositories.pir.impl.pir_repository_impl import PirRepositoryImpl
+from app.repositories.recording.impl.recording_repository_impl import RecordingRepositoryImpl
+from app.repositories.reed.impl.reed_repository_impl import ReedRepositoryImpl
+from app.repositories.sensor_event.impl.sensor_event_repository_impl import SensorEventRepositoryImpl
+from app.services.recording.impl.recording_service_impl import RecordingServiceImpl
+
+POINTS = ["handler", "waiting", "trigger", "recording"]
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "alarm_latency_baseline.json")
+PERCENTILES = (50, 95, 99)
+GATED = ("p50", "p95")
+MIN_GATED_TRIALS = 100
+REED_PIN = 0
+PIR_PIN = 1
+
+
+class BenchmarkDatabaseConnector(DatabaseConnector):
+    def __init__(self, database_url: str):
+        connect_args = {"check_same_thread": False} if database_url.startswith("sqlite") else {}
+        self.engine = create_engine(database_url, echo=False, connect_args=connect_args)
+        SQLModel.metadata.drop_all(self.engine)
+        SQLModel.metadata.create_all(self.engine)
+
+    def get_new_session(self):
+        return Session(self.engine)
+
+
+# Timestamps of the points reached by the current trial, only the first time each one is reached
+class Probe:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = None
+        self.points = {}
+        self.done = threading.Event()
+
+    def arm(self):
+        with self.lock:
+            self.points = {}
+            self.done.clear()
+            self.started = time.monotonic_ns()
+
+    def mark(self, point: str):
+        now = time.monotonic_ns()
+        with self.lock:
+            if self.started is not None and point not in self.points:
+                self.points[point] = now
+                if len(self.points) == len(POINTS):
+                    self.done.set()
+
+    def latencies_ms(self):
+        with self.lock:
+            return {point: (timestamp - self.started) / 1e6 for point, timestamp in self.points.items()}
+
+
+class TimestampingRabbitMQClient:
+    def __init__(self, probe: Probe):
+        self.probe = probe
+
+    def publish(self, event) -> bool:
+        if type(event).__name__ == "AlarmWaiting":
+            self.probe.mark("waiting")
+        return True
+
+
+def probing_recording_process(probe: Probe):
+    class ProbingRecordingProcess(RecordingProcess):
+        async def run(self):
+            probe.mark("recording")
+            if self.on_started_callback is not None:
+                self.on_started_callback(self.recording)
+            try:
+                # Until cancelled by stop
+                await asyncio.sleep(3600)
+            except asyncio.CancelledError:
+                pass
+
+    return ProbingRecordingProcess
+
+
+class AlarmPath:
+    def __init__(self, database_url: str, sensors: int, recordings_dir: str):
+        self.probe = Probe()
+        self.alarm_triggered = threading.Event()
+        recordings_manager_impl.RecordingProcess = probing_recording_process(self.probe)
+        recordings_manager_impl.get_recordings_path = lambda: recordings_dir
+
+        GpioMock.cleanup()
+        database_connector = BenchmarkDatabaseConnector(database_url)
+        camera_repository = CameraRepositoryImpl(database_connector=database_connector)
+        reed_repository = ReedRepositoryImpl(database_connector=database_connector)
+        pir_repository = PirRepositoryImpl(database_connector=database_connector)
+        recording_repository = RecordingRepositoryImpl(database_connector=database_connector)
+        self.device_group_repository = DeviceGroupRepositoryImpl(database_connector=database_connector)
+
+        self.scheduler = SchedulerImpl()
+        self.event_publisher = EventPublisherImpl(TimestampingRabbitMQClient(self.probe), EventSpool(os.path.join(recordings_dir, "events.spool")))
+        self.recording_manager = RecordingsManagerImpl(camera_repository, recording_repository)
+        recording_service = RecordingServiceImpl(recording_repository=recording_repository, camera_repository=camera_repository, recording_manager=self.recording_manager, scheduler=self.scheduler)
+        self.alarm_manager = AlarmManagerImpl(self.event_publisher, recording_service, self.device_group_repository, camera_repository, self.scheduler, AlarmTracerImpl())
+        self.probe_alarm_manager()
+
+        self.sensor_sampler = SensorSamplerImpl()
+        self.sensor_sampler.start()
+        self.sensor_events_writer = SensorEventsWriterImpl(SensorEventRepositoryImpl(database_connector=database_connector))
+        reeds_listener = ReedsListenerImpl(self.alarm_manager, self.sensor_sampler, self.sensor_events_writer)
+        pirs_listener = PirsListenerImpl(self.alarm_manager, self.sensor_sampler, self.sensor_events_writer)
+
+        camera_repository.create(Camera(ip="127.0.0.1", port=554, username="", password="", path="", name="camera", always_recording=False))
+
+        # Closed reed is HIGH (normally closed on vcc), idle pir is LOW
+        GpioMock.values[REED_PIN] = GpioMock.HIGH
+        for pin in range(max(sensors, 2)):
+            listening = pin in (REED_PIN, PIR_PIN)
+            if pin % 2 == 0:
+                reed = reed_repository.create(Reed(gpio_pin_number=pin, name=f"reed {pin}", normally_closed=True, vcc=True, listening=listening, debounce_ms=0))
+                reeds_listener.add_reed(reed)
+            else:
+                pir = pir_repository.create(Pir(gpio_pin_number=pin, name=f"pir {pin}", listening=listening, debounce_ms=0))
+                pirs_listener.add_pir(pir)
+
+        self.group = self.device_group_repository.create_device_group(DeviceGroup(name="benchmark", wait_to_start_alarm=0, wait_to_fire_alarm=0, status=DeviceGroupStatus.LISTENING))
+        self.device_group_repository.update_device_group_reeds_by_id(self.group.id, [REED_PIN])
+        self.device_group_repository.update_device_group_pirs_by_id(self.group.id, [PIR_PIN])
+        self.alarm_manager.on_group_started_listening(
+            self.group,
+            self.device_group_repository.find_device_group_reeds_by_id(self.group.id),
+            self.device_group_repository.find_device_group_pirs_by_id(self.group.id))
+
+
+    # Wrap the handlers and trigger_alarm on the instance, alarm status changes that don't start an alarm are ignored
+    def probe_alarm_manager(self):
+        on_reed_changed_status = self.alarm_manager.on_reed_changed_status
+        on_pir_changed_status = self.alarm_manager.on_pir_changed_status
+        trigger_alarm = self.alarm_manager.trigger_alarm
+
+        def probing_on_reed_changed_status(reed_pin, status, *timestamps):
+            if status == ReedStatus.OPEN:
+                self.probe.mark("handler")
+            on_reed_changed_status(reed_pin, status, *timestamps)
+
+        def probing_on_pir_changed_status(pir_pin, status, *timestamps):
+            if status == PirStatus.MOVEMENT:
+                self.probe.mark("handler")
+            on_pir_changed_status(pir_pin, status, *timestamps)
+
+        def probing_trigger_alarm(event, group_id):
+            self.probe.mark("trigger")
+            trigger_alarm(event, group_id)
+            self.alarm_triggered.set()
+
+        self.alarm_manager.on_reed_changed_status = probing_on_reed_changed_status
+        self.alarm_manager.on_pir_changed_status = probing_on_pir_changed_status
+        self.alarm_manager.trigger_alarm = probing_trigger_alarm
+
+
+    def trial(self, trial: int, timeout: float):
+        pin, alarm_value, rest_value = (REED_PIN, GpioMock.LOW, GpioMock.HIGH) if trial % 2 == 0 else (PIR_PIN, GpioMock.HIGH, GpioMock.LOW)
+
+        self.alarm_triggered.clear()
+        self.probe.arm()
+        GpioMock.inject_edge(pin, alarm_value)
+        completed = self.probe.done.wait(timeout)
+        latencies = self.probe.latencies_ms()
+
+        # Back to a listening group with the sensor at rest before the next trial, once trigger_alarm is over and
+        # recordings it started can be stopped
+        self.alarm_triggered.wait(timeout)
+        self.alarm_manager.stop_alarm()
+        self.group.status = DeviceGroupStatus.LISTENING
+        self.device_group_repository.update_device_group(self.group)
+        GpioMock.inject_edge(pin, rest_value)
+        while self.sensor_sampler.get_last_sample(pin)[0] != rest_value:
+            time.sleep(0.001)
+        return latencies if completed else None
+
+
+    def stop(self):
+        self.sensor_sampler.stop()
+        self.sensor_events_writer.stop()
+        self.scheduler.stop()
+        self.event_publisher.stop()
+        self.recording_manager.stop()
+
+
+def percentile(values, p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+
+def run(database_url: str, sensors: int, rate: float, trials: int, timeout: float):
+    with tempfile.TemporaryDirectory() as recordings_dir:
+        alarm_path = AlarmPath(database_url, sensors, recordings_dir)
+
+        simulator = None
+        chattering = list(range(2, sensors))
+        if rate > 0 and chattering:
+            # Enough background transitions for the whole run, stopped once the trials are over
+            simulator = GpioSimulator().random_chatter(chattering, rate / len(chattering), trials * timeout + 10)
+            simulator.start()
+
+        samples = {point: [] for point in POINTS}
+        timeouts = 0
+        for trial in range(trials):
+            latencies = alarm_path.trial(trial, timeout)
+            if latencies is None:
+                timeouts += 1
+                continue
+            for point in POINTS:
+                samples[point].append(latencies[point])
+
+        if simulator is not None:
+            simulator.stop()
+        alarm_path.stop()
+
+    return {
+        point: {f"p{p}": round(percentile(values, p), 3) for p in PERCENTILES}
+        for point, values in samples.items() if values
+    }, timeouts
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sensors", default="8,64,256", help="comma separated sensor counts")
+    parser.add_argument("--rates", default="0,1000,5000", help="comma separated background transitions per second, over all sensors")
+    parser.add_argument("--trials", type=int, default=200)
+    parser.add_argument("--timeout", type=float, default=5, help="seconds a trial can take to reach every point")
+    parser.add_argument("--database-url", default=None, help="throwaway database, tables are dropped, SQLite in a temporary directory by default")
+    parser.add_argument("--tolerance", type=float, default=2, help="fail when a p50 or p95 is worse than this times the baseline")
+    parser.add_argument("--slack-ms", type=float, default=5, help="and worse than the baseline by more than this")
+    parser.add_argument("--save-baseline", action="store_true")
+    args = parser.parse_args()
+    if args.trials < MIN_GATED_TRIALS:
+        if args.save_baseline:
+            parser.error(f"a baseline needs at least {MIN_GATED_TRIALS} trials")
+        print(f"Fewer than {MIN_GATED_TRIALS} trials, results are not compared with the baseline")
+
+    baseline = {}
+    if os.path.exists(BASELINE_PATH) and not args.save_baseline and args.trials >= MIN_GATED_TRIALS:
+        with open(BASELINE_PATH) as file:
+            baseline = json.load(file)
+
+    results = {}
+    regressions = []
+    with tempfile.TemporaryDirectory() as database_dir:
+        for sensors in [int(value) for value in args.sensors.split(",")]:
+            for rate in [float(value) for value in args.rates.split(",")]:
+                database_url = args.database_url or f"sqlite:///{os.path.join(database_dir, f'{sensors}_{rate:g}.db')}"
+                key = f"{sensors} sensors, {rate:g}/s"
+                results[key], timeouts = run(database_url, sensors, rate, args.trials, args.timeout)
+
+                line = ", ".join(f"{point} {'/'.join(f'{value:.2f}' for value in values.values())}" for point, values in results[key].items())
+                print(f"{key}: {line} ms (p50/p95/p99){f', {timeouts} trials timed out' if timeouts else ''}")
+
+                for point, values in results[key].items():
+                    reference = baseline.get(key, {}).get(point, {})
+                    for gated in GATED:
+                        if gated not in reference:
+                            continue
+                        if values[gated] > reference[gated] * args.tolerance and values[gated] - reference[gated] > args.slack_ms:
+                            regressions.append(f"{key} {point}: {gated} {values[gated]:.2f} ms, baseline {reference[gated]:.2f} ms")
+
+    if args.save_baseline:
+        with open(BASELINE_PATH, "w") as file:
+            json.dump(results, file, indent=2)
+        print(f"Baseline saved to {BASELINE_PATH}")
+
+    if regressions:
+        print("Regressions:")
+        for regression in regressions:
+            print(f"  {regression}")
+
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
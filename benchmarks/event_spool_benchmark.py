@@ -0,0 +1,78 @@
+# Throughput of the events spool on the storage it will live on: raw appends with one fsync per batch for a range of
+# batch sizes, then end to end through EventPublisherImpl with a broker that accepts everything.
+# Point --path at the SD card (or wherever EVENTS_SPOOL_PATH is) to get numbers that mean something, tmpfs hides fsync.
+# Run from the repository root: python -m benchmarks.event_spool_benchmark --path /var/lib/devices-manager/data/bench.spool
+import argparse
+import os
+import threading
+import time
+
+from rabbitmq_sdk.event.impl.devices_manager.alarm_waiting import AlarmWaiting
+
+from app.jobs.event_publisher.impl.event_publisher_impl import EventPublisherImpl
+from app.jobs.event_publisher.impl.event_spool import EventSpool
+
+
+class CountingRabbitMQClient:
+    def __init__(self, expected: int):
+        self.expected = expected
+        self.published = 0
+        self.done = threading.Event()
+
+    def publish(self, event) -> bool:
+        self.published += 1
+        if self.published >= self.expected:
+            self.done.set()
+        return True
+
+
+def remove_spool(path: str):
+    for file_path in (path, f"{path}.offset"):
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+
+def bench_appends(path: str, events: int, batch_size: int) -> float:
+    remove_spool(path)
+    spool = EventSpool(path)
+    batch = [(time.time(), AlarmWaiting(True, int(time.time()))) for _ in range(batch_size)]
+    started = time.perf_counter()
+    for _ in range(max(1, events // batch_size)):
+        spool.append_all(batch)
+    elapsed = time.perf_counter() - started
+    spool.close()
+    remove_spool(path)
+    return max(1, events // batch_size) * batch_size / elapsed
+
+
+def bench_publisher(path: str, events: int, batch_size: int) -> float:
+    remove_spool(path)
+    client = CountingRabbitMQClient(events)
+    publisher = EventPublisherImpl(client, EventSpool(path), max_queued=events, batch_size=batch_size)
+    started = time.perf_counter()
+    for _ in range(events):
+        publisher.publish(AlarmWaiting(True, int(time.time())))
+    client.done.wait()
+    elapsed = time.perf_counter() - started
+    publisher.stop()
+    remove_spool(path)
+    return events / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--path", default="/var/lib/devices-manager/data/bench.spool")
+    parser.add_argument("--events", type=int, default=2000)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 10, 50, 200])
+    args = parser.parse_args()
+
+    print(f"Spool at {args.path}, {args.events} events")
+    print(f"{'batch':>6} {'append ev/s':>12} {'publisher ev/s':>15}")
+    for batch_size in args.batch_sizes:
+        appends = bench_appends(args.path, args.events, batch_size)
+        published = bench_publisher(args.path, args.events, batch_size)
+        print(f"{batch_size:>6} {appends:>12.0f} {published:>15.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+# Load test of the sensor pipeline (sampler, debounce, reed and PIR listeners, alarm dispatch) driven by GpioSimulator.
+# Half of the pins are reeds and half PIRs, all listening, with random chatter at the given rate on every pin.
+# With --runtime ASYNCIO the sampler runs as tasks on an event loop in its own thread, like it does in the application.
+# Run from the repository root: python -m benchmarks.sensor_load_test --pins 200 --rate 1000 --duration 5
+import argparse
+import asyncio
+import threading
+import time
+
+from app.jobs.alarm.alarm_manager import AlarmManager
+from app.jobs.pir.impl.pirs_listener_impl import PirsListenerImpl
+from app.jobs.reed.impl.reeds_listener_impl import ReedsListenerImpl
+from app.jobs.sensor.impl.asyncio_sensor_sampler_impl import AsyncioSensorSamplerImpl
+from app.jobs.sensor.impl.sensor_sampler_impl import SensorSamplerImpl
+from app.jobs.sensor_event.sensor_events_writer import SensorEventsWriter
+from app.models.enums.gpio_backend import GpioBackend
+from app.models.enums.sensor_sampler_runtime import SensorSamplerRuntime
+from app.models.mock.GpioMock import GpioMock
+from app.models.mock.gpio_simulator import GpioSimulator
+from app.models.pir import Pir
+from app.models.reed import Reed
+
+
+class CountingAlarmManager(AlarmManager):
+    def __init__(self):
+        self.reed_changes = 0
+        self.pir_changes = 0
+
+    def on_reed_changed_status(self, reed_pin, status, edge_timestamp=None, dispatched_at=None):
+        self.reed_changes += 1
+
+    def on_pir_changed_status(self, pir_pin, status, edge_timestamp=None, dispatched_at=None):
+        self.pir_changes += 1
+
+    def stop_alarm(self):
+        pass
+
+
+class CountingEventsWriter(SensorEventsWriter):
+    def __init__(self):
+        self.recorded = 0
+
+    def stop(self):
+        pass
+
+    def record(self, gpio_pin_number, sensor_type, status, timestamp):
+        self.recorded += 1
+
+    def get_stats(self):
+        return None
+
+
+def start_sampler(runtime: SensorSamplerRuntime, backend: GpioBackend, sample_rate: float):
+    if runtime == SensorSamplerRuntime.THREAD:
+        sampler = SensorSamplerImpl(backend, sample_rate)
+        sampler.start()
+        return sampler
+
+    sampler = AsyncioSensorSamplerImpl(backend, sample_rate)
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+
+    async def start():
+        sampler.start()
+
+    asyncio.run_coroutine_threadsafe(start(), loop).result()
+    return sampler
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pins", type=int, default=200)
+    parser.add_argument("--rate", type=float, default=1000, help="average level flips per second on each pin")
+    parser.add_argument("--duration", type=float, default=5, help="simulated seconds")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed, 2 replays twice as fast as real time")
+    parser.add_argument("--debounce-ms", type=int, default=0)
+    parser.add_argument("--backend", type=GpioBackend, default=GpioBackend.EDGE)
+    parser.add_argument("--runtime", type=SensorSamplerRuntime, default=SensorSamplerRuntime.THREAD)
+    parser.add_argument("--sample-rate", type=float, default=1000, help="polling backend only")
+    args = parser.parse_args()
+
+    GpioMock.cleanup()
+    alarm_manager = CountingAlarmManager()
+    events_writer = CountingEventsWriter()
+    sampler = start_sampler(args.runtime, args.backend, args.sample_rate)
+    reeds_listener = ReedsListenerImpl(alarm_manager, sampler, events_writer)
+    pirs_listener = PirsListenerImpl(alarm_manager, sampler, events_writer)
+
+    pins = list(range(args.pins))
+    for pin in pins:
+        if pin % 2 == 0:
+            reed = Reed(gpio_pin_number=pin, name=f"reed {pin}", normally_closed=True, vcc=True, listening=True, debounce_ms=args.debounce_ms)
+            reeds_listener.add_reed(reed)
+        else:
+            pir = Pir(gpio_pin_number=pin, name=f"pir {pin}", listening=True, debounce_ms=args.debounce_ms)
+            pirs_listener.add_pir(pir)
+
+    simulator = GpioSimulator().random_chatter(pins, args.rate, args.duration)
+    scheduled = simulator.pending()
+    print(f"{args.pins} pins, {args.rate} flips/s per pin, {scheduled} level changes over {args.duration}s simulated, {args.backend.value} backend on {args.runtime.value}")
+
+    started = time.monotonic()
+    simulator.start(args.speed).wait()
+    replayed = time.monotonic() - started
+    # Let the sampler drain whatever is still queued
+    while not sampler.edges.empty():
+        time.sleep(0.01)
+    drained = time.monotonic() - started
+    time.sleep(args.debounce_ms / 1000 + 0.6)
+
+    glitches = sum(sampler.get_glitch_count(pin) for pin in pins)
+    dispatched = alarm_manager.reed_changes + alarm_manager.pir_changes
+    print(f"replayed in {replayed:.2f}s, drained in {drained:.2f}s ({simulator.injected / drained:,.0f} changes/s)")
+    print(f"injected {simulator.injected}, dispatched to alarm manager {dispatched} "
+          f"(reeds {alarm_manager.reed_changes}, pirs {alarm_manager.pir_changes}), recorded {events_writer.recorded}, glitches {glitches}")
+
+    sampler.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# Per-tick cost of sampling every monitored pin with GpioMock, comparing the old read path (GPIO.setup before
+# every GPIO.input) with the sensor sampler one (pins configured once, bare input read per tick).
+# GpioMock.setup is free while on the board it goes through the kernel, so its cost can be simulated with a busy wait.
+# Run from the repository root: python -m benchmarks.sensor_sampling_benchmark [pins] [ticks] [setup_cost_us]
+import sys
+import time
+
+from app.jobs.sensor.impl.sensor_sampler_impl import SensorSamplerImpl
+from app.jobs.sensor.sensor_handler import SensorHandler
+from app.models.enums.gpio_backend import GpioBackend
+from app.models.mock.GpioMock import GpioMock as GPIO
+
+
+class CountingGpio:
+    def __init__(self, setup_cost_us: float):
+        self.setup_calls = 0
+        self.setup_cost = setup_cost_us / 1e6
+        self.original_setup = GPIO.setup
+
+    def __enter__(self):
+        def counting_setup(channel, state, pull_up_down=None):
+            self.setup_calls += 1
+            deadline = time.perf_counter() + self.setup_cost
+            while time.perf_counter() < deadline:
+                pass
+            self.original_setup(channel, state, pull_up_down)
+        GPIO.setup = staticmethod(counting_setup)
+        return self
+
+    def __exit__(self, *args):
+        GPIO.setup = staticmethod(self.original_setup)
+
+
+class NoopHandler(SensorHandler):
+    def on_transition(self, transition):
+        pass
+
+
+# Same work the listeners did on each tick before the sampler: setup, read and compare with the last value
+def legacy_tick(pins, values):
+    for pin in pins:
+        GPIO.setup(pin, GPIO.IN, pull_up_down=GPIO.PUD_UP)
+        value = GPIO.input(pin)
+        if value != values[pin]:
+            values[pin] = value
+
+
+def run(name, tick, ticks, setup_cost_us):
+    with CountingGpio(setup_cost_us) as counter:
+        started = time.perf_counter()
+        for _ in range(ticks):
+            tick()
+        elapsed = time.perf_counter() - started
+    print(f"{name:>8}: {elapsed / ticks * 1e6:8.2f} us/tick, {counter.setup_calls / ticks:5.1f} setup calls/tick")
+
+
+def main():
+    pin_count = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    ticks = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+    setup_cost_us = float(sys.argv[3]) if len(sys.argv) > 3 else 0
+    pins = list(range(pin_count))
+    values = {pin: GPIO.LOW for pin in pins}
+
+    # Sampler is never started, only the ticks run here measure anything
+    sampler = SensorSamplerImpl(GpioBackend.EDGE)
+    for pin in pins:
+        sampler.register_pin(pin, GPIO.PUD_UP, 0, NoopHandler())
+
+    print(f"{pin_count} pins, {ticks} ticks, {setup_cost_us} us simulated setup cost")
+    run("before", lambda: legacy_tick(pins, values), ticks, setup_cost_us)
+    run("after", sampler.sample_all, ticks, setup_cost_us)
+    sampler.stop()
+
+
+if __name__ == "__main__":
+    main()